@@ -1,25 +1,41 @@
 # ruff: noqa: E402
+import argparse
 import asyncio
+import logging
+import signal
 
 from .config import Settings
 
 _config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
 
 from openg2p_fastapi_common.app import Initializer as BaseInitializer
 
 from .controllers import (
     AsyncMapperController,
+    CallbackOutboxController,
+    MetricsController,
     SyncMapperController,
 )
-from .models import IdFaMapping
+from .models import AsyncJob, CallbackOutbox, IdFaMapping, TxnResult
 from .services import (
+    AsyncJobQueue,
     AsyncRequestHelper,
     AsyncResponseHelper,
+    CallbackClient,
+    CallbackOutboxDispatcher,
+    CompressionMiddleware,
     IdFaMappingValidations,
     MapperService,
+    PostgresAsyncJobQueue,
+    ReadReplica,
     RequestValidation,
+    ResolveBloomFilter,
+    ResolveCache,
+    ResolveCacheInvalidator,
     SyncRequestHelper,
     SyncResponseHelper,
+    TxnResultStore,
 )
 
 
@@ -27,6 +43,17 @@ class Initializer(BaseInitializer):
     def initialize(self, **kwargs):
         super().initialize()
 
+        ReadReplica()
+        CallbackClient()
+        CallbackOutboxDispatcher()
+        TxnResultStore()
+        if _config.async_job_queue_backend == "postgres":
+            PostgresAsyncJobQueue()
+        else:
+            AsyncJobQueue()
+        ResolveCache()
+        ResolveBloomFilter()
+        ResolveCacheInvalidator()
         MapperService()
         IdFaMappingValidations()
         SyncRequestHelper()
@@ -36,6 +63,33 @@ class Initializer(BaseInitializer):
         AsyncResponseHelper()
         SyncMapperController().post_init()
         AsyncMapperController().post_init()
+        if _config.callback_outbox_admin_enabled:
+            CallbackOutboxController().post_init()
+        if _config.metrics_enabled:
+            MetricsController().post_init()
+
+        self.return_app().add_middleware(CompressionMiddleware)
+
+    async def fastapi_app_startup(self, app):
+        await super().fastapi_app_startup(app)
+        await ReadReplica.get_component().start()
+        await CallbackClient.get_component().start()
+        await CallbackOutboxDispatcher.get_component().start()
+        await TxnResultStore.get_component().start()
+        await ResolveCacheInvalidator.get_component().start()
+        await ResolveBloomFilter.get_component().start()
+        await AsyncJobQueue.get_component().start()
+
+    async def fastapi_app_shutdown(self, app):
+        # Drained first, queued jobs still need the DB and the callback outbox
+        await AsyncJobQueue.get_component().stop()
+        await ResolveBloomFilter.get_component().stop()
+        await ResolveCacheInvalidator.get_component().stop()
+        await ReadReplica.get_component().stop()
+        await TxnResultStore.get_component().stop()
+        await CallbackOutboxDispatcher.get_component().stop()
+        await CallbackClient.get_component().stop()
+        await super().fastapi_app_shutdown(app)
 
     def migrate_database(self, args):
         super().migrate_database(args)
@@ -43,5 +97,58 @@ class Initializer(BaseInitializer):
         async def migrate():
             print("Migrating database")
             await IdFaMapping.create_migrate()
+            await CallbackOutbox.create_migrate()
+            await AsyncJob.create_migrate()
+            await TxnResult.create_migrate()
 
         asyncio.run(migrate())
+
+    def main(self):
+        parser = argparse.ArgumentParser(description="SPAR Mapper Server")
+        subparsers = parser.add_subparsers(help="List Commands.", required=True)
+        run_subparser = subparsers.add_parser("run", help="Run API Server.")
+        run_subparser.set_defaults(func=self.run_server)
+        worker_subparser = subparsers.add_parser(
+            "worker", help="Run async job and callback workers, without the API."
+        )
+        worker_subparser.set_defaults(func=self.run_worker)
+        migrate_subparser = subparsers.add_parser(
+            "migrate", help="Create/Migrate Database Tables."
+        )
+        migrate_subparser.set_defaults(func=self.migrate_database)
+        openapi_subparser = subparsers.add_parser(
+            "getOpenAPI", help="Get OpenAPI Json of the Server."
+        )
+        openapi_subparser.add_argument(
+            "filepath", help="Path of the Output OpenAPI Json File."
+        )
+        openapi_subparser.set_defaults(func=self.get_openapi)
+        args = parser.parse_args()
+        args.func(args)
+
+    def run_worker(self, args):
+        """
+        Runs the same background services as the API server, until SIGINT/SIGTERM.
+        """
+        if _config.async_job_queue_backend != "postgres":
+            _logger.warning(
+                "async_job_queue_backend is not postgres. "
+                "This worker only delivers callbacks."
+            )
+        # Consuming is what this process is for, whatever the API processes do
+        _config.async_job_consumer_enabled = True
+
+        async def worker():
+            app = self.return_app()
+            stopped = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stopped.set)
+            await self.fastapi_app_startup(app)
+            _logger.info("Worker started.")
+            try:
+                await stopped.wait()
+            finally:
+                await self.fastapi_app_shutdown(app)
+
+        asyncio.run(worker())
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, Literal, Optional
 
 from openg2p_fastapi_common.config import Settings as BaseSettings
 from pydantic import AnyUrl
@@ -23,7 +23,155 @@ class Settings(BaseSettings):
     openapi_version: str = __version__
 
     db_dbname: str = "openg2p_spar_db"
+    # Max number of bind parameters sent in a single IN (...) clause.
+    # asyncpg allows at most 32767 parameters per statement.
+    db_query_chunk_size: int = 10000
+
+    # Optional read replica for resolve lookups. Same format as db_datasource.
+    db_replica_datasource: str = ""
+    # In seconds. Reads fall back to the primary above this lag.
+    db_replica_max_lag: int = 10
+    db_replica_lag_check_interval: int = 5
+
+    # Sync responses are built without revalidation and serialized straight to
+    # JSON bytes, instead of through FastAPI's jsonable_encoder
+    sync_response_fast_json: bool = True
+    # Sync resolves asking for application/x-ndjson (or ?stream=true) are resolved
+    # and written this many single requests at a time
+    resolve_stream_chunk_size: int = 1000
+    # Details resolves by FA alone list at most this many of the FA's ids, in
+    # id order. The status_reason_message says when the list is cut short.
+    resolve_reverse_max_ids: int = 100
+
+    # Request bodies sent with Content-Encoding gzip or zstd are decompressed as
+    # they are received, and rejected with 413 past this size. zstd needs the
+    # zstandard package.
+    request_max_decompressed_size: int = 256 * 1024 * 1024
+    # Responses of at least min_size bytes are compressed by Accept-Encoding
+    response_compression_enabled: bool = True
+    response_compression_min_size: int = 1024
+    compression_gzip_level: int = 5
+    compression_zstd_level: int = 3
+
+    # Single requests with a longer id/fa/name/phone_number, or a larger
+    # additional_info, are rejected before reaching the DB
+    max_id_length: int = 256
+    max_fa_length: int = 256
+    max_name_length: int = 512
+    max_phone_number_length: int = 32
+    # In bytes, serialized as JSON
+    max_additional_info_size: int = 64 * 1024
+
+    # Only results read from the primary are cached, so with a read replica the
+    # cache holds forced-primary reads and those made while the replica lags.
+    resolve_cache_enabled: bool = False
+    resolve_cache_max_entries: int = 100000
+    # In seconds
+    resolve_cache_ttl: int = 60
+    resolve_cache_invalidation_channel: str = "spar_mapper_resolve_cache"
+    resolve_cache_invalidation_max_notifications: int = 20
+    # In seconds
+    resolve_cache_invalidation_reconnect_interval: int = 5
+
+    resolve_bloom_filter_enabled: bool = False
+    resolve_bloom_filter_false_positive_rate: float = 0.01
+    # The filter is sized for growth_factor times the current number of mappings
+    resolve_bloom_filter_growth_factor: float = 1.5
+    resolve_bloom_filter_min_items: int = 100000
+    # In seconds
+    resolve_bloom_filter_rebuild_interval: int = 3600
+    resolve_bloom_filter_retry_interval: int = 30
+
+    # /async requests are queued and processed by this many worker tasks.
+    # Requests are refused with rjct.queue.full while the queue is full.
+    async_job_workers: int = 10
+    async_job_queue_max_size: int = 1000
+    # In seconds
+    async_job_queue_drain_timeout: int = 30
+    # Jobs run in lanes, by action unless the sender is listed in
+    # async_job_sender_lanes. Busy lanes share the workers by weight, each lane
+    # running at most its concurrency. Unlisted lanes get weight 1 and no cap.
+    async_job_lane_weights: Dict[str, int] = {
+        "resolve": 8,
+        "unlink": 4,
+        "update": 2,
+        "link": 1,
+    }
+    async_job_lane_concurrency: Dict[str, int] = {
+        "resolve": 6,
+        "unlink": 4,
+        "update": 4,
+        "link": 4,
+    }
+    # Sender id to lane name, e.g. {"payments.example.org": "payments"}
+    async_job_sender_lanes: Dict[str, str] = {}
+    # memory or postgres. With postgres, /async requests are stored in the
+    # async_jobs table and processed by whichever worker process claims them.
+    # async_job_queue_max_size only applies to memory.
+    async_job_queue_backend: Literal["memory", "postgres"] = "memory"
+    # Disable to only store jobs in API processes, and leave them to
+    # `main.py worker` processes
+    async_job_consumer_enabled: bool = True
+    async_job_batch_size: int = 100
+    async_job_max_attempts: int = 3
+    # In seconds. Doubled after each failed attempt.
+    async_job_retry_delay: int = 10
+    async_job_poll_interval: int = 1
+    # In seconds. Claimed jobs not recorded by then are retried by any worker.
+    async_job_lease: int = 300
+
+    # Results of /async requests are kept for txn/status
+    txn_result_store_enabled: bool = True
+    # In seconds
+    txn_result_ttl: int = 86400
+    txn_result_sweep_interval: int = 300
+    # Max expired results deleted per statement
+    txn_result_sweep_batch_size: int = 10000
 
     default_callback_url: Optional[AnyUrl] = None
     default_callback_timeout: int = 10
+    # In seconds
+    callback_connect_timeout: int = 5
+    callback_max_connections: int = 100
+    callback_max_keepalive_connections: int = 20
+    # In seconds
+    callback_keepalive_expiry: int = 30
+    # Needs the h2 package (httpx[http2])
+    callback_http2: bool = False
+    # Per callback destination, i.e. scheme, host and port of the callback URL.
+    # Callbacks beyond max_pending waiting for a slot are rejected right away.
+    callback_destination_max_concurrency: int = 10
+    callback_destination_max_pending: int = 100
+    # The circuit breaker of a destination opens after this many consecutive
+    # failures. Callbacks to it are then rejected, or parked in the outbox.
+    callback_breaker_failure_threshold: int = 5
+    # In seconds. Then one trial callback is let through (half-open).
+    callback_breaker_reset_timeout: int = 30
+    # Callback destination to content encoding, for partners accepting compressed
+    # callbacks, e.g. {"https://payments.example.org": "gzip"}. Callbacks smaller
+    # than response_compression_min_size are sent as is.
+    callback_content_encodings: Dict[str, Literal["gzip", "zstd"]] = {}
+
+    # Async callbacks are written to the callback_outbox table and delivered
+    # with retries. When disabled, they are sent once, fire-and-forget.
+    callback_outbox_enabled: bool = True
+    callback_outbox_batch_size: int = 100
+    callback_outbox_concurrency: int = 20
+    callback_outbox_max_attempts: int = 10
+    # In seconds
+    callback_outbox_backoff_base: int = 5
+    callback_outbox_backoff_max: int = 3600
+    callback_outbox_poll_interval: int = 1
+    # In seconds. Claimed callbacks not recorded by then are retried by any worker.
+    callback_outbox_lease: int = 300
+    # Mounts GET /admin/callbacks/dead-letters and POST
+    # /admin/callbacks/dead-letters/replay. They are not authenticated, and dead
+    # letters hold callback payloads, so only enable them where the admin paths are
+    # protected, e.g. by the gateway or a network policy.
+    callback_outbox_admin_enabled: bool = False
     callback_sender_id: str = "mapper.dev.openg2p.net"
+
+    # Mounts GET /metrics, the internal counters of each worker process. Not
+    # authenticated, and shows queue depths, sender lane names and callback
+    # destination hosts, so only enable it where it is not reachable by clients.
+    metrics_enabled: bool = False
@@ -1,2 +1,4 @@
 from .async_mapper_controller import AsyncMapperController
+from .callback_outbox_controller import CallbackOutboxController
+from .metrics_controller import MetricsController
 from .sync_mapper_controller import SyncMapperController
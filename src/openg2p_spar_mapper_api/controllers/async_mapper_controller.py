@@ -1,8 +1,10 @@
 import asyncio
 import logging
 import uuid
+from typing import Annotated, Optional
 
-import httpx
+from fastapi import Header
+from openg2p_fastapi_common.context import dbengine
 from openg2p_fastapi_common.controller import BaseController
 from openg2p_g2pconnect_common_lib.schemas import (
     AsyncCallbackRequest,
@@ -12,20 +14,25 @@ from openg2p_g2pconnect_common_lib.schemas import (
 from openg2p_g2pconnect_mapper_lib.schemas import (
     LinkRequest,
     ResolveRequest,
-    SingleLinkResponse,
     SingleResolveResponse,
-    SingleUnlinkResponse,
-    SingleUpdateResponse,
     UnlinkRequest,
     UpdateRequest,
 )
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from ..config import Settings
+from ..errors import AsyncJobReasonCodeEnum
 from ..services import (
+    AsyncJobQueue,
     AsyncResponseHelper,
+    CallbackClient,
+    CallbackOutboxDispatcher,
     MapperService,
+    ReadReplica,
     RequestValidation,
     RequestValidationException,
+    TxnResultStore,
 )
 
 _config = Settings.get_config()
@@ -36,11 +43,10 @@ async def _callback(
     async_call_back_request: AsyncCallbackRequest, url, url_suffix=None
 ):
     try:
-        res = httpx.post(
+        res = await CallbackClient.get_component().post(
             f"{url.rstrip('/')}{url_suffix}",
-            headers={"content-type": "application/json"},
             content=async_call_back_request.model_dump_json(),
-            timeout=_config.default_callback_timeout,
+            headers={"content-type": "application/json"},
         )
 
         res.raise_for_status()
@@ -64,6 +70,20 @@ class AsyncMapperController(BaseController):
             "unlink": self.mapper_service.unlink,
         }
 
+        async_job_queue = AsyncJobQueue.get_component()
+        async_job_queue.register_handler(
+            "link", LinkRequest, self.handle_service_and_link_callback
+        )
+        async_job_queue.register_handler(
+            "update", UpdateRequest, self.handle_service_and_update_callback
+        )
+        async_job_queue.register_handler(
+            "resolve", ResolveRequest, self.handle_resolve_job
+        )
+        async_job_queue.register_handler(
+            "unlink", UnlinkRequest, self.handle_service_and_unlink_callback
+        )
+
         self.router.add_api_route(
             "/link",
             self.link_async,
@@ -91,9 +111,12 @@ class AsyncMapperController(BaseController):
 
     async def link_async(self, link_request: LinkRequest):
         correlation_id = str(uuid.uuid4())
-        await asyncio.create_task(
-            self.handle_service_and_link_callback(link_request, correlation_id, "link")
-        )
+        try:
+            await self.submit_job("link", link_request, correlation_id)
+        except RequestValidationException as e:
+            return AsyncResponseHelper.get_component().construct_error_async_response(
+                link_request, e
+            )
         return AsyncResponseHelper.get_component().construct_success_async_response(
             link_request,
             correlation_id,
@@ -101,23 +124,35 @@ class AsyncMapperController(BaseController):
 
     async def update_async(self, update_request: UpdateRequest):
         correlation_id = str(uuid.uuid4())
-        await asyncio.create_task(
-            self.handle_service_and_update_callback(
-                update_request, correlation_id, "update"
+        try:
+            await self.submit_job("update", update_request, correlation_id)
+        except RequestValidationException as e:
+            return AsyncResponseHelper.get_component().construct_error_async_response(
+                update_request, e
             )
-        )
         return AsyncResponseHelper.get_component().construct_success_async_response(
             update_request,
             correlation_id,
         )
 
-    async def resolve_async(self, resolve_request: ResolveRequest):
+    async def resolve_async(
+        self,
+        resolve_request: ResolveRequest,
+        x_force_primary: Annotated[bool, Header()] = False,
+    ):
         correlation_id = str(uuid.uuid4())
-        await asyncio.create_task(
-            self.handle_service_and_resolve_callback(
-                resolve_request, correlation_id, "resolve"
+
+        try:
+            await self.submit_job(
+                "resolve",
+                resolve_request,
+                correlation_id,
+                {"force_primary": x_force_primary},
+            )
+        except RequestValidationException as e:
+            return AsyncResponseHelper.get_component().construct_error_async_response(
+                resolve_request, e
             )
-        )
         return AsyncResponseHelper.get_component().construct_success_async_response(
             resolve_request,
             correlation_id,
@@ -137,16 +172,48 @@ class AsyncMapperController(BaseController):
                 )
             )
             return error_response
-        await asyncio.create_task(
-            self.handle_service_and_resolve_callback(
-                unlink_request, correlation_id, "unlink"
+        try:
+            await self.submit_job("unlink", unlink_request, correlation_id)
+        except RequestValidationException as e:
+            return AsyncResponseHelper.get_component().construct_error_async_response(
+                unlink_request, e
             )
-        )
         return AsyncResponseHelper.get_component().construct_success_async_response(
             unlink_request,
             correlation_id,
         )
 
+    @staticmethod
+    async def submit_job(
+        action: str,
+        request: BaseModel,
+        correlation_id: str,
+        options: Optional[dict] = None,
+    ) -> None:
+        """
+        Queues the job for the async job workers. Raises when the queue is full.
+        """
+        if not await AsyncJobQueue.get_component().submit(
+            action, request, correlation_id, options
+        ):
+            raise RequestValidationException(
+                code=AsyncJobReasonCodeEnum.rjct_queue_full.value,
+                message="Too many requests in progress. Retry later.",
+            )
+
+    async def handle_resolve_job(
+        self,
+        resolve_request: ResolveRequest,
+        correlation_id: str,
+        action: str,
+        force_primary: bool = False,
+    ):
+        # Runs in a worker task, so the choice of DB is passed along explicitly
+        with ReadReplica.force_primary(force_primary):
+            await self.handle_service_and_resolve_callback(
+                resolve_request, correlation_id, action
+            )
+
     async def handle_service_and_link_callback(
         self, link_request: LinkRequest, correlation_id: str, action: str
     ):
@@ -155,19 +222,10 @@ class AsyncMapperController(BaseController):
             RequestValidation.get_component().validate_link_async_request_header(
                 link_request
             )
-            single_link_responses: list[
-                SingleLinkResponse
-            ] = await self.action_to_method[action](link_request)
-
-            async_call_back_request: (
-                AsyncCallbackRequest
-            ) = AsyncResponseHelper.get_component().construct_success_async_callback_link_request(
-                link_request, correlation_id, single_link_responses
-            )
-            await self.make_callback(
-                async_call_back_request,
-                url=link_request.header.sender_uri,
-                url_suffix=f"/on-{action}",
+            await self.call_write_service_and_callback(
+                link_request,
+                correlation_id,
+                action,
             )
         except RequestValidationException as e:
             _logger.error(f"Error in handle_service_and_callback: {e}")
@@ -178,6 +236,8 @@ class AsyncMapperController(BaseController):
                 error_response,
                 url=link_request.header.sender_uri,
                 url_suffix=f"/on-{action}",
+                correlation_id=correlation_id,
+                transaction_id=link_request.message.transaction_id,
             )
 
     async def handle_service_and_update_callback(
@@ -188,18 +248,10 @@ class AsyncMapperController(BaseController):
             RequestValidation.get_component().validate_update_async_request_header(
                 request
             )
-            single_update_responses: list[
-                SingleUpdateResponse
-            ] = await self.action_to_method[action](request)
-            async_call_back_request: (
-                AsyncCallbackRequest
-            ) = AsyncResponseHelper.get_component().construct_success_async_callback_update_request(
-                request, correlation_id, single_update_responses
-            )
-            await self.make_callback(
-                async_call_back_request,
-                url=request.header.sender_uri,
-                url_suffix=f"/on-{action}",
+            await self.call_write_service_and_callback(
+                request,
+                correlation_id,
+                action,
             )
         except RequestValidationException as e:
             _logger.error(f"Error in handle_service_and_callback: {e}")
@@ -210,6 +262,8 @@ class AsyncMapperController(BaseController):
                 error_response,
                 url=request.header.sender_uri,
                 url_suffix=f"/on-{action}",
+                correlation_id=correlation_id,
+                transaction_id=request.message.transaction_id,
             )
 
     async def handle_service_and_resolve_callback(
@@ -223,15 +277,15 @@ class AsyncMapperController(BaseController):
             single_resolve_responses: list[
                 SingleResolveResponse
             ] = await self.action_to_method[action](request)
-            async_call_back_request: (
-                AsyncCallbackRequest
-            ) = AsyncResponseHelper.get_component().construct_success_async_callback_resolve_request(
-                request, correlation_id, single_resolve_responses
+            async_call_back_request = AsyncResponseHelper.get_component().construct_success_async_callback_request(
+                action, request, correlation_id, single_resolve_responses
             )
             await self.make_callback(
                 async_call_back_request,
                 url=request.header.sender_uri,
                 url_suffix=f"/on-{action}",
+                correlation_id=correlation_id,
+                transaction_id=request.message.transaction_id,
             )
         except RequestValidationException as e:
             _logger.error(f"Error in handle_service_and_callback: {e}")
@@ -242,6 +296,8 @@ class AsyncMapperController(BaseController):
                 error_response,
                 url=request.header.sender_uri,
                 url_suffix=f"/on-{action}",
+                correlation_id=correlation_id,
+                transaction_id=request.message.transaction_id,
             )
 
     async def handle_service_and_unlink_callback(
@@ -252,18 +308,10 @@ class AsyncMapperController(BaseController):
             RequestValidation.get_component().validate_unlink_async_request_header(
                 request
             )
-            single_unlink_responses: list[
-                SingleUnlinkResponse
-            ] = await self.action_to_method[action](request)
-            async_call_back_request: (
-                AsyncCallbackRequest
-            ) = AsyncResponseHelper.get_component().construct_success_async_callback_unlink_request(
-                request, correlation_id, single_unlink_responses
-            )
-            await self.make_callback(
-                async_call_back_request,
-                url=request.header.sender_uri,
-                url_suffix=f"/on-{action}",
+            await self.call_write_service_and_callback(
+                request,
+                correlation_id,
+                action,
             )
         except RequestValidationException as e:
             _logger.error(f"Error in handle_service_and_callback: {e}")
@@ -274,17 +322,120 @@ class AsyncMapperController(BaseController):
                 error_response,
                 url=request.header.sender_uri,
                 url_suffix=f"/on-{action}",
+                correlation_id=correlation_id,
+                transaction_id=request.message.transaction_id,
+            )
+
+    async def call_write_service_and_callback(
+        self,
+        request: Request,
+        correlation_id: str,
+        action: str,
+    ):
+        """
+        Runs a link/update/unlink and makes its success callback. The callback, and
+        the completion of the async job, are written in the same transaction as the
+        mapping change. Batches that never open a transaction get them written on
+        their own.
+        """
+        callback_request = None
+
+        async def write_callback(session, single_responses):
+            nonlocal callback_request
+            callback_request = AsyncResponseHelper.get_component().construct_success_async_callback_request(
+                action, request, correlation_id, single_responses
+            )
+            await self.make_callback(
+                callback_request,
+                url=request.header.sender_uri,
+                url_suffix=f"/on-{action}",
+                correlation_id=correlation_id,
+                transaction_id=request.message.transaction_id,
+                session=session,
             )
 
+        single_responses = await self.action_to_method[action](
+            request, before_commit=write_callback
+        )
+        if callback_request:
+            self.send_callback(
+                callback_request,
+                url=request.header.sender_uri,
+                url_suffix=f"/on-{action}",
+            )
+            return
+        await self.make_callback(
+            AsyncResponseHelper.get_component().construct_success_async_callback_request(
+                action, request, correlation_id, single_responses
+            ),
+            url=request.header.sender_uri,
+            url_suffix=f"/on-{action}",
+            correlation_id=correlation_id,
+            transaction_id=request.message.transaction_id,
+        )
+
     @staticmethod
     async def make_callback(
-        async_call_back_request: AsyncCallbackRequest, url=None, url_suffix=None
+        async_call_back_request: AsyncCallbackRequest,
+        url=None,
+        url_suffix=None,
+        correlation_id=None,
+        transaction_id=None,
+        session: Optional[AsyncSession] = None,
     ):
-        if not (url or _config.default_callback_url):
+        """
+        Stores the result for txn/status and writes the callback to the outbox, and
+        completes the running async job, all in one transaction. So a job claimed
+        again after a crash cannot store or send its result twice.
+        In the given session's transaction, after which the caller calls
+        send_callback(), or else in one of its own.
+        """
+        if not session:
+            session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+            async with session_maker() as session:
+                await AsyncMapperController.make_callback(
+                    async_call_back_request,
+                    url=url,
+                    url_suffix=url_suffix,
+                    correlation_id=correlation_id,
+                    transaction_id=transaction_id,
+                    session=session,
+                )
+                await session.commit()
+            AsyncMapperController.send_callback(
+                async_call_back_request, url=url, url_suffix=url_suffix
+            )
             return
-        elif not url:
-            url = _config.default_callback_url
 
+        await AsyncJobQueue.get_component().complete_job(session)
+        if correlation_id:
+            # Kept for txn/status, even when there is nowhere to call back
+            await TxnResultStore.get_component().put(
+                correlation_id, transaction_id, async_call_back_request, session=session
+            )
+        url = url or _config.default_callback_url
+        if url and _config.callback_outbox_enabled:
+            await CallbackOutboxDispatcher.get_component().enqueue(
+                f"{str(url).rstrip('/')}{url_suffix}",
+                async_call_back_request.model_dump_json(),
+                session=session,
+            )
+
+    @staticmethod
+    def send_callback(
+        async_call_back_request: AsyncCallbackRequest, url=None, url_suffix=None
+    ):
+        """
+        Called once make_callback's transaction has committed. Lets the outbox
+        deliver the callback right away, or without the outbox, sends it once,
+        fire-and-forget.
+        """
+        url = url or _config.default_callback_url
+        if not url:
+            return
+        if _config.callback_outbox_enabled:
+            CallbackOutboxDispatcher.get_component().wakeup()
+            return
         asyncio.ensure_future(
             _callback(async_call_back_request, url=url, url_suffix=url_suffix)
         )
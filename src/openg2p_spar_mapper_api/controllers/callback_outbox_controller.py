@@ -0,0 +1,46 @@
+from typing import List
+
+from openg2p_fastapi_common.controller import BaseController
+
+from ..schemas import DeadLetter, ReplayDeadLettersRequest, ReplayDeadLettersResponse
+from ..services import CallbackOutboxDispatcher
+
+
+class CallbackOutboxController(BaseController):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.router.prefix += "/admin/callbacks"
+        self.router.tags += ["Callback Outbox Admin"]
+
+        self.router.add_api_route(
+            "/dead-letters",
+            self.get_dead_letters,
+            responses={200: {"model": List[DeadLetter]}},
+            methods=["GET"],
+        )
+        self.router.add_api_route(
+            "/dead-letters/replay",
+            self.replay_dead_letters,
+            responses={200: {"model": ReplayDeadLettersResponse}},
+            methods=["POST"],
+        )
+
+    async def get_dead_letters(self, limit: int = 100, offset: int = 0):
+        """
+        Lists callbacks that failed callback_outbox_max_attempts times, or were
+        refused with a status that is not retryable.
+        """
+        dead_letters = await CallbackOutboxDispatcher.get_component().get_dead_letters(
+            limit, offset
+        )
+        return [DeadLetter.model_validate(row._mapping) for row in dead_letters]
+
+    async def replay_dead_letters(self, replay_request: ReplayDeadLettersRequest):
+        """
+        Queues dead letters for delivery again.
+        """
+        replayed = await CallbackOutboxDispatcher.get_component().replay_dead_letters(
+            replay_request.ids
+        )
+        return ReplayDeadLettersResponse(replayed=replayed)
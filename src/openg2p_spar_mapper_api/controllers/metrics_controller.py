@@ -0,0 +1,42 @@
+from openg2p_fastapi_common.controller import BaseController
+
+from ..services import (
+    AsyncJobQueue,
+    CallbackClient,
+    CallbackOutboxDispatcher,
+    ReadReplica,
+    ResolveBloomFilter,
+    ResolveCache,
+    ResolveCacheInvalidator,
+    TxnResultStore,
+)
+
+
+class MetricsController(BaseController):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.router.tags += ["Metrics"]
+
+        self.router.add_api_route(
+            "/metrics",
+            self.get_metrics,
+            methods=["GET"],
+        )
+
+    async def get_metrics(self):
+        """
+        Returns the internal counters of this worker process.
+        """
+        return {
+            "async_job_queue": AsyncJobQueue.get_component().get_metrics(),
+            "resolve_cache": ResolveCache.get_component().get_metrics(),
+            "resolve_cache_invalidation": (
+                ResolveCacheInvalidator.get_component().get_metrics()
+            ),
+            "resolve_bloom_filter": ResolveBloomFilter.get_component().get_metrics(),
+            "read_replica": ReadReplica.get_component().get_metrics(),
+            "callback_client": CallbackClient.get_component().get_metrics(),
+            "callback_outbox": CallbackOutboxDispatcher.get_component().get_metrics(),
+            "txn_result_store": TxnResultStore.get_component().get_metrics(),
+        }
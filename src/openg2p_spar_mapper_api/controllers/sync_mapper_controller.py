@@ -1,3 +1,8 @@
+import functools
+from typing import Annotated, Optional
+
+from fastapi import Header, Response
+from fastapi.responses import StreamingResponse
 from openg2p_fastapi_common.controller import BaseController
 from openg2p_g2pconnect_mapper_lib.schemas import (
     LinkRequest,
@@ -7,19 +12,49 @@ from openg2p_g2pconnect_mapper_lib.schemas import (
     SingleLinkResponse,
     SingleResolveResponse,
     SingleUpdateResponse,
+    TxnStatusRequest,
+    TxnStatusResponse,
     UnlinkRequest,
     UnlinkResponse,
     UpdateRequest,
     UpdateResponse,
 )
+from pydantic import BaseModel
 
+from ..config import Settings
 from ..services import (
     MapperService,
+    ReadReplica,
     RequestValidation,
     RequestValidationException,
     SyncResponseHelper,
+    TxnResultStore,
 )
 
+_config = Settings.get_config()
+
+_NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _json_response(endpoint):
+    """
+    Serializes the response model returned by the endpoint straight to JSON bytes
+    with its pydantic-core serializer, instead of FastAPI's jsonable_encoder and
+    json.dumps. The OpenAPI schema still comes from the route's responses.
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        response = await endpoint(*args, **kwargs)
+        if not (_config.sync_response_fast_json and isinstance(response, BaseModel)):
+            return response
+        return Response(
+            content=response.__pydantic_serializer__.to_json(response, by_alias=True),
+            media_type="application/json",
+        )
+
+    return wrapper
+
 
 class SyncMapperController(BaseController):
     def __init__(self, **kwargs):
@@ -32,28 +67,43 @@ class SyncMapperController(BaseController):
 
         self.router.add_api_route(
             "/link",
-            self.link_sync,
+            _json_response(self.link_sync),
             responses={200: {"model": LinkResponse}},
             methods=["POST"],
         )
         self.router.add_api_route(
             "/update",
-            self.update_sync,
+            _json_response(self.update_sync),
             responses={200: {"model": UpdateResponse}},
             methods=["POST"],
         )
         self.router.add_api_route(
             "/resolve",
-            self.resolve_sync,
-            responses={200: {"model": ResolveResponse}},
+            _json_response(self.resolve_sync),
+            responses={
+                200: {
+                    "model": ResolveResponse,
+                    "content": {_NDJSON_MEDIA_TYPE: {}},
+                    "description": (
+                        f"{_NDJSON_MEDIA_TYPE} when asked for by Accept or "
+                        "stream=true"
+                    ),
+                }
+            },
             methods=["POST"],
         )
         self.router.add_api_route(
             "/unlink",
-            self.unlink_sync,
+            _json_response(self.unlink_sync),
             responses={200: {"model": UnlinkResponse}},
             methods=["POST"],
         )
+        self.router.add_api_route(
+            "/txn/status",
+            _json_response(self.txn_status_sync),
+            responses={200: {"model": TxnStatusResponse}},
+            methods=["POST"],
+        )
 
     async def link_sync(self, link_request: LinkRequest):
         try:
@@ -70,9 +120,8 @@ class SyncMapperController(BaseController):
         single_link_responses: list[
             SingleLinkResponse
         ] = await self.mapper_service.link(link_request)
-        return SyncResponseHelper.get_component().construct_success_sync_link_response(
-            link_request,
-            single_link_responses,
+        return SyncResponseHelper.get_component().construct_success_sync_response(
+            "link", link_request, single_link_responses
         )
 
     async def update_sync(self, update_request: UpdateRequest):
@@ -92,14 +141,20 @@ class SyncMapperController(BaseController):
         single_update_responses: list[
             SingleUpdateResponse
         ] = await self.mapper_service.update(update_request)
-        return (
-            SyncResponseHelper.get_component().construct_success_sync_update_response(
-                update_request,
-                single_update_responses,
-            )
+        return SyncResponseHelper.get_component().construct_success_sync_response(
+            "update", update_request, single_update_responses
         )
 
-    async def resolve_sync(self, resolve_request: ResolveRequest):
+    async def resolve_sync(
+        self,
+        resolve_request: ResolveRequest,
+        x_force_primary: Annotated[bool, Header()] = False,
+        accept: Annotated[Optional[str], Header()] = None,
+        stream: bool = False,
+    ):
+        # Large batches can be streamed as NDJSON, see
+        # SyncResponseHelper.stream_success_sync_response, so memory does not grow
+        # with the batch size
         try:
             RequestValidation.get_component().validate_request(resolve_request)
             RequestValidation.get_component().validate_resolve_request_header(
@@ -113,14 +168,28 @@ class SyncMapperController(BaseController):
             )
             return error_response
 
-        single_resolve_responses: list[
-            SingleResolveResponse
-        ] = await self.mapper_service.resolve(resolve_request)
-        return (
-            SyncResponseHelper.get_component().construct_success_sync_resolve_response(
-                resolve_request,
-                single_resolve_responses,
+        if stream or _NDJSON_MEDIA_TYPE in (accept or ""):
+            return StreamingResponse(
+                SyncResponseHelper.get_component().stream_success_sync_response(
+                    "resolve",
+                    resolve_request,
+                    len(resolve_request.message.resolve_request),
+                    self.mapper_service.resolve_in_chunks(
+                        resolve_request,
+                        _config.resolve_stream_chunk_size,
+                        force_primary=x_force_primary,
+                    ),
+                ),
+                media_type=_NDJSON_MEDIA_TYPE,
             )
+
+        # Lets a caller read its own recent writes, which a lagging replica may miss
+        with ReadReplica.force_primary(x_force_primary):
+            single_resolve_responses: list[
+                SingleResolveResponse
+            ] = await self.mapper_service.resolve(resolve_request)
+        return SyncResponseHelper.get_component().construct_success_sync_response(
+            "resolve", resolve_request, single_resolve_responses
         )
 
     async def unlink_sync(self, unlink_request: UnlinkRequest):
@@ -140,9 +209,31 @@ class SyncMapperController(BaseController):
         single_unlink_responses: list[
             SingleResolveResponse
         ] = await self.mapper_service.unlink(unlink_request)
-        return (
-            SyncResponseHelper.get_component().construct_success_sync_unlink_response(
-                unlink_request,
-                single_unlink_responses,
+        return SyncResponseHelper.get_component().construct_success_sync_response(
+            "unlink", unlink_request, single_unlink_responses
+        )
+
+    async def txn_status_sync(self, txn_status_request: TxnStatusRequest):
+        """
+        Returns the stored results of earlier /async requests, by correlation_id
+        or transaction_id.
+        """
+        try:
+            RequestValidation.get_component().validate_request(txn_status_request)
+            RequestValidation.get_component().validate_txn_status_request_header(
+                txn_status_request
+            )
+        except RequestValidationException as e:
+            error_response = (
+                SyncResponseHelper.get_component().construct_error_sync_response(
+                    txn_status_request, e
+                )
             )
+            return error_response
+
+        single_txn_status_responses = (
+            await TxnResultStore.get_component().get_txn_status(txn_status_request)
+        )
+        return SyncResponseHelper.get_component().construct_success_sync_response(
+            "txn-status", txn_status_request, single_txn_status_responses
         )
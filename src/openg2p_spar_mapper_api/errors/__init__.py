@@ -0,0 +1 @@
+from .error_codes import AsyncJobReasonCodeEnum, TxnStatusReasonCodeEnum
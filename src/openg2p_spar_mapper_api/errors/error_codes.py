@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class AsyncJobReasonCodeEnum(Enum):
+    rjct_queue_full = "rjct.queue.full"
+
+
+class TxnStatusReasonCodeEnum(Enum):
+    rjct_txn_not_found = "rjct.txn.not_found"
+    rjct_attribute_type_not_supported = "rjct.attribute_type.not_supported"
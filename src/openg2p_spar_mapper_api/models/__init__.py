@@ -1 +1,4 @@
+from .async_job import AsyncJob, AsyncJobStatus
+from .callback_outbox import CallbackOutbox, CallbackOutboxStatus
 from .id_fa_mapping import IdFaMapping
+from .txn_result import TxnResult
@@ -0,0 +1,41 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from openg2p_fastapi_common.models import BaseORMModelWithTimes
+from sqlalchemy import JSON, DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class AsyncJobStatus(Enum):
+    pending = "pending"
+    dead = "dead"
+
+
+class AsyncJob(BaseORMModelWithTimes):
+    """
+    /async requests waiting to be processed, when async_job_queue_backend is
+    postgres. Rows are deleted once processed, and kept with status dead after
+    too many failed attempts.
+    """
+
+    __tablename__ = "async_jobs"
+    __table_args__ = (
+        # Due jobs are claimed per lane
+        Index(
+            "ix_async_jobs_status_lane_next_attempt_at",
+            "status",
+            "lane",
+            "next_attempt_at",
+        ),
+    )
+
+    correlation_id: Mapped[str] = mapped_column(String(), index=True, unique=True)
+    action: Mapped[str] = mapped_column(String())
+    lane: Mapped[str] = mapped_column(String())
+    payload: Mapped[str] = mapped_column(Text())
+    options: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON(), default=None)
+    status: Mapped[str] = mapped_column(String(), default=AsyncJobStatus.pending.value)
+    attempts: Mapped[int] = mapped_column(Integer(), default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime())
+    last_error: Mapped[Optional[str]] = mapped_column(Text())
@@ -0,0 +1,34 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from openg2p_fastapi_common.models import BaseORMModelWithTimes
+from sqlalchemy import DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class CallbackOutboxStatus(Enum):
+    pending = "pending"
+    dead = "dead"
+
+
+class CallbackOutbox(BaseORMModelWithTimes):
+    """
+    Async callbacks waiting to be delivered. Rows are deleted once delivered,
+    and kept with status dead after too many failed attempts.
+    """
+
+    __tablename__ = "callback_outbox"
+    __table_args__ = (
+        # Claiming due rows never scans delivered history or dead letters
+        Index("ix_callback_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    url: Mapped[str] = mapped_column(String())
+    payload: Mapped[str] = mapped_column(Text())
+    status: Mapped[str] = mapped_column(
+        String(), default=CallbackOutboxStatus.pending.value
+    )
+    attempts: Mapped[int] = mapped_column(Integer(), default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime())
+    last_error: Mapped[Optional[str]] = mapped_column(Text())
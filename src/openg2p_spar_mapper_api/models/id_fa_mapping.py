@@ -1,8 +1,8 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 from openg2p_fastapi_common.context import dbengine
 from openg2p_fastapi_common.models import BaseORMModelWithTimes
-from sqlalchemy import JSON, String, select
+from sqlalchemy import JSON, Row, String, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -46,3 +46,96 @@ class IdFaMapping(BaseORMModelWithTimes):
             await session.aclose()
 
         return response
+
+    @classmethod
+    async def get_id_fa_values_by_id_values(
+        cls, session, id_values: Iterable[str], chunk_size: int
+    ) -> Dict[str, Row]:
+        """
+        Fetches the id_value and fa_value of the mappings of all the given ids, using
+        one SELECT ... WHERE id_value IN (...) per chunk of ids. Returns plain rows,
+        not ORM instances, as a dict of id_value to row. Missing ids are absent.
+        """
+        id_values = list(dict.fromkeys(id_value for id_value in id_values if id_value))
+        response = {}
+        for i in range(0, len(id_values), chunk_size):
+            result = await session.execute(
+                select(cls.id_value, cls.fa_value).where(
+                    cls.id_value.in_(id_values[i : i + chunk_size])
+                )
+            )
+            for row in result:
+                response[row.id_value] = row
+        return response
+
+    @classmethod
+    async def get_linked_id_values(
+        cls, session, id_values: Iterable[str], chunk_size: int
+    ) -> Set[str]:
+        """
+        Returns which of the given ids are mapped. Only id_value is selected,
+        so this can be answered from the unique index alone.
+        """
+        id_values = list(dict.fromkeys(id_value for id_value in id_values if id_value))
+        response = set()
+        for i in range(0, len(id_values), chunk_size):
+            result = await session.execute(
+                select(cls.id_value).where(
+                    cls.id_value.in_(id_values[i : i + chunk_size])
+                )
+            )
+            response.update(result.scalars())
+        return response
+
+    @classmethod
+    async def get_resolve_details_by_id_values(
+        cls, session, id_values: Iterable[str], chunk_size: int
+    ) -> Dict[str, Row]:
+        """
+        Like get_id_fa_values_by_id_values, but also selects the additional_info
+        returned by a details resolve.
+        """
+        id_values = list(dict.fromkeys(id_value for id_value in id_values if id_value))
+        response = {}
+        for i in range(0, len(id_values), chunk_size):
+            result = await session.execute(
+                select(cls.id_value, cls.fa_value, cls.additional_info).where(
+                    cls.id_value.in_(id_values[i : i + chunk_size])
+                )
+            )
+            for row in result:
+                response[row.id_value] = row
+        return response
+
+    @classmethod
+    async def get_id_values_by_fa_values(
+        cls,
+        session,
+        fa_values: Iterable[str],
+        chunk_size: int,
+        max_ids_per_fa: Optional[int] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Fetches the ids linked to each of the given FAs, using the fa_value index.
+        Returns a dict of fa_value to sorted id_values, at most max_ids_per_fa of
+        them per FA. FAs with no ids are absent.
+        """
+        fa_values = list(dict.fromkeys(fa_value for fa_value in fa_values if fa_value))
+        response = {}
+        for i in range(0, len(fa_values), chunk_size):
+            stmt = select(cls.fa_value, cls.id_value).where(
+                cls.fa_value.in_(fa_values[i : i + chunk_size])
+            )
+            if max_ids_per_fa is not None:
+                ranked = stmt.add_columns(
+                    func.row_number()
+                    .over(partition_by=cls.fa_value, order_by=cls.id_value)
+                    .label("rank")
+                ).subquery()
+                stmt = select(ranked.c.fa_value, ranked.c.id_value).where(
+                    ranked.c.rank <= max_ids_per_fa
+                )
+            result = await session.execute(stmt.order_by("fa_value", "id_value"))
+            for fa_value, id_value in result:
+                response.setdefault(fa_value, []).append(id_value)
+        return response
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+
+from openg2p_fastapi_common.models import BaseORMModelWithTimes
+from sqlalchemy import DateTime, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class TxnResult(BaseORMModelWithTimes):
+    """
+    Results of /async requests, kept for txn/status until expires_at.
+    result is the zlib compressed JSON of the callback sent to the sender.
+    """
+
+    __tablename__ = "txn_results"
+
+    correlation_id: Mapped[str] = mapped_column(String(), index=True, unique=True)
+    transaction_id: Mapped[Optional[str]] = mapped_column(String(), index=True)
+    sender_id: Mapped[Optional[str]] = mapped_column(String())
+    action: Mapped[str] = mapped_column(String())
+    result: Mapped[bytes] = mapped_column(LargeBinary())
+    expires_at: Mapped[datetime] = mapped_column(DateTime(), index=True)
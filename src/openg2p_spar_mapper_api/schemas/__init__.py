@@ -0,0 +1,5 @@
+from .callback_outbox import (
+    DeadLetter,
+    ReplayDeadLettersRequest,
+    ReplayDeadLettersResponse,
+)
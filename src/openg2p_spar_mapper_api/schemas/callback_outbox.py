@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class DeadLetter(BaseModel):
+    id: int
+    url: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class ReplayDeadLettersRequest(BaseModel):
+    # Replays every dead letter when not given
+    ids: Optional[List[int]] = None
+
+
+class ReplayDeadLettersResponse(BaseModel):
+    replayed: int
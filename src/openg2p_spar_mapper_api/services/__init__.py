@@ -1,6 +1,25 @@
-from .exceptions import LinkValidationException, RequestValidationException
+from .async_job_queue import AsyncJobLane, AsyncJobQueue
+from .callback_client import CallbackClient
+from .callback_outbox import CallbackOutboxDispatcher
+from .compression import CompressionMiddleware
+from .exceptions import (
+    AsyncJobLeaseLostException,
+    CallbackRejectedException,
+    LinkValidationException,
+    RequestValidationException,
+)
 from .id_fa_mapping_validations import IdFaMappingValidations
 from .mapper import MapperService
+from .postgres_async_job_queue import PostgresAsyncJobQueue
+from .read_replica import ReadReplica
 from .request_helper import AsyncRequestHelper, SyncRequestHelper
 from .request_validations import RequestValidation
+from .resolve_bloom_filter import BloomFilter, ResolveBloomFilter
+from .resolve_cache import ResolveCache
+from .resolve_cache_invalidation import (
+    InProcessInvalidationChannel,
+    PostgresInvalidationChannel,
+    ResolveCacheInvalidator,
+)
 from .response_helper import AsyncResponseHelper, SyncResponseHelper
+from .txn_result_store import TxnResultStore
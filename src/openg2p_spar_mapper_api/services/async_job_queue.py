@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Type
+
+from openg2p_fastapi_common.service import BaseService
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import Settings
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+# Called as handler(request, correlation_id, action, **options)
+JobHandler = Callable[..., Awaitable[None]]
+
+
+class AsyncJobLane:
+    """
+    Jobs of one action or sender, with the weight and concurrency cap of the lane
+    and its counters.
+    """
+
+    def __init__(self, name: str, weight: int, concurrency: int):
+        self.name = name
+        self.weight = weight
+        self.concurrency = concurrency
+        self.jobs: Deque[tuple] = deque()
+        # For smooth weighted round robin
+        self.current_weight = 0
+
+        self.in_flight = 0
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @property
+    def free(self) -> int:
+        return max(self.concurrency - self.in_flight, 0)
+
+    def record_start(self, wait_seconds: float) -> None:
+        self.in_flight += 1
+        self.started += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def get_metrics(self) -> dict:
+        return {
+            "weight": self.weight,
+            "concurrency": self.concurrency,
+            "depth": len(self.jobs),
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.started if self.started else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+class AsyncJobQueue(BaseService):
+    """
+    Bounded in-process queue for /async requests, drained by
+    async_job_workers worker tasks. The endpoint only enqueues, so the ack does not
+    wait for the DB work. When the queue is full, submit() refuses the job instead
+    of letting work pile up in memory.
+
+    Jobs are an action, its request and options, run by the handler registered for
+    the action. So the same jobs can also be stored, see PostgresAsyncJobQueue.
+
+    Each job goes to a lane, by sender (async_job_sender_lanes) or else by action.
+    Free workers take the next job from the lanes below their concurrency cap by
+    smooth weighted round robin, so a large link batch cannot hold back resolves.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._handlers: Dict[str, Tuple[Type[BaseModel], JobHandler]] = {}
+        self._lanes: Dict[str, AsyncJobLane] = {}
+        self._condition = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+        self._accepting = True
+        self.max_size = _config.async_job_queue_max_size
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def register_handler(
+        self, action: str, request_type: Type[BaseModel], handler: JobHandler
+    ) -> None:
+        self._handlers[action] = (request_type, handler)
+
+    def get_lane(self, name: str) -> AsyncJobLane:
+        lane = self._lanes.get(name)
+        if not lane:
+            lane = self._lanes[name] = AsyncJobLane(
+                name,
+                _config.async_job_lane_weights.get(name, 1),
+                _config.async_job_lane_concurrency.get(name, _config.async_job_workers),
+            )
+        return lane
+
+    def get_lane_name(self, action: str, request: BaseModel) -> str:
+        header = getattr(request, "header", None)
+        sender_id = getattr(header, "sender_id", None)
+        return _config.async_job_sender_lanes.get(sender_id) or action
+
+    @staticmethod
+    def next_lane(lanes: List[AsyncJobLane]) -> AsyncJobLane:
+        """
+        Smooth weighted round robin, as in nginx. Over any run of picks, each lane
+        is picked in proportion to its weight, without bursts of the same lane.
+        """
+        total_weight = 0
+        picked = None
+        for lane in lanes:
+            lane.current_weight += lane.weight
+            total_weight += lane.weight
+            if not picked or lane.current_weight > picked.current_weight:
+                picked = lane
+        picked.current_weight -= total_weight
+        return picked
+
+    async def run_job(
+        self,
+        action: str,
+        request: BaseModel,
+        correlation_id: str,
+        options: Optional[dict] = None,
+    ) -> None:
+        _, handler = self._handlers[action]
+        await handler(request, correlation_id, action, **(options or {}))
+
+    async def complete_job(self, session: AsyncSession) -> None:
+        """
+        Called by handlers with the transaction writing the outcome of the running
+        job, so stored jobs are marked done by that same commit. Jobs of this queue
+        are never run again, so there is nothing to record.
+        """
+
+    async def submit(
+        self,
+        action: str,
+        request: BaseModel,
+        correlation_id: str,
+        options: Optional[dict] = None,
+    ) -> bool:
+        """
+        Returns False if the job was refused, because the queue is full or draining.
+        """
+        if not self._accepting or self.depth >= self.max_size:
+            self.rejected += 1
+            return False
+        lane = self.get_lane(self.get_lane_name(action, request))
+        async with self._condition:
+            lane.jobs.append(
+                (action, request, correlation_id, options, time.monotonic())
+            )
+            lane.submitted += 1
+            self.submitted += 1
+            self._condition.notify()
+        return True
+
+    def _runnable_lanes(self) -> List[AsyncJobLane]:
+        return [lane for lane in self._lanes.values() if lane.jobs and lane.free]
+
+    async def _work(self) -> None:
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(self._runnable_lanes)
+                lane = self.next_lane(self._runnable_lanes())
+                *job, enqueued_at = lane.jobs.popleft()
+                lane.record_start(time.monotonic() - enqueued_at)
+            try:
+                await self.run_job(*job)
+                lane.completed += 1
+                self.completed += 1
+            except Exception as e:
+                lane.failed += 1
+                self.failed += 1
+                _logger.error(f"Error in async job: {e}")
+            finally:
+                async with self._condition:
+                    lane.in_flight -= 1
+                    # The lane may have been at its cap, and stop() may be waiting
+                    self._condition.notify_all()
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._accepting = True
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(_config.async_job_workers)
+        ]
+
+    async def stop(self) -> None:
+        """
+        Stops accepting jobs and waits up to async_job_queue_drain_timeout for the
+        queued and in-flight ones to finish.
+        """
+        if not self._workers:
+            return
+        self._accepting = False
+        try:
+            async with self._condition:
+                await asyncio.wait_for(
+                    self._condition.wait_for(
+                        lambda: not self.depth and not self.in_flight
+                    ),
+                    _config.async_job_queue_drain_timeout,
+                )
+        except asyncio.TimeoutError:
+            _logger.warning(
+                f"Async job queue not drained at shutdown. "
+                f"{self.depth + self.in_flight} jobs dropped"
+            )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def depth(self) -> int:
+        return sum(len(lane.jobs) for lane in self._lanes.values())
+
+    @property
+    def in_flight(self) -> int:
+        return sum(lane.in_flight for lane in self._lanes.values())
+
+    def get_metrics(self) -> dict:
+        return {
+            "backend": "memory",
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "workers": len(self._workers),
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "lanes": {
+                name: lane.get_metrics() for name, lane in sorted(self._lanes.items())
+            },
+        }
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import httpx
+from openg2p_fastapi_common.service import BaseService
+
+from ..config import Settings
+from .compression import compress_async, get_supported_encodings
+from .exceptions import CallbackRejectedException
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """
+    Whether a callback answered with this status may succeed if sent again, i.e. the
+    destination failed rather than the callback. These count as failures for the
+    circuit breaker. Other 3xx/4xx are permanent and dead-lettered right away.
+    """
+    return status_code >= 500 or status_code in (408, 429)
+
+
+class CallbackBreakerState(Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CallbackDestination:
+    """
+    Concurrency limit and circuit breaker of one callback destination.
+    """
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.semaphore = asyncio.Semaphore(_config.callback_destination_max_concurrency)
+        self.state = CallbackBreakerState.closed
+        self.consecutive_failures = 0
+        # time.monotonic() of the last time the breaker opened
+        self.opened_at = 0.0
+        self.trial_in_progress = False
+
+        self.pending = 0
+        self.in_flight = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def get_retry_after(self) -> float:
+        return max(
+            self.opened_at + _config.callback_breaker_reset_timeout - time.monotonic(),
+            0.0,
+        )
+
+    def admit(self) -> bool:
+        """
+        Raises CallbackRejectedException if a callback cannot be sent now.
+        Returns True if it is the trial callback of a half-open breaker.
+        """
+        if self.state == CallbackBreakerState.open:
+            retry_after = self.get_retry_after()
+            if retry_after:
+                self.rejected += 1
+                raise CallbackRejectedException(
+                    f"Circuit breaker open for {self.origin}", retry_after
+                )
+            self.state = CallbackBreakerState.half_open
+        if self.state == CallbackBreakerState.half_open:
+            if self.trial_in_progress:
+                self.rejected += 1
+                raise CallbackRejectedException(
+                    f"Circuit breaker half-open for {self.origin}",
+                    _config.callback_breaker_reset_timeout,
+                )
+            self.trial_in_progress = True
+            return True
+        if self.pending >= _config.callback_destination_max_pending:
+            self.rejected += 1
+            raise CallbackRejectedException(
+                f"Too many callbacks waiting for {self.origin}", 1.0
+            )
+        return False
+
+    def record_result(self, success: bool, trial: bool) -> None:
+        if trial:
+            self.trial_in_progress = False
+        if success:
+            self.succeeded += 1
+            self.consecutive_failures = 0
+            self.state = CallbackBreakerState.closed
+            return
+        self.failed += 1
+        self.consecutive_failures += 1
+        if trial or (
+            self.state == CallbackBreakerState.closed
+            and self.consecutive_failures >= _config.callback_breaker_failure_threshold
+        ):
+            if self.state != CallbackBreakerState.open:
+                self.opened += 1
+                _logger.warning(
+                    f"Circuit breaker open for callbacks to {self.origin} after "
+                    f"{self.consecutive_failures} consecutive failures"
+                )
+            self.state = CallbackBreakerState.open
+            self.opened_at = time.monotonic()
+
+    def get_metrics(self) -> dict:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after": (
+                self.get_retry_after()
+                if self.state == CallbackBreakerState.open
+                else 0.0
+            ),
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+class CallbackClient(BaseService):
+    """
+    Shared, non-blocking HTTP client for async callbacks. Connections are pooled
+    and kept alive per partner origin, so repeated callbacks to the same sender_uri
+    reuse them instead of opening a new TCP/TLS connection each time.
+
+    Each destination gets at most callback_destination_max_concurrency callbacks
+    at a time, and a circuit breaker, so a partner outage cannot pile up callbacks
+    waiting out their timeouts. Connection errors and retryable statuses (see
+    is_retryable_status) count as failures.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.client: Optional[httpx.AsyncClient] = None
+        self.destinations: Dict[str, CallbackDestination] = {}
+
+    def construct_client(self) -> httpx.AsyncClient:
+        kwargs = {
+            "limits": httpx.Limits(
+                max_connections=_config.callback_max_connections,
+                max_keepalive_connections=_config.callback_max_keepalive_connections,
+                keepalive_expiry=_config.callback_keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(
+                _config.default_callback_timeout,
+                connect=_config.callback_connect_timeout,
+            ),
+        }
+        if _config.callback_http2:
+            try:
+                return httpx.AsyncClient(http2=True, **kwargs)
+            except ImportError:
+                _logger.warning(
+                    "HTTP/2 for callbacks needs the h2 package. Falling back to HTTP/1.1"
+                )
+        return httpx.AsyncClient(**kwargs)
+
+    async def start(self) -> None:
+        if not self.client:
+            self.client = self.construct_client()
+
+    async def stop(self) -> None:
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def get_destination(self, url: str) -> CallbackDestination:
+        split_url = urlsplit(url)
+        origin = f"{split_url.scheme}://{split_url.netloc}"
+        destination = self.destinations.get(origin)
+        if not destination:
+            destination = self.destinations[origin] = CallbackDestination(origin)
+        return destination
+
+    async def encode_content(
+        self, destination: CallbackDestination, content: str, headers: dict
+    ) -> Tuple[Union[str, bytes], dict]:
+        """
+        Compresses callbacks to destinations listed in callback_content_encodings.
+        """
+        encoding = _config.callback_content_encodings.get(destination.origin)
+        if not encoding or len(content) < _config.response_compression_min_size:
+            return content, headers
+        if encoding not in get_supported_encodings():
+            _logger.warning(
+                f"Compressed callbacks to {destination.origin} need the zstandard "
+                "package. Sending them uncompressed"
+            )
+            return content, headers
+        return (
+            await compress_async(content.encode(), encoding),
+            {**headers, "content-encoding": encoding},
+        )
+
+    async def post(self, url: str, content: str, headers: dict) -> httpx.Response:
+        """
+        Raises CallbackRejectedException, without sending, while the destination's
+        breaker is open or too many callbacks to it are waiting.
+        """
+        if not self.client:
+            await self.start()
+        destination = self.get_destination(url)
+        trial = destination.admit()
+        sent = False
+        success = False
+        destination.pending += 1
+        try:
+            # In the try, so a trial is given back if encoding fails
+            content, headers = await self.encode_content(destination, content, headers)
+            async with destination.semaphore:
+                destination.pending -= 1
+                sent = True
+                destination.in_flight += 1
+                try:
+                    res = await self.client.post(url, content=content, headers=headers)
+                finally:
+                    destination.in_flight -= 1
+            success = not is_retryable_status(res.status_code)
+            return res
+        finally:
+            if sent:
+                destination.record_result(success, trial)
+            else:
+                destination.pending -= 1
+                if trial:
+                    destination.trial_in_progress = False
+
+    def get_metrics(self) -> dict:
+        return {
+            "destinations": {
+                origin: destination.get_metrics()
+                for origin, destination in sorted(self.destinations.items())
+            }
+        }
@@ -0,0 +1,379 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+import httpx
+from openg2p_fastapi_common.context import dbengine
+from openg2p_fastapi_common.service import BaseService
+from sqlalchemy import Row, bindparam, delete, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..config import Settings
+from ..models import CallbackOutbox, CallbackOutboxStatus
+from .callback_client import CallbackClient, is_retryable_status
+from .exceptions import CallbackRejectedException
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
+
+class CallbackOutboxDispatcher(BaseService):
+    """
+    Delivers async callbacks from the callback_outbox table.
+
+    Each worker claims due rows for its free delivery slots
+    (callback_outbox_concurrency) with one UPDATE ... WHERE id IN
+    (SELECT ... FOR UPDATE SKIP LOCKED), which pushes their next_attempt_at out by
+    callback_outbox_lease. Slots are refilled as deliveries finish, so a slow
+    destination only holds up its own callbacks. If the worker dies mid-delivery,
+    any worker retries the rows once the lease expires, so delivery is
+    at-least-once. Failures are retried with exponential backoff and jitter, and
+    dead-lettered after callback_outbox_max_attempts. Callbacks refused with a
+    status that is not retryable (see is_retryable_status) are dead-lettered
+    right away.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self.in_flight = 0
+
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.dead_lettered = 0
+        self.parked = 0
+        self.replayed = 0
+
+    async def enqueue(
+        self, url: str, payload: str, session: Optional[AsyncSession] = None
+    ) -> None:
+        """
+        Adds a callback to the outbox. When a session is given, the row is only
+        written if that session's transaction commits.
+        """
+        now = _utcnow()
+        callback_outbox = CallbackOutbox(
+            url=url,
+            payload=payload,
+            status=CallbackOutboxStatus.pending.value,
+            attempts=0,
+            next_attempt_at=now,
+            active=True,
+            created_at=now,
+            updated_at=now,
+        )
+        if session:
+            session.add(callback_outbox)
+            return
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            session.add(callback_outbox)
+            await session.commit()
+        self.wakeup()
+
+    def wakeup(self) -> None:
+        """
+        Lets the dispatcher of this worker look for due callbacks right away.
+        """
+        self._wakeup.set()
+
+    async def claim_due(self, session: AsyncSession, limit: int) -> List[Row]:
+        now = _utcnow()
+        due_ids = (
+            select(CallbackOutbox.id)
+            .where(
+                CallbackOutbox.status == CallbackOutboxStatus.pending.value,
+                CallbackOutbox.next_attempt_at <= now,
+            )
+            .order_by(CallbackOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(CallbackOutbox)
+            .where(CallbackOutbox.id.in_(due_ids))
+            .values(
+                next_attempt_at=now + timedelta(seconds=_config.callback_outbox_lease),
+                attempts=CallbackOutbox.attempts + 1,
+                updated_at=now,
+            )
+            .returning(
+                CallbackOutbox.id,
+                CallbackOutbox.url,
+                CallbackOutbox.payload,
+                CallbackOutbox.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return list(result)
+
+    async def deliver(self, callback: Row) -> Optional[Exception]:
+        """
+        Returns None if delivered, otherwise the error. Frees the delivery slot
+        claimed for the callback.
+        """
+        try:
+            res = await CallbackClient.get_component().post(
+                callback.url,
+                content=callback.payload,
+                headers={"content-type": "application/json"},
+            )
+            res.raise_for_status()
+            return None
+        except Exception as e:
+            return e
+        finally:
+            self.in_flight -= 1
+            self._wakeup.set()
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return is_retryable_status(error.response.status_code)
+        # Not sent, or no response
+        return True
+
+    def get_retry_delay(self, attempts: int) -> float:
+        delay = min(
+            _config.callback_outbox_backoff_base * 2 ** (attempts - 1),
+            _config.callback_outbox_backoff_max,
+        )
+        # Equal jitter, so callbacks failed by the same outage do not retry in lockstep
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def record_results(
+        self,
+        session: AsyncSession,
+        callbacks: List[Row],
+        errors: List[Optional[Exception]],
+    ) -> None:
+        # Every write is limited to the claim the callback was delivered under, so
+        # it cannot touch a callback claimed again by another worker once the
+        # lease expired.
+        delivered = [
+            (callback.id, callback.attempts)
+            for callback, error in zip(callbacks, errors)
+            if not error
+        ]
+        if delivered:
+            await session.execute(
+                delete(CallbackOutbox)
+                .where(
+                    tuple_(CallbackOutbox.id, CallbackOutbox.attempts).in_(delivered)
+                )
+                .execution_options(synchronize_session=False)
+            )
+        now = _utcnow()
+        failed = []
+        parked = 0
+        for callback, error in zip(callbacks, errors):
+            if not error:
+                continue
+            if isinstance(error, CallbackRejectedException):
+                # Not attempted. Parked until the destination's breaker half-opens,
+                # without using up an attempt.
+                failed.append(
+                    {
+                        "callback_id": callback.id,
+                        "callback_attempts": callback.attempts,
+                        "status": CallbackOutboxStatus.pending.value,
+                        "attempts": callback.attempts - 1,
+                        "next_attempt_at": now + timedelta(seconds=error.retry_after),
+                        "last_error": error.message,
+                        "updated_at": now,
+                    }
+                )
+                parked += 1
+                continue
+            dead = (
+                callback.attempts >= _config.callback_outbox_max_attempts
+                or not self.is_retryable(error)
+            )
+            error = str(error) or type(error).__name__
+            failed.append(
+                {
+                    "callback_id": callback.id,
+                    "callback_attempts": callback.attempts,
+                    "status": (
+                        CallbackOutboxStatus.dead.value
+                        if dead
+                        else CallbackOutboxStatus.pending.value
+                    ),
+                    "attempts": callback.attempts,
+                    "next_attempt_at": now
+                    + timedelta(seconds=self.get_retry_delay(callback.attempts)),
+                    "last_error": error,
+                    "updated_at": now,
+                }
+            )
+            self.dead_lettered += dead
+            if dead:
+                _logger.error(
+                    f"Callback {callback.id} to {callback.url} dead-lettered after "
+                    f"{callback.attempts} attempt(s): {error}"
+                )
+        if failed:
+            # One executemany. On the table, as the ORM would update by primary key.
+            callback_outbox = CallbackOutbox.__table__
+            await session.execute(
+                update(callback_outbox)
+                .where(
+                    callback_outbox.c.id == bindparam("callback_id"),
+                    callback_outbox.c.attempts == bindparam("callback_attempts"),
+                )
+                .values(
+                    status=bindparam("status"),
+                    attempts=bindparam("attempts"),
+                    next_attempt_at=bindparam("next_attempt_at"),
+                    last_error=bindparam("last_error"),
+                    updated_at=bindparam("updated_at"),
+                ),
+                failed,
+            )
+        self.delivered += len(delivered)
+        self.failed_attempts += len(failed) - parked
+        self.parked += parked
+
+    async def run_batch(self, callbacks: List[Row]) -> None:
+        errors = await asyncio.gather(
+            *[self.deliver(callback) for callback in callbacks]
+        )
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            await self.record_results(session, callbacks, errors)
+            await session.commit()
+
+    async def dispatch_once(self) -> bool:
+        """
+        Claims due callbacks for the free delivery slots, and starts them.
+        Returns True if more may be due already.
+        """
+        limit = min(
+            _config.callback_outbox_concurrency - self.in_flight,
+            _config.callback_outbox_batch_size,
+        )
+        if limit <= 0:
+            return False
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            callbacks = await self.claim_due(session, limit)
+            await session.commit()
+        if not callbacks:
+            return False
+        self.in_flight += len(callbacks)
+        batch_task = asyncio.create_task(self.run_batch(callbacks))
+        self._batch_tasks.add(batch_task)
+        batch_task.add_done_callback(self._batch_tasks.discard)
+        return len(callbacks) == limit
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            # Woken by new callbacks and by freed delivery slots
+            self._wakeup.clear()
+            try:
+                more_due = await self.dispatch_once()
+            except Exception as e:
+                _logger.error(f"Error dispatching callbacks: {e}")
+                more_due = False
+            if not more_due:
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), _config.callback_outbox_poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def get_dead_letters(self, limit: int, offset: int) -> List[Row]:
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            result = await session.execute(
+                select(
+                    CallbackOutbox.id,
+                    CallbackOutbox.url,
+                    CallbackOutbox.attempts,
+                    CallbackOutbox.last_error,
+                    CallbackOutbox.created_at,
+                    CallbackOutbox.updated_at,
+                )
+                .where(CallbackOutbox.status == CallbackOutboxStatus.dead.value)
+                .order_by(CallbackOutbox.id)
+                .limit(limit)
+                .offset(offset)
+            )
+            return list(result)
+
+    async def replay_dead_letters(self, ids: Optional[List[int]] = None) -> int:
+        """
+        Moves dead letters back to pending with a fresh attempt count. All of them,
+        or only the given ids. Returns the number replayed.
+        """
+        now = _utcnow()
+        stmt = (
+            update(CallbackOutbox)
+            .where(CallbackOutbox.status == CallbackOutboxStatus.dead.value)
+            .values(
+                status=CallbackOutboxStatus.pending.value,
+                attempts=0,
+                next_attempt_at=now,
+                updated_at=now,
+            )
+            .returning(CallbackOutbox.id)
+            .execution_options(synchronize_session=False)
+        )
+        if ids is not None:
+            stmt = stmt.where(CallbackOutbox.id.in_(ids))
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            replayed = len((await session.execute(stmt)).all())
+            await session.commit()
+        self.replayed += replayed
+        self.wakeup()
+        return replayed
+
+    async def start(self) -> None:
+        if not _config.callback_outbox_enabled or self._dispatch_task:
+            return
+        self._dispatch_task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self) -> None:
+        """
+        Stops claiming callbacks and waits up to default_callback_timeout for the
+        ones being delivered. Callbacks still running after that are retried once
+        their lease expires.
+        """
+        if not self._dispatch_task:
+            return
+        self._dispatch_task.cancel()
+        try:
+            await self._dispatch_task
+        except asyncio.CancelledError:
+            pass
+        self._dispatch_task = None
+        if not self._batch_tasks:
+            return
+        _, pending = await asyncio.wait(
+            self._batch_tasks, timeout=_config.default_callback_timeout
+        )
+        for batch_task in pending:
+            batch_task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def get_metrics(self) -> dict:
+        return {
+            "enabled": _config.callback_outbox_enabled,
+            "running": bool(self._dispatch_task and not self._dispatch_task.done()),
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "dead_lettered": self.dead_lettered,
+            "parked": self.parked,
+            "replayed": self.replayed,
+        }
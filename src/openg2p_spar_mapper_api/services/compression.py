@@ -0,0 +1,301 @@
+"""gzip/zstd request and response bodies, and the ASGI middleware applying them."""
+
+import logging
+import zlib
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.responses import PlainTextResponse
+
+from ..config import Settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+# Decompressed bytes produced per step, so a decompression bomb is caught after
+# at most this much more output than the cap
+_DECOMPRESS_STEP_SIZE = 64 * 1024
+# zstd output can't be limited per call, and a few bytes of a zstd block can
+# expand to 128 KiB, so zstd input is fed this many bytes at a time, catching a
+# decompression bomb after at most 4 MiB more output than the cap
+_ZSTD_INPUT_STEP_SIZE = 128
+# Larger chunks are compressed and decompressed in a thread, not on the event loop
+_THREAD_MIN_SIZE = 1024 * 1024
+
+
+def get_supported_encodings() -> List[str]:
+    """
+    In order of preference. zstd needs the zstandard package.
+    """
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=_config.compression_zstd_level).compress(
+            data
+        )
+    return zlib.compress(data, _config.compression_gzip_level, wbits=31)
+
+
+async def compress_async(data: bytes, encoding: str) -> bytes:
+    if len(data) >= _THREAD_MIN_SIZE:
+        return await run_in_threadpool(compress, data, encoding)
+    return compress(data, encoding)
+
+
+class _DecompressedTooLarge(Exception):
+    pass
+
+
+class _CappedBuffer:
+    """
+    Collects decompressed output, raising once it grows past max_size.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise _DecompressedTooLarge()
+        self.chunks.append(data)
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class StreamDecompressor:
+    """
+    Decompresses a body chunk by chunk, never holding more than max_size
+    decompressed bytes, whatever the compression ratio. A gzip body may be several
+    concatenated gzip members, as in RFC 1952, and a zstd body several
+    concatenated frames. Anything else after the first member or frame is
+    invalid.
+    """
+
+    def __init__(self, encoding: str, max_size: int):
+        self.encoding = encoding
+        self.buffer = _CappedBuffer(max_size)
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdDecompressor().decompressobj(
+                write_size=_DECOMPRESS_STEP_SIZE
+            )
+        else:
+            self._gzip = zlib.decompressobj(wbits=31)
+
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Raises ValueError for corrupt data, and _DecompressedTooLarge past max_size.
+        """
+        try:
+            if self.encoding == "zstd":
+                while data:
+                    if self._zstd.eof:
+                        self._zstd = zstandard.ZstdDecompressor().decompressobj(
+                            write_size=_DECOMPRESS_STEP_SIZE
+                        )
+                    self.buffer.write(
+                        self._zstd.decompress(data[:_ZSTD_INPUT_STEP_SIZE])
+                    )
+                    data = (
+                        self._zstd.unused_data + data[_ZSTD_INPUT_STEP_SIZE:]
+                        if self._zstd.eof
+                        else data[_ZSTD_INPUT_STEP_SIZE:]
+                    )
+            else:
+                while data:
+                    if self._gzip.eof:
+                        self._gzip = zlib.decompressobj(wbits=31)
+                    self.buffer.write(
+                        self._gzip.decompress(data, _DECOMPRESS_STEP_SIZE)
+                    )
+                    data = (
+                        self._gzip.unused_data
+                        if self._gzip.eof
+                        else self._gzip.unconsumed_tail
+                    )
+        except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+            raise ValueError(str(e)) from e
+        return self.buffer.pop()
+
+    async def decompress_async(self, data: bytes) -> bytes:
+        if len(data) >= _THREAD_MIN_SIZE:
+            return await run_in_threadpool(self.decompress, data)
+        return self.decompress(data)
+
+    def finish(self) -> None:
+        """
+        Raises ValueError if the body was cut short.
+        """
+        if self.encoding == "zstd" and not self._zstd.eof:
+            raise ValueError("Incomplete zstd body")
+        if self.encoding == "gzip" and not self._gzip.eof:
+            raise ValueError("Incomplete gzip body")
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(
+                level=_config.compression_zstd_level
+            ).compressobj()
+        else:
+            self._gzip = zlib.compressobj(_config.compression_gzip_level, wbits=31)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        """
+        Returns everything compressed so far, so a streamed response keeps
+        streaming.
+        """
+        if self.encoding == "zstd":
+            flush_mode = (
+                zstandard.COMPRESSOBJ_FLUSH_FINISH
+                if finish
+                else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+            return self._zstd.compress(data) + self._zstd.flush(flush_mode)
+        flush_mode = zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH
+        return self._gzip.compress(data) + self._gzip.flush(flush_mode)
+
+    async def compress_async(self, data: bytes, finish: bool) -> bytes:
+        if len(data) >= _THREAD_MIN_SIZE:
+            return await run_in_threadpool(self.compress, data, finish)
+        return self.compress(data, finish)
+
+
+def get_accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Returns the preferred supported encoding in an Accept-Encoding header.
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        encoding, _, params = item.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(encoding.strip())
+    for encoding in get_supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Decompresses request bodies sent with Content-Encoding gzip or zstd as they
+    are received, rejecting those that decompress past
+    request_max_decompressed_size with 413. Compresses responses of at least
+    response_compression_min_size by Accept-Encoding, flushing each chunk so
+    streamed responses keep streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            if content_encoding not in get_supported_encodings():
+                response = PlainTextResponse(
+                    f"Unsupported Content-Encoding: {content_encoding}",
+                    status_code=415,
+                    headers={"Accept-Encoding": ", ".join(get_supported_encodings())},
+                )
+                await response(scope, receive, send)
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (key, value)
+                for key, value in scope["headers"]
+                if key not in (b"content-encoding", b"content-length")
+            ]
+            receive = self.decompressing_receive(receive, content_encoding)
+
+        accepted_encoding = get_accepted_encoding(headers.get("accept-encoding", ""))
+        if _config.response_compression_enabled and accepted_encoding:
+            send = self.compressing_send(send, accepted_encoding)
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def decompressing_receive(receive, encoding: str):
+        decompressor = StreamDecompressor(
+            encoding, _config.request_max_decompressed_size
+        )
+
+        async def receive_decompressed():
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            try:
+                body = await decompressor.decompress_async(message.get("body", b""))
+                if not message.get("more_body", False):
+                    decompressor.finish()
+            except _DecompressedTooLarge:
+                raise HTTPException(
+                    status_code=413,
+                    detail=(
+                        "Decompressed request body is larger than "
+                        f"{_config.request_max_decompressed_size} bytes"
+                    ),
+                ) from None
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=400, detail=f"Invalid {encoding} request body: {e}"
+                ) from e
+            return {**message, "body": body}
+
+        return receive_decompressed
+
+    @staticmethod
+    def compressing_send(send, encoding: str):
+        start_message = None
+        compressor: Optional[StreamCompressor] = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message:
+                # Decided on the first body chunk
+                headers = MutableHeaders(scope=start_message)
+                if "content-encoding" not in headers and (
+                    more_body or len(body) >= _config.response_compression_min_size
+                ):
+                    compressor = StreamCompressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                await send(start_message)
+                start_message = None
+            if compressor:
+                body = await compressor.compress_async(body, finish=not more_body)
+            await send({**message, "body": body})
+
+        return send_compressed
@@ -45,3 +45,28 @@ class RequestValidationException(Exception):
         self.code = code
         self.message = message
         super().__init__(self.message)
+
+
+class CallbackRejectedException(Exception):
+    """
+    Raised instead of sending a callback to a destination whose circuit breaker
+    is open, or that has too many callbacks waiting.
+    """
+
+    def __init__(self, message, retry_after: float):
+        self.message = message
+        super().__init__(self.message)
+        # In seconds
+        self.retry_after = retry_after
+
+
+class AsyncJobLeaseLostException(Exception):
+    """
+    Raised when completing an async job that another worker has claimed since its
+    lease expired. Rolls back the transaction of this run, so only one run of the
+    job takes effect.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -1,3 +1,6 @@
+import json
+from typing import Any, Callable, Container, Dict, List, Optional, Type
+
 from openg2p_fastapi_common.service import BaseService
 from openg2p_g2pconnect_common_lib.schemas import StatusEnum
 from openg2p_g2pconnect_mapper_lib.schemas import (
@@ -10,9 +13,9 @@ from openg2p_g2pconnect_mapper_lib.schemas import (
     UnlinkStatusReasonCode,
     UpdateStatusReasonCode,
 )
-from sqlalchemy import and_, select
+from sqlalchemy import Row
 
-from ..models import IdFaMapping
+from ..config import Settings
 from .exceptions import (
     LinkValidationException,
     ResolveValidationException,
@@ -20,10 +23,163 @@ from .exceptions import (
     UpdateValidationException,
 )
 
+_config = Settings.get_config()
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode())
+
 
 class IdFaMappingValidations(BaseService):
-    async def validate_link_request(
-        self, connection, single_link_request: SingleLinkRequest
+    """
+    Validations never query the database. They run in two passes over a batch:
+    validate_*_requests_structure only looks at the requests themselves, so it runs
+    before a DB session is opened. validate_*_requests then checks the remaining
+    items against a {id_value: mapping} snapshot of the whole batch, loaded once by
+    the caller as plain rows. Both return one exception (or None, if valid) per single request.
+    """
+
+    def validate_link_requests_structure(
+        self, single_link_requests: List[SingleLinkRequest]
+    ) -> List[Optional[LinkValidationException]]:
+        return self._validate_batch_structure(
+            self.validate_link_request_structure,
+            LinkValidationException,
+            single_link_requests,
+        )
+
+    def validate_link_requests(
+        self,
+        single_link_requests: List[SingleLinkRequest],
+        id_fa_mappings: Dict[str, Row],
+        errors: Optional[List[Optional[LinkValidationException]]] = None,
+    ) -> List[Optional[LinkValidationException]]:
+        if errors is None:
+            errors = self.validate_link_requests_structure(single_link_requests)
+        return self._validate_batch(
+            self.validate_link_request,
+            LinkValidationException,
+            single_link_requests,
+            id_fa_mappings,
+            errors,
+        )
+
+    def validate_update_requests_structure(
+        self, single_update_requests: List[SingleUpdateRequest]
+    ) -> List[Optional[UpdateValidationException]]:
+        return self._validate_batch_structure(
+            self.validate_update_request_structure,
+            UpdateValidationException,
+            single_update_requests,
+        )
+
+    def validate_update_requests(
+        self,
+        single_update_requests: List[SingleUpdateRequest],
+        id_fa_mappings: Dict[str, Row],
+        errors: Optional[List[Optional[UpdateValidationException]]] = None,
+    ) -> List[Optional[UpdateValidationException]]:
+        if errors is None:
+            errors = self.validate_update_requests_structure(single_update_requests)
+        return self._validate_batch(
+            self.validate_update_request,
+            UpdateValidationException,
+            single_update_requests,
+            id_fa_mappings,
+            errors,
+        )
+
+    def validate_resolve_requests_structure(
+        self, single_resolve_requests: List[SingleResolveRequest]
+    ) -> List[Optional[ResolveValidationException]]:
+        return self._validate_batch_structure(
+            self.validate_resolve_request_structure,
+            ResolveValidationException,
+            single_resolve_requests,
+        )
+
+    def validate_resolve_requests(
+        self,
+        single_resolve_requests: List[SingleResolveRequest],
+        id_fa_mappings: Dict[str, Row],
+        errors: Optional[List[Optional[ResolveValidationException]]] = None,
+    ) -> List[Optional[ResolveValidationException]]:
+        if errors is None:
+            errors = self.validate_resolve_requests_structure(single_resolve_requests)
+        return self._validate_batch(
+            self.validate_resolve_request,
+            ResolveValidationException,
+            single_resolve_requests,
+            id_fa_mappings,
+            errors,
+        )
+
+    def validate_unlink_requests_structure(
+        self, single_unlink_requests: List[SingleUnlinkRequest]
+    ) -> List[Optional[UnlinkValidationException]]:
+        return self._validate_batch_structure(
+            self.validate_unlink_request_structure,
+            UnlinkValidationException,
+            single_unlink_requests,
+        )
+
+    def validate_unlink_requests(
+        self,
+        single_unlink_requests: List[SingleUnlinkRequest],
+        id_fa_mappings: Dict[str, Row],
+        errors: Optional[List[Optional[UnlinkValidationException]]] = None,
+    ) -> List[Optional[UnlinkValidationException]]:
+        if errors is None:
+            errors = self.validate_unlink_requests_structure(single_unlink_requests)
+        return self._validate_batch(
+            self.validate_unlink_request,
+            UnlinkValidationException,
+            single_unlink_requests,
+            id_fa_mappings,
+            errors,
+        )
+
+    def _validate_batch_structure(
+        self,
+        validate: Callable,
+        exception_type: Type[Exception],
+        single_requests: list,
+    ) -> list:
+        errors = []
+        for single_request in single_requests:
+            try:
+                validate(single_request)
+                errors.append(None)
+            except exception_type as e:
+                errors.append(e)
+        return errors
+
+    def _validate_batch(
+        self,
+        validate: Callable,
+        exception_type: Type[Exception],
+        single_requests: list,
+        id_fa_mappings: Dict[str, Row],
+        errors: list,
+    ) -> list:
+        errors = list(errors)
+        ids_in_batch = set()
+        for i, single_request in enumerate(single_requests):
+            if errors[i]:
+                continue
+            try:
+                validate(
+                    single_request,
+                    id_fa_mapping=id_fa_mappings.get(single_request.id),
+                    ids_in_batch=ids_in_batch,
+                )
+                ids_in_batch.add(single_request.id)
+            except exception_type as e:
+                errors[i] = e
+        return errors
+
+    def validate_link_request_structure(
+        self, single_link_request: SingleLinkRequest
     ) -> None:
         # Check if the ID is null
         if not single_link_request.id:
@@ -41,15 +197,79 @@ class IdFaMappingValidations(BaseService):
                 validation_error_type=LinkStatusReasonCode.rjct_fa_invalid,
             )
 
+        if len(single_link_request.id) > _config.max_id_length:
+            raise LinkValidationException(
+                message="ID is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_id_invalid,
+            )
+
+        if len(single_link_request.fa) > _config.max_fa_length:
+            raise LinkValidationException(
+                message="FA is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_fa_invalid,
+            )
+
+        if len(single_link_request.name or "") > _config.max_name_length:
+            raise LinkValidationException(
+                message="Name is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_name_invalid,
+            )
+
+        if (
+            len(single_link_request.phone_number or "")
+            > _config.max_phone_number_length
+        ):
+            raise LinkValidationException(
+                message="Phone number is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_mobile_number_invalid,
+            )
+
+        if (
+            single_link_request.additional_info
+            and _json_size(single_link_request.additional_info)
+            > _config.max_additional_info_size
+        ):
+            raise LinkValidationException(
+                message="Additional info is too large",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_other_error,
+            )
+
+        return None
+
+    def validate_link_request(
+        self,
+        single_link_request: SingleLinkRequest,
+        id_fa_mapping: Optional[Row],
+        ids_in_batch: Container[str] = (),
+    ) -> None:
+        # Check if the ID is repeated within the same request
+        if single_link_request.id in ids_in_batch:
+            raise LinkValidationException(
+                message="ID is repeated in the request",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_reference_id_duplicate,
+            )
+
         # Check if the ID is already mapped
-        result = await connection.execute(
-            select(IdFaMapping).where(
-                IdFaMapping.id_value == single_link_request.id,
+        if id_fa_mapping:
+            raise LinkValidationException(
+                message="ID and FA are already mapped",
+                status=StatusEnum.rjct,
+                validation_error_type=LinkStatusReasonCode.rjct_reference_id_duplicate,
             )
-        )
-        link_request_from_db = result.first()
 
-        if link_request_from_db:
+        return None
+
+    def validate_link_insert(
+        self, single_link_request: SingleLinkRequest, linked_ids: Container[str]
+    ) -> None:
+        # IDs missing from INSERT ... RETURNING were mapped concurrently
+        if single_link_request.id not in linked_ids:
             raise LinkValidationException(
                 message="ID and FA are already mapped",
                 status=StatusEnum.rjct,
@@ -58,8 +278,8 @@ class IdFaMappingValidations(BaseService):
 
         return None
 
-    async def validate_update_request(
-        self, connection, single_update_request: SingleUpdateRequest
+    def validate_update_request_structure(
+        self, single_update_request: SingleUpdateRequest
     ) -> None:
         if not single_update_request.id:
             raise UpdateValidationException(
@@ -75,16 +295,72 @@ class IdFaMappingValidations(BaseService):
                 validation_error_type=UpdateStatusReasonCode.rjct_fa_invalid,
             )
 
-        result = await connection.execute(
-            select(IdFaMapping).where(
-                and_(
-                    IdFaMapping.id_value == single_update_request.id,
-                )
+        if len(single_update_request.id) > _config.max_id_length:
+            raise UpdateValidationException(
+                message="ID is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=UpdateStatusReasonCode.rjct_id_invalid,
+            )
+
+        if len(single_update_request.fa) > _config.max_fa_length:
+            raise UpdateValidationException(
+                message="FA is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=UpdateStatusReasonCode.rjct_fa_invalid,
+            )
+
+        if len(single_update_request.name or "") > _config.max_name_length:
+            raise UpdateValidationException(
+                message="Name is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=UpdateStatusReasonCode.rjct_beneficiary_name_invalid,
+            )
+
+        # UpdateStatusReasonCode has no code for these, so the message says which
+        if (
+            len(single_update_request.phone_number or "")
+            > _config.max_phone_number_length
+        ):
+            raise UpdateValidationException(
+                message="Phone number is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=UpdateStatusReasonCode.rjct_reference_id_invalid,
+            )
+
+        if (
+            single_update_request.additional_info
+            and _json_size(single_update_request.additional_info)
+            > _config.max_additional_info_size
+        ):
+            raise UpdateValidationException(
+                message="Additional info is too large",
+                status=StatusEnum.rjct,
+                validation_error_type=UpdateStatusReasonCode.rjct_reference_id_invalid,
+            )
+
+        return None
+
+    def validate_update_request(
+        self,
+        single_update_request: SingleUpdateRequest,
+        id_fa_mapping: Optional[Row],
+        ids_in_batch: Container[str] = (),
+    ) -> None:
+        # Repeated IDs are allowed in an update, they are applied in order
+        if not id_fa_mapping:
+            raise UpdateValidationException(
+                message="ID doesnt exist please link first",
+                status=StatusEnum.rjct,
+                validation_error_type=UpdateStatusReasonCode.rjct_reference_id_duplicate,
             )
-        )
-        update_request_from_db = result.first()
 
-        if not update_request_from_db:
+        return None
+
+    def validate_update_result(
+        self, single_update_request: SingleUpdateRequest, updated_ids: Container[str]
+    ) -> None:
+        # IDs missing from UPDATE ... RETURNING were unlinked concurrently
+        if single_update_request.id not in updated_ids:
             raise UpdateValidationException(
                 message="ID doesnt exist please link first",
                 status=StatusEnum.rjct,
@@ -93,8 +369,8 @@ class IdFaMappingValidations(BaseService):
 
         return None
 
-    async def validate_resolve_request(
-        self, connection, single_resolve_request: SingleResolveRequest
+    def validate_resolve_request_structure(
+        self, single_resolve_request: SingleResolveRequest
     ) -> None:
         if not single_resolve_request.id and not single_resolve_request.fa:
             raise ResolveValidationException(
@@ -103,14 +379,32 @@ class IdFaMappingValidations(BaseService):
                 validation_error_type=ResolveStatusReasonCode.rjct_reference_id_invalid,
             )
 
-        result = await connection.execute(
-            select(IdFaMapping).where(
-                IdFaMapping.id_value == single_resolve_request.id,
+        if len(single_resolve_request.id or "") > _config.max_id_length:
+            raise ResolveValidationException(
+                message="ID is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=ResolveStatusReasonCode.rjct_id_invalid,
+            )
+
+        if len(single_resolve_request.fa or "") > _config.max_fa_length:
+            raise ResolveValidationException(
+                message="FA is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=ResolveStatusReasonCode.rjct_fa_invalid,
             )
-        )
-        resolve_request_from_db = result.first()
 
-        if not resolve_request_from_db:
+        return None
+
+    def validate_resolve_request(
+        self,
+        single_resolve_request: SingleResolveRequest,
+        id_fa_mapping: Optional[Row],
+        ids_in_batch: Container[str] = (),
+    ) -> None:
+        # FA-only requests are reverse resolves, not checked against ID mappings
+        if not single_resolve_request.id:
+            return None
+        if not id_fa_mapping:
             raise ResolveValidationException(
                 message="ID doesnt exist please link first",
                 status=StatusEnum.succ,
@@ -118,8 +412,8 @@ class IdFaMappingValidations(BaseService):
             )
         return None
 
-    async def validate_unlink_request(
-        self, connection, single_unlink_request: SingleUnlinkRequest
+    def validate_unlink_request_structure(
+        self, single_unlink_request: SingleUnlinkRequest
     ) -> None:
         if not single_unlink_request.id:
             raise UnlinkValidationException(
@@ -128,23 +422,53 @@ class IdFaMappingValidations(BaseService):
                 validation_error_type=UnlinkStatusReasonCode.rjct_id_invalid,
             )
 
-        result = await connection.execute(
-            select(IdFaMapping).where(
-                IdFaMapping.id_value == single_unlink_request.id,
+        if len(single_unlink_request.id) > _config.max_id_length:
+            raise UnlinkValidationException(
+                message="ID is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=UnlinkStatusReasonCode.rjct_id_invalid,
             )
-        )
 
-        if single_unlink_request.fa:
-            result = await connection.execute(
-                select(IdFaMapping).where(
-                    IdFaMapping.id_value == single_unlink_request.id,
-                    IdFaMapping.fa_value == single_unlink_request.fa,
-                )
+        if len(single_unlink_request.fa or "") > _config.max_fa_length:
+            raise UnlinkValidationException(
+                message="FA is too long",
+                status=StatusEnum.rjct,
+                validation_error_type=UnlinkStatusReasonCode.rjct_fa_invalid,
             )
 
-        unlink_request_from_db = result.first()
+        return None
+
+    def validate_unlink_request(
+        self,
+        single_unlink_request: SingleUnlinkRequest,
+        id_fa_mapping: Optional[Row],
+        ids_in_batch: Container[str] = (),
+    ) -> None:
+        if single_unlink_request.id in ids_in_batch:
+            raise UnlinkValidationException(
+                message="ID is repeated in the request",
+                status=StatusEnum.rjct,
+                validation_error_type=UnlinkStatusReasonCode.rjct_id_invalid,
+            )
+
+        # When the FA is given, it has to match the linked FA as well
+        if not id_fa_mapping or (
+            single_unlink_request.fa
+            and single_unlink_request.fa != id_fa_mapping.fa_value
+        ):
+            raise UnlinkValidationException(
+                message="ID doesnt exist please link first",
+                status=StatusEnum.rjct,
+                validation_error_type=UnlinkStatusReasonCode.rjct_id_invalid,
+            )
+
+        return None
 
-        if not unlink_request_from_db:
+    def validate_unlink_result(
+        self, single_unlink_request: SingleUnlinkRequest, unlinked_ids: Container[str]
+    ) -> None:
+        # IDs missing from DELETE ... RETURNING were changed concurrently
+        if single_unlink_request.id not in unlinked_ids:
             raise UnlinkValidationException(
                 message="ID doesnt exist please link first",
                 status=StatusEnum.rjct,
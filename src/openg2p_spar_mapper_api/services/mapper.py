@@ -1,5 +1,6 @@
 import logging
 from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional, Union
 
 from openg2p_fastapi_common.context import dbengine
 from openg2p_fastapi_common.service import BaseService
@@ -7,7 +8,6 @@ from openg2p_g2pconnect_common_lib.schemas import StatusEnum
 from openg2p_g2pconnect_mapper_lib.schemas import (
     LinkRequest,
     LinkRequestMessage,
-    LinkStatusReasonCode,
     ResolveRequest,
     ResolveRequestMessage,
     ResolveScope,
@@ -16,16 +16,26 @@ from openg2p_g2pconnect_mapper_lib.schemas import (
     SingleResolveRequest,
     SingleResolveResponse,
     SingleUnlinkResponse,
-    SingleUpdateRequest,
     SingleUpdateResponse,
     UnlinkRequest,
     UnlinkRequestMessage,
     UpdateRequest,
     UpdateRequestMessage,
-    UpdateStatusReasonCode,
 )
-from sqlalchemy import delete, select
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy import (
+    JSON,
+    Row,
+    String,
+    cast,
+    column,
+    delete,
+    func,
+    or_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from ..config import Settings
 from ..models import IdFaMapping
@@ -36,57 +46,130 @@ from ..services.exceptions import (
     UpdateValidationException,
 )
 from ..services.id_fa_mapping_validations import IdFaMappingValidations
+from ..services.read_replica import ReadReplica
+from ..services.resolve_bloom_filter import ResolveBloomFilter
+from ..services.resolve_cache import ResolveCache
+from ..services.resolve_cache_invalidation import ResolveCacheInvalidator
 
 _config = Settings.get_config()
 _logger = logging.getLogger(_config.logging_default_logger_name)
 
+# Called with the write session and the single responses, just before the commit
+BeforeCommitHook = Callable[[AsyncSession, list], Awaitable[None]]
+
 
 class MapperService(BaseService):
-    async def link(self, link_request: LinkRequest):
+    @staticmethod
+    def without_errors(single_requests: list, validation_errors: list) -> list:
+        return [
+            single_request
+            for single_request, error in zip(single_requests, validation_errors)
+            if not error
+        ]
+
+    async def link(
+        self,
+        link_request: LinkRequest,
+        before_commit: Optional[BeforeCommitHook] = None,
+    ):
+        link_request_message: LinkRequestMessage = link_request.message
+        single_link_requests = link_request_message.link_request
+
+        validations = IdFaMappingValidations.get_component()
+        validation_errors = validations.validate_link_requests_structure(
+            single_link_requests
+        )
+        linked_ids = set()
+        # Fully invalid batches never check out a DB connection
+        if all(validation_errors):
+            return self.construct_link_responses(
+                single_link_requests, validation_errors, linked_ids
+            )
         session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
         async with session_maker() as session:
-            link_request_message: LinkRequestMessage = link_request.message
-            mappings_to_add = []
-            single_link_responses: list[SingleLinkResponse] = []
-
-            for single_link_request in link_request_message.link_request:
-                try:
-                    await IdFaMappingValidations.get_component().validate_link_request(
-                        connection=session, single_link_request=single_link_request
+            id_fa_mappings = await IdFaMapping.get_id_fa_values_by_id_values(
+                session,
+                [
+                    single_link_request.id
+                    for single_link_request in self.without_errors(
+                        single_link_requests, validation_errors
                     )
+                ],
+                chunk_size=_config.db_query_chunk_size,
+            )
+            validation_errors = validations.validate_link_requests(
+                single_link_requests, id_fa_mappings, validation_errors
+            )
 
-                    mappings_to_add.append(
-                        self.construct_id_fa_mapping(single_link_request)
-                    )
-                    single_link_responses.append(
-                        self.construct_single_link_response_for_success(
-                            single_link_request
-                        )
-                    )
-                except LinkValidationException as e:
-                    LinkValidationException(
-                        message="Duplicate ID exists. Use 'update' instead.",
-                        status=StatusEnum.rjct,
-                        validation_error_type=LinkStatusReasonCode.rjct_id_invalid,
+            linked_ids = await self.insert_id_fa_mappings(
+                session,
+                [
+                    self.construct_id_fa_mapping(single_link_request)
+                    for single_link_request in self.without_errors(
+                        single_link_requests, validation_errors
                     )
-                    single_link_responses.append(
-                        self.construct_single_link_response_for_failure(
-                            single_link_request, e
-                        )
+                ],
+            )
+            single_link_responses = self.construct_link_responses(
+                single_link_requests, validation_errors, linked_ids
+            )
+            # Lets the caller write to the same transaction, e.g. a callback outbox row
+            if before_commit:
+                await before_commit(session, single_link_responses)
+            await ResolveCacheInvalidator.get_component().publish(
+                session, linked_ids, linked=True
+            )
+            await session.commit()
+        ResolveCache.get_component().invalidate(linked_ids)
+        ResolveBloomFilter.get_component().add(linked_ids)
+        return single_link_responses
+
+    def construct_link_responses(
+        self, single_link_requests, validation_errors, linked_ids: set[str]
+    ) -> list[SingleLinkResponse]:
+        single_link_responses: list[SingleLinkResponse] = []
+        for single_link_request, error in zip(single_link_requests, validation_errors):
+            try:
+                if error:
+                    raise error
+                IdFaMappingValidations.get_component().validate_link_insert(
+                    single_link_request=single_link_request, linked_ids=linked_ids
+                )
+                single_link_responses.append(
+                    self.construct_single_link_response_for_success(single_link_request)
+                )
+            except LinkValidationException as e:
+                single_link_responses.append(
+                    self.construct_single_link_response_for_failure(
+                        single_link_request, e
                     )
-        session.add_all(mappings_to_add)
-        await session.commit()
+                )
         return single_link_responses
 
-    def construct_id_fa_mapping(self, single_link_request):
-        return IdFaMapping(
-            id_value=single_link_request.id,
-            fa_value=single_link_request.fa,
-            name=single_link_request.name,
-            phone=single_link_request.phone_number,
-            additional_info=single_link_request.additional_info,
-            active=True,
+    async def insert_id_fa_mappings(self, session, mappings: list[dict]) -> set[str]:
+        """
+        Inserts all mappings with multi-row INSERT ... ON CONFLICT (id_value) DO NOTHING.
+        Returns the ids that were actually inserted.
+        """
+        if not mappings:
+            return set()
+        result = await session.execute(
+            insert(IdFaMapping)
+            .on_conflict_do_nothing(index_elements=[IdFaMapping.id_value])
+            .returning(IdFaMapping.id_value),
+            mappings,
         )
+        return set(result.scalars())
+
+    def construct_id_fa_mapping(self, single_link_request) -> dict:
+        return {
+            "id_value": single_link_request.id,
+            "fa_value": single_link_request.fa,
+            "name": single_link_request.name,
+            "phone": single_link_request.phone_number,
+            "additional_info": single_link_request.additional_info,
+            "active": True,
+        }
 
     def construct_single_link_response_for_success(self, single_link_request):
         return SingleLinkResponse(
@@ -112,70 +195,144 @@ class MapperService(BaseService):
             locale=single_link_request.locale,
         )
 
-    async def update(self, update_request: UpdateRequest):
+    async def update(
+        self,
+        update_request: UpdateRequest,
+        before_commit: Optional[BeforeCommitHook] = None,
+    ):
+        update_request_message: UpdateRequestMessage = update_request.message
+        single_update_requests = update_request_message.update_request
+
+        validations = IdFaMappingValidations.get_component()
+        validation_errors = validations.validate_update_requests_structure(
+            single_update_requests
+        )
+        updated_ids = set()
+        # Fully invalid batches never check out a DB connection
+        if all(validation_errors):
+            return self.construct_update_responses(
+                single_update_requests, validation_errors, updated_ids
+            )
         session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
         async with session_maker() as session:
-            update_request_message: UpdateRequestMessage = update_request.message
-            single_update_responses: list[SingleUpdateResponse] = []
-
-            for single_update_request in update_request_message.update_request:
-                try:
-                    await IdFaMappingValidations.get_component().validate_update_request(
-                        connection=session, single_update_request=single_update_request
+            id_fa_mappings = await IdFaMapping.get_id_fa_values_by_id_values(
+                session,
+                [
+                    single_update_request.id
+                    for single_update_request in self.without_errors(
+                        single_update_requests, validation_errors
                     )
+                ],
+                chunk_size=_config.db_query_chunk_size,
+            )
+            validation_errors = validations.validate_update_requests(
+                single_update_requests, id_fa_mappings, validation_errors
+            )
 
-                    single_update_responses.append(
-                        self.construct_single_update_response_for_success(
-                            single_update_request
-                        )
+            mappings_to_update: dict[str, dict] = {}
+            for single_update_request in self.without_errors(
+                single_update_requests, validation_errors
+            ):
+                mapping = self.construct_id_fa_mapping_update(single_update_request)
+                if single_update_request.id in mappings_to_update:
+                    # Repeated ids are merged, later non-empty fields win
+                    mappings_to_update[single_update_request.id].update(
+                        {k: v for k, v in mapping.items() if v is not None}
                     )
+                else:
+                    mappings_to_update[single_update_request.id] = mapping
 
-                    await self.update_mapping(session, single_update_request)
+            updated_ids = await self.update_id_fa_mappings(
+                session, list(mappings_to_update.values())
+            )
+            single_update_responses = self.construct_update_responses(
+                single_update_requests, validation_errors, updated_ids
+            )
+            # Lets the caller write to the same transaction, e.g. a callback outbox row
+            if before_commit:
+                await before_commit(session, single_update_responses)
+            await ResolveCacheInvalidator.get_component().publish(session, updated_ids)
+            await session.commit()
+        ResolveCache.get_component().invalidate(updated_ids)
+        return single_update_responses
 
-                except UpdateValidationException as e:
-                    UpdateValidationException(
-                        message="Mapping doesn't exist against the given ID.",
-                        status=StatusEnum.rjct,
-                        validation_error_type=UpdateStatusReasonCode.rjct_id_invalid,
+    def construct_update_responses(
+        self, single_update_requests, validation_errors, updated_ids: set[str]
+    ) -> list[SingleUpdateResponse]:
+        single_update_responses: list[SingleUpdateResponse] = []
+        for single_update_request, error in zip(
+            single_update_requests, validation_errors
+        ):
+            try:
+                if error:
+                    raise error
+                IdFaMappingValidations.get_component().validate_update_result(
+                    single_update_request=single_update_request,
+                    updated_ids=updated_ids,
+                )
+                single_update_responses.append(
+                    self.construct_single_update_response_for_success(
+                        single_update_request
                     )
-                    single_update_responses.append(
-                        self.construct_single_update_response_for_failure(
-                            single_update_request, e
-                        )
+                )
+            except UpdateValidationException as e:
+                single_update_responses.append(
+                    self.construct_single_update_response_for_failure(
+                        single_update_request, e
                     )
-
-        await session.commit()
-
+                )
         return single_update_responses
 
-    async def update_mapping(self, session, single_update_request):
-        single_update_request: SingleUpdateRequest = SingleUpdateRequest.model_validate(
-            single_update_request
-        )
-        single_response = self.construct_single_update_response_for_success(
-            single_update_request
-        )
-        result = await session.execute(
-            select(IdFaMapping).where(IdFaMapping.id_value == single_update_request.id)
-        )
-        result = result.scalar()
-
-        if result:
-            if single_update_request.fa:
-                result.fa_value = single_update_request.fa
-            if single_update_request.name:
-                result.name = single_update_request.name
-            if single_update_request.phone_number:
-                result.phone = single_update_request.phone_number
-            if single_update_request.additional_info:
-                result.additional_info = single_update_request.additional_info
-        else:
-            single_response.status = StatusEnum.rjct
-            single_response.status_reason_code = UpdateStatusReasonCode.rjct_id_invalid
-            single_response.status_reason_message = (
-                "Mapping doesnt exist against given ID. Use 'link' instead."
+    async def update_id_fa_mappings(self, session, mappings: list[dict]) -> set[str]:
+        """
+        Applies all mappings with one UPDATE ... FROM (VALUES ...) per chunk.
+        Columns whose new value is null are left untouched.
+        Returns the ids that were found and updated.
+        """
+        updated_ids = set()
+        columns = [
+            column("id_value", String()),
+            column("fa_value", String()),
+            column("name", String()),
+            column("phone", String()),
+            column("additional_info", JSON(none_as_null=True)),
+        ]
+        chunk_size = max(_config.db_query_chunk_size // len(columns), 1)
+        for i in range(0, len(mappings), chunk_size):
+            update_values = values(*columns, name="update_values").data(
+                [
+                    tuple(mapping[c.name] for c in columns)
+                    for mapping in mappings[i : i + chunk_size]
+                ]
             )
-        await session.commit()
+            result = await session.execute(
+                update(IdFaMapping)
+                .where(IdFaMapping.id_value == update_values.c.id_value)
+                .values(
+                    {
+                        # Null literals in VALUES are untyped, hence the cast
+                        c.name: func.coalesce(
+                            cast(update_values.c[c.name], c.type),
+                            getattr(IdFaMapping, c.name),
+                        )
+                        for c in columns[1:]
+                    }
+                )
+                .returning(IdFaMapping.id_value)
+                .execution_options(synchronize_session=False)
+            )
+            updated_ids.update(result.scalars())
+        return updated_ids
+
+    def construct_id_fa_mapping_update(self, single_update_request) -> dict:
+        # Empty fields are sent as null, so that the existing value is kept
+        return {
+            "id_value": single_update_request.id,
+            "fa_value": single_update_request.fa or None,
+            "name": single_update_request.name or None,
+            "phone": single_update_request.phone_number or None,
+            "additional_info": single_update_request.additional_info or None,
+        }
 
     def construct_single_update_response_for_success(self, single_update_request):
         return SingleUpdateResponse(
@@ -204,41 +361,199 @@ class MapperService(BaseService):
         )
 
     async def resolve(self, resolve_request: ResolveRequest):
-        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
-        async with session_maker() as session:
-            resolve_request_message: ResolveRequestMessage = resolve_request.message
+        resolve_request_message: ResolveRequestMessage = resolve_request.message
+        return await self.resolve_single_requests(
+            resolve_request_message.resolve_request
+        )
 
-            single_resolve_responses: list[SingleResolveResponse] = []
+    async def resolve_in_chunks(
+        self,
+        resolve_request: ResolveRequest,
+        chunk_size: int,
+        force_primary: bool = False,
+    ) -> AsyncIterator[list[SingleResolveResponse]]:
+        """
+        Resolves the batch chunk_size items at a time, each chunk with its own DB
+        fetches, so only one chunk of responses is held at a time. The chunks are
+        produced after the endpoint returns, so the choice of DB is passed along.
+        """
+        resolve_request_message: ResolveRequestMessage = resolve_request.message
+        single_resolve_requests = resolve_request_message.resolve_request
+        for i in range(0, len(single_resolve_requests), chunk_size):
+            with ReadReplica.force_primary(force_primary):
+                single_resolve_responses = await self.resolve_single_requests(
+                    single_resolve_requests[i : i + chunk_size]
+                )
+            yield single_resolve_responses
+
+    async def resolve_single_requests(
+        self, single_resolve_requests: list[SingleResolveRequest]
+    ) -> list[SingleResolveResponse]:
+        validations = IdFaMappingValidations.get_component()
+        validation_errors = validations.validate_resolve_requests_structure(
+            single_resolve_requests
+        )
+        valid_single_resolve_requests = self.without_errors(
+            single_resolve_requests, validation_errors
+        )
+        id_fa_mappings = await self.get_id_fa_mappings_for_resolve(
+            [
+                single_resolve_request.id
+                for single_resolve_request in valid_single_resolve_requests
+            ],
+            details_id_values=[
+                single_resolve_request.id
+                for single_resolve_request in valid_single_resolve_requests
+                if single_resolve_request.scope == ResolveScope.details
+            ],
+        )
+        validation_errors = validations.validate_resolve_requests(
+            single_resolve_requests, id_fa_mappings, validation_errors
+        )
+        linked_id_values = await self.get_id_values_for_reverse_resolve(
+            [
+                single_resolve_request.fa
+                for single_resolve_request in valid_single_resolve_requests
+                if not single_resolve_request.id
+            ]
+        )
 
-            for single_resolve_request in resolve_request_message.resolve_request:
-                try:
-                    await IdFaMappingValidations.get_component().validate_resolve_request(
-                        connection=session,
-                        single_resolve_request=single_resolve_request,
-                    )
-                    single_resolve_request: SingleResolveRequest = (
-                        SingleResolveRequest.model_validate(single_resolve_request)
+        single_resolve_responses: list[SingleResolveResponse] = []
+        for single_resolve_request, error in zip(
+            single_resolve_requests, validation_errors
+        ):
+            try:
+                if error:
+                    raise error
+                if single_resolve_request.id:
+                    single_resolve_response = self.construct_single_resolve(
+                        single_resolve_request,
+                        id_fa_mappings.get(single_resolve_request.id),
                     )
-                    stmt, result = await self.construct_query(
-                        session, single_resolve_request
+                else:
+                    single_resolve_response = self.construct_single_reverse_resolve(
+                        single_resolve_request,
+                        linked_id_values.get(single_resolve_request.fa, []),
                     )
-                    single_resolve_response = self.construct_single_resolve(
-                        single_resolve_request, result
+                single_resolve_responses.append(single_resolve_response)
+            except ResolveValidationException as e:
+                single_resolve_responses.append(
+                    self.construct_single_resolve_response_for_failure(
+                        single_resolve_request, e
                     )
+                )
+        return single_resolve_responses
 
-                    single_resolve_responses.append(
-                        self.construct_single_resolve_response_for_success(
-                            single_resolve_response
-                        )
+    async def get_id_fa_mappings_for_resolve(
+        self, id_values: list[str], details_id_values: Iterable[str] = ()
+    ) -> dict[str, Union[Row, bool, None]]:
+        """
+        Looks the ids up in the resolve cache first, skips the ids the bloom filter
+        knows are not linked, and fetches only the rest from the DB. Only primary
+        reads are cached.
+        Returns {id_value: result}, where result is a row with fa_value and
+        additional_info for ids in details_id_values, True for other linked ids,
+        and None (or absent) for ids that are not linked.
+        """
+        id_values = [id_value for id_value in dict.fromkeys(id_values) if id_value]
+        details_id_values = set(details_id_values)
+        resolve_cache = ResolveCache.get_component()
+        resolve_bloom_filter = ResolveBloomFilter.get_component()
+        id_fa_mappings = {}
+        if resolve_cache.enabled:
+            id_fa_mappings, id_values = resolve_cache.get_many(id_values)
+            # Existence-only entries cannot answer a details resolve
+            for id_value in details_id_values:
+                if id_fa_mappings.get(id_value) is True:
+                    del id_fa_mappings[id_value]
+                    id_values.append(id_value)
+        id_values = resolve_bloom_filter.filter_misses(id_values)
+        # Batches that are fully invalid, cached or filtered out never check out
+        # a DB connection
+        if id_values:
+            generation = resolve_cache.generation
+            read_engine = ReadReplica.get_component().get_read_engine()
+            session_maker = async_sessionmaker(read_engine, expire_on_commit=False)
+            async with session_maker() as session:
+                fetched_id_fa_mappings = (
+                    await IdFaMapping.get_resolve_details_by_id_values(
+                        session,
+                        [
+                            id_value
+                            for id_value in id_values
+                            if id_value in details_id_values
+                        ],
+                        chunk_size=_config.db_query_chunk_size,
                     )
-                except ResolveValidationException as e:
-                    single_resolve_responses.append(
-                        self.construct_single_resolve_response_for_failure(
-                            single_resolve_request, e
-                        )
+                )
+                linked_id_values = await IdFaMapping.get_linked_id_values(
+                    session,
+                    [
+                        id_value
+                        for id_value in id_values
+                        if id_value not in details_id_values
+                    ],
+                    chunk_size=_config.db_query_chunk_size,
+                )
+            fetched_id_fa_mappings.update(dict.fromkeys(linked_id_values, True))
+            resolve_bloom_filter.record_false_positives(
+                len(id_values) - len(fetched_id_fa_mappings)
+            )
+            # A replica read may predate writes whose invalidation was already
+            # received, so only results read from the primary are cached
+            if resolve_cache.enabled and read_engine is dbengine.get():
+                resolve_cache.put_many(id_values, fetched_id_fa_mappings, generation)
+            id_fa_mappings.update(fetched_id_fa_mappings)
+        return id_fa_mappings
+
+    async def get_id_values_for_reverse_resolve(
+        self, fa_values: list[str]
+    ) -> dict[str, list[str]]:
+        """
+        Fetches the ids linked to each FA, for resolve requests that only have a FA.
+        Not cached, since the resolve cache and its invalidations are keyed by id.
+        """
+        if not fa_values:
+            return {}
+        session_maker = async_sessionmaker(
+            ReadReplica.get_component().get_read_engine(), expire_on_commit=False
+        )
+        async with session_maker() as session:
+            # One more than listed, to tell when the list is cut short
+            return await IdFaMapping.get_id_values_by_fa_values(
+                session,
+                fa_values,
+                chunk_size=_config.db_query_chunk_size,
+                max_ids_per_fa=_config.resolve_reverse_max_ids + 1,
+            )
+
+    def construct_single_reverse_resolve(
+        self, single_resolve_request, id_values: list[str]
+    ) -> SingleResolveResponse:
+        single_response = self.construct_single_resolve_response_for_success(
+            single_resolve_request
+        )
+        single_response.status = StatusEnum.succ
+        if id_values:
+            single_response.status_reason_code = ResolveStatusReasonCode.succ_fa_active
+            if single_resolve_request.scope == ResolveScope.details:
+                if len(id_values) == 1:
+                    single_response.id = id_values[0]
+                max_ids = _config.resolve_reverse_max_ids
+                single_response.additional_info = [
+                    {"id": id_value} for id_value in id_values[:max_ids]
+                ]
+                if len(id_values) > max_ids:
+                    single_response.status_reason_message = (
+                        f"FA is linked to more than {max_ids} IDs. "
+                        f"Only the first {max_ids} are listed."
                     )
-        await session.commit()
-        return single_resolve_responses
+        else:
+            single_response.status_reason_code = (
+                ResolveStatusReasonCode.succ_fa_not_found
+            )
+            single_response.status_reason_message = "FA is not linked to any ID."
+        return single_response
 
     def construct_single_resolve(
         self, single_resolve_request, result
@@ -270,15 +585,6 @@ class MapperService(BaseService):
             )
         return single_response
 
-    async def construct_query(self, session, single_resolve_request):
-        self.construct_single_resolve_response_for_success(single_resolve_request)
-        stmt = None
-        id_query = IdFaMapping.id_value == single_resolve_request.id
-        stmt = select(IdFaMapping).where(id_query)
-        result = await session.execute(stmt)
-        result = result.scalar()
-        return stmt, result
-
     def construct_single_resolve_response_for_success(self, single_resolve_request):
         return SingleResolveResponse(
             id=single_resolve_request.id,
@@ -306,35 +612,119 @@ class MapperService(BaseService):
             locale=single_resolve_request.locale,
         )
 
-    async def unlink(self, unlink_request: UnlinkRequest):
+    async def unlink(
+        self,
+        unlink_request: UnlinkRequest,
+        before_commit: Optional[BeforeCommitHook] = None,
+    ):
+        unlink_request_message: UnlinkRequestMessage = unlink_request.message
+        single_unlink_requests = unlink_request_message.unlink_request
+
+        validations = IdFaMappingValidations.get_component()
+        validation_errors = validations.validate_unlink_requests_structure(
+            single_unlink_requests
+        )
+        unlinked_ids = set()
+        # Fully invalid batches never check out a DB connection
+        if all(validation_errors):
+            return self.construct_unlink_responses(
+                single_unlink_requests, validation_errors, unlinked_ids
+            )
         session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
         async with session_maker() as session:
-            unlink_request_message: UnlinkRequestMessage = unlink_request.message
-            single_unlink_responses: list[SingleUnlinkResponse] = []
-            for single_unlink_request in unlink_request_message.unlink_request:
-                try:
-                    await IdFaMappingValidations.get_component().validate_unlink_request(
-                        connection=session, single_unlink_request=single_unlink_request
+            id_fa_mappings = await IdFaMapping.get_id_fa_values_by_id_values(
+                session,
+                [
+                    single_unlink_request.id
+                    for single_unlink_request in self.without_errors(
+                        single_unlink_requests, validation_errors
                     )
-                    await session.execute(
-                        delete(IdFaMapping).where(
-                            IdFaMapping.id_value == single_unlink_request.id
-                        )
+                ],
+                chunk_size=_config.db_query_chunk_size,
+            )
+            validation_errors = validations.validate_unlink_requests(
+                single_unlink_requests, id_fa_mappings, validation_errors
+            )
+
+            unlinked_ids = await self.delete_id_fa_mappings(
+                session,
+                [
+                    {
+                        "id_value": single_unlink_request.id,
+                        "fa_value": single_unlink_request.fa or None,
+                    }
+                    for single_unlink_request in self.without_errors(
+                        single_unlink_requests, validation_errors
                     )
-                    single_unlink_responses.append(
-                        self.construct_single_unlink_response_for_success(
-                            single_unlink_request
-                        )
+                ],
+            )
+            single_unlink_responses = self.construct_unlink_responses(
+                single_unlink_requests, validation_errors, unlinked_ids
+            )
+            # Lets the caller write to the same transaction, e.g. a callback outbox row
+            if before_commit:
+                await before_commit(session, single_unlink_responses)
+            await ResolveCacheInvalidator.get_component().publish(session, unlinked_ids)
+            await session.commit()
+        ResolveCache.get_component().invalidate(unlinked_ids)
+        return single_unlink_responses
+
+    def construct_unlink_responses(
+        self, single_unlink_requests, validation_errors, unlinked_ids: set[str]
+    ) -> list[SingleUnlinkResponse]:
+        single_unlink_responses: list[SingleUnlinkResponse] = []
+        for single_unlink_request, error in zip(
+            single_unlink_requests, validation_errors
+        ):
+            try:
+                if error:
+                    raise error
+                IdFaMappingValidations.get_component().validate_unlink_result(
+                    single_unlink_request=single_unlink_request,
+                    unlinked_ids=unlinked_ids,
+                )
+                single_unlink_responses.append(
+                    self.construct_single_unlink_response_for_success(
+                        single_unlink_request
                     )
-                except UnlinkValidationException as e:
-                    single_unlink_responses.append(
-                        self.construct_single_unlink_response_for_failure(
-                            single_unlink_request, e
-                        )
+                )
+            except UnlinkValidationException as e:
+                single_unlink_responses.append(
+                    self.construct_single_unlink_response_for_failure(
+                        single_unlink_request, e
                     )
-            await session.commit()
+                )
         return single_unlink_responses
 
+    async def delete_id_fa_mappings(self, session, mappings: list[dict]) -> set[str]:
+        """
+        Deletes all mappings with one DELETE ... USING (VALUES ...) per chunk.
+        A row is only deleted if its fa also matches, when an fa is given.
+        Returns the ids that were deleted.
+        """
+        unlinked_ids = set()
+        columns = [column("id_value", String()), column("fa_value", String())]
+        chunk_size = max(_config.db_query_chunk_size // len(columns), 1)
+        for i in range(0, len(mappings), chunk_size):
+            delete_values = values(*columns, name="delete_values").data(
+                [
+                    (mapping["id_value"], mapping["fa_value"])
+                    for mapping in mappings[i : i + chunk_size]
+                ]
+            )
+            fa_value = cast(delete_values.c.fa_value, String())
+            result = await session.execute(
+                delete(IdFaMapping)
+                .where(
+                    IdFaMapping.id_value == delete_values.c.id_value,
+                    or_(fa_value.is_(None), IdFaMapping.fa_value == fa_value),
+                )
+                .returning(IdFaMapping.id_value)
+                .execution_options(synchronize_session=False)
+            )
+            unlinked_ids.update(result.scalars())
+        return unlinked_ids
+
     def construct_single_unlink_response_for_success(self, single_unlink_request):
         return SingleUnlinkResponse(
             reference_id=single_unlink_request.reference_id,
@@ -0,0 +1,417 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+from openg2p_fastapi_common.context import dbengine
+from pydantic import BaseModel
+from sqlalchemy import Row, bindparam, delete, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..config import Settings
+from ..models import AsyncJob, AsyncJobStatus
+from .async_job_queue import AsyncJobLane, AsyncJobQueue
+from .exceptions import AsyncJobLeaseLostException
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+# The claimed job row whose handler is running in this task
+_claimed_job: ContextVar[Optional[Row]] = ContextVar("claimed_async_job", default=None)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
+
+class PostgresAsyncJobQueue(AsyncJobQueue):
+    """
+    Stores /async requests in the async_jobs table, keyed by correlation_id, so they
+    survive restarts and are shared by every worker process, including
+    `main.py worker` ones that do not serve HTTP.
+
+    Consumers claim due jobs with one UPDATE ... WHERE id IN
+    (SELECT ... FOR UPDATE SKIP LOCKED) per lane, which pushes their
+    next_attempt_at out by async_job_lease. Free workers are shared between the
+    lanes by weight, each lane claiming at most its free concurrency. Jobs of a
+    consumer that dies are retried by any worker once the lease expires. The
+    leases of running jobs are renewed, so slow jobs are not claimed again.
+    Failed jobs are retried after async_job_retry_delay, doubled per attempt, and
+    kept as dead after async_job_max_attempts.
+
+    A job row is deleted by the transaction writing its outcome, i.e. its mapping
+    changes, callback and txn result (see complete_job), and only while it still
+    holds the claim it ran under. So a job claimed again after a crash or a lost
+    lease takes effect once, and sends one callback.
+
+    Only lanes in the lane settings, or seen by this process, are claimed, so
+    every process needs the same lane settings.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._consume_task: Optional[asyncio.Task] = None
+        self._renew_task: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        # Running jobs, id to the attempts they were claimed with
+        self._running: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        self.failed_attempts = 0
+        self.dead = 0
+        self.leases_lost = 0
+
+    async def submit(
+        self,
+        action: str,
+        request: BaseModel,
+        correlation_id: str,
+        options: Optional[dict] = None,
+    ) -> bool:
+        now = _utcnow()
+        lane = self.get_lane(self.get_lane_name(action, request))
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            session.add(
+                AsyncJob(
+                    correlation_id=correlation_id,
+                    action=action,
+                    lane=lane.name,
+                    payload=request.model_dump_json(),
+                    options=options,
+                    status=AsyncJobStatus.pending.value,
+                    attempts=0,
+                    next_attempt_at=now,
+                    active=True,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            await session.commit()
+        lane.submitted += 1
+        self.submitted += 1
+        self._wakeup.set()
+        return True
+
+    def get_known_lanes(self) -> List[AsyncJobLane]:
+        names = (
+            set(self._handlers)
+            | set(_config.async_job_lane_weights)
+            | set(_config.async_job_lane_concurrency)
+            | set(_config.async_job_sender_lanes.values())
+        )
+        for name in names:
+            self.get_lane(name)
+        return list(self._lanes.values())
+
+    def allocate(self, lanes: List[AsyncJobLane], slots: int) -> Dict[str, int]:
+        """
+        Splits the free worker slots between the lanes by weight, within each
+        lane's free concurrency.
+        """
+        allocation = {lane.name: 0 for lane in lanes}
+        for _ in range(slots):
+            candidates = [lane for lane in lanes if allocation[lane.name] < lane.free]
+            if not candidates:
+                break
+            allocation[self.next_lane(candidates).name] += 1
+        return allocation
+
+    async def claim_due(
+        self, session: AsyncSession, lane: str, limit: int
+    ) -> List[Row]:
+        now = _utcnow()
+        due_ids = (
+            select(AsyncJob.id)
+            .where(
+                AsyncJob.status == AsyncJobStatus.pending.value,
+                AsyncJob.lane == lane,
+                AsyncJob.next_attempt_at <= now,
+            )
+            .order_by(AsyncJob.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(AsyncJob)
+            .where(AsyncJob.id.in_(due_ids))
+            .values(
+                next_attempt_at=now + timedelta(seconds=_config.async_job_lease),
+                attempts=AsyncJob.attempts + 1,
+                updated_at=now,
+            )
+            .returning(
+                AsyncJob.id,
+                AsyncJob.correlation_id,
+                AsyncJob.action,
+                AsyncJob.payload,
+                AsyncJob.options,
+                AsyncJob.attempts,
+                AsyncJob.created_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return list(result)
+
+    async def execute(self, job: Row, lane: AsyncJobLane) -> Optional[str]:
+        """
+        Returns None if processed, otherwise the error. Frees the lane slot claimed
+        for the job.
+        """
+        token = _claimed_job.set(job)
+        try:
+            request_type, _ = self._handlers[job.action]
+            await self.run_job(
+                job.action,
+                request_type.model_validate_json(job.payload),
+                job.correlation_id,
+                job.options,
+            )
+            lane.completed += 1
+            return None
+        except Exception as e:
+            lane.failed += 1
+            # A lost lease rolled this attempt back. The job is another claim's now.
+            self.leases_lost += isinstance(e, AsyncJobLeaseLostException)
+            return str(e) or type(e).__name__
+        finally:
+            _claimed_job.reset(token)
+            self._running.pop(job.id, None)
+            lane.in_flight -= 1
+            self._wakeup.set()
+
+    async def complete_job(self, session: AsyncSession) -> None:
+        """
+        Deletes the running job's row in the given transaction, as long as no other
+        worker has claimed the job since. Raises AsyncJobLeaseLostException if one
+        has, so this run's transaction is rolled back.
+        """
+        job = _claimed_job.get()
+        if not job:
+            return
+        result = await session.execute(
+            delete(AsyncJob)
+            .where(AsyncJob.id == job.id, AsyncJob.attempts == job.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            raise AsyncJobLeaseLostException(
+                f"Async job {job.correlation_id} ({job.action}) was claimed again "
+                f"after attempt {job.attempts} lost its lease. Discarding that attempt"
+            )
+        # Completed once, even if the handler writes more after this
+        _claimed_job.set(None)
+
+    async def record_results(
+        self, session: AsyncSession, jobs: List[Row], errors: List[Optional[str]]
+    ) -> None:
+        # Jobs are normally deleted by complete_job already. Only those without a
+        # transaction of their own are left, e.g. without txn results and callbacks.
+        # Every write is limited to the claim the job ran under, so it cannot touch
+        # a job claimed again by another worker.
+        completed = [
+            (job.id, job.attempts) for job, error in zip(jobs, errors) if not error
+        ]
+        if completed:
+            await session.execute(
+                delete(AsyncJob)
+                .where(tuple_(AsyncJob.id, AsyncJob.attempts).in_(completed))
+                .execution_options(synchronize_session=False)
+            )
+        now = _utcnow()
+        failed = []
+        for job, error in zip(jobs, errors):
+            if not error:
+                continue
+            dead = job.attempts >= _config.async_job_max_attempts
+            failed.append(
+                {
+                    "job_id": job.id,
+                    "job_attempts": job.attempts,
+                    "status": (
+                        AsyncJobStatus.dead.value
+                        if dead
+                        else AsyncJobStatus.pending.value
+                    ),
+                    "next_attempt_at": now
+                    + timedelta(
+                        seconds=_config.async_job_retry_delay * 2 ** (job.attempts - 1)
+                    ),
+                    "last_error": error,
+                    "updated_at": now,
+                }
+            )
+            self.dead += dead
+            _logger.error(
+                f"Async job {job.correlation_id} ({job.action}) failed, attempt "
+                f"{job.attempts}{', giving up' if dead else ''}: {error}"
+            )
+        if failed:
+            # One executemany. On the table, as the ORM would update by primary key.
+            async_jobs = AsyncJob.__table__
+            await session.execute(
+                update(async_jobs)
+                .where(
+                    async_jobs.c.id == bindparam("job_id"),
+                    async_jobs.c.attempts == bindparam("job_attempts"),
+                )
+                .values(
+                    status=bindparam("status"),
+                    next_attempt_at=bindparam("next_attempt_at"),
+                    last_error=bindparam("last_error"),
+                    updated_at=bindparam("updated_at"),
+                ),
+                failed,
+            )
+        self.completed += len(completed)
+        self.failed_attempts += len(failed)
+
+    async def run_batch(self, lane: AsyncJobLane, jobs: List[Row]) -> None:
+        errors = await asyncio.gather(*[self.execute(job, lane) for job in jobs])
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            await self.record_results(session, jobs, errors)
+            await session.commit()
+
+    async def consume_once(self) -> int:
+        """
+        Claims due jobs for the free worker slots, and starts them.
+        Returns the number claimed.
+        """
+        free = _config.async_job_workers - self.in_flight
+        lanes = self.get_known_lanes()
+        drained = set()
+        claimed = 0
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            # Slots left by lanes with fewer due jobs go to the others
+            while free > 0:
+                candidates = [
+                    lane for lane in lanes if lane.name not in drained and lane.free
+                ]
+                if not candidates:
+                    break
+                allocation = self.allocate(
+                    candidates, min(free, _config.async_job_batch_size)
+                )
+                for lane in candidates:
+                    if not allocation[lane.name]:
+                        continue
+                    jobs = await self.claim_due(
+                        session, lane.name, allocation[lane.name]
+                    )
+                    await session.commit()
+                    if len(jobs) < allocation[lane.name]:
+                        drained.add(lane.name)
+                    if not jobs:
+                        continue
+                    now = _utcnow()
+                    for job in jobs:
+                        lane.record_start((now - job.created_at).total_seconds())
+                        self._running[job.id] = job.attempts
+                    free -= len(jobs)
+                    claimed += len(jobs)
+                    batch_task = asyncio.create_task(self.run_batch(lane, jobs))
+                    self._batch_tasks.add(batch_task)
+                    batch_task.add_done_callback(self._batch_tasks.discard)
+        return claimed
+
+    async def renew_leases(self) -> None:
+        """
+        Pushes the lease of the running jobs out by async_job_lease again.
+        """
+        running = list(self._running.items())
+        if not running:
+            return
+        now = _utcnow()
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            await session.execute(
+                update(AsyncJob)
+                .where(tuple_(AsyncJob.id, AsyncJob.attempts).in_(running))
+                .values(
+                    next_attempt_at=now + timedelta(seconds=_config.async_job_lease),
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    async def _renew_leases_loop(self) -> None:
+        while True:
+            # Renewed well before they expire, even if one renewal fails
+            await asyncio.sleep(_config.async_job_lease / 3)
+            try:
+                await self.renew_leases()
+            except Exception as e:
+                _logger.error(f"Error renewing async job leases: {e}")
+
+    async def _consume_loop(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await self.consume_once()
+            except Exception as e:
+                _logger.error(f"Error consuming async jobs: {e}")
+            # Woken by new jobs and by freed worker slots
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), _config.async_job_poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def start(self) -> None:
+        if not _config.async_job_consumer_enabled or self._consume_task:
+            return
+        self._stopping = False
+        self._consume_task = asyncio.create_task(self._consume_loop())
+        self._renew_task = asyncio.create_task(self._renew_leases_loop())
+
+    async def stop(self) -> None:
+        """
+        Stops claiming jobs and waits up to async_job_queue_drain_timeout for the
+        claimed ones. Jobs still running after that are retried elsewhere once
+        their lease expires.
+        """
+        if not self._consume_task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._consume_task
+        self._consume_task = None
+        if self._batch_tasks:
+            _, pending = await asyncio.wait(
+                self._batch_tasks, timeout=_config.async_job_queue_drain_timeout
+            )
+            if pending:
+                _logger.warning(
+                    f"Async jobs still running at shutdown. {self.in_flight} jobs "
+                    f"left to be retried after their lease"
+                )
+                for batch_task in pending:
+                    batch_task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        self._renew_task.cancel()
+        await asyncio.gather(self._renew_task, return_exceptions=True)
+        self._renew_task = None
+
+    def get_metrics(self) -> dict:
+        return {
+            "backend": "postgres",
+            "consumer_enabled": _config.async_job_consumer_enabled,
+            "running": bool(self._consume_task and not self._consume_task.done()),
+            "workers": _config.async_job_workers,
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed_attempts": self.failed_attempts,
+            "dead": self.dead,
+            "leases_lost": self.leases_lost,
+            "lanes": {
+                name: lane.get_metrics() for name, lane in sorted(self._lanes.items())
+            },
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from openg2p_fastapi_common.context import dbengine
+from openg2p_fastapi_common.service import BaseService
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from ..config import Settings
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+_force_primary: ContextVar[bool] = ContextVar("force_primary", default=False)
+
+# Seconds since the last replayed transaction, or 0 when fully caught up.
+# Returns 0 on a primary, NULL on a replica that has not replayed anything yet.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+    "END"
+)
+
+
+class ReadReplica(BaseService):
+    """
+    Routes read-only queries to an optional read replica (db_replica_datasource).
+    Reads go to the primary when no replica is configured, when the caller forced
+    the primary, or when the replica lag is unknown or above db_replica_max_lag.
+    Writes, and reads that must see them, always use dbengine directly.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.engine: Optional[AsyncEngine] = None
+        if _config.db_replica_datasource:
+            self.engine = create_async_engine(
+                _config.db_replica_datasource, echo=_config.db_logging
+            )
+        self.lag_seconds: Optional[float] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    @property
+    def replica_usable(self) -> bool:
+        return (
+            self.enabled
+            and self.lag_seconds is not None
+            and self.lag_seconds <= _config.db_replica_max_lag
+        )
+
+    @staticmethod
+    @contextmanager
+    def force_primary(force: bool = True):
+        """
+        Sends the reads made inside this block, and in tasks created from it,
+        to the primary.
+        """
+        token = _force_primary.set(force or _force_primary.get())
+        try:
+            yield
+        finally:
+            _force_primary.reset(token)
+
+    def get_read_engine(self) -> AsyncEngine:
+        if not _force_primary.get() and self.replica_usable:
+            self.replica_reads += 1
+            return self.engine
+        self.primary_reads += 1
+        return dbengine.get()
+
+    async def check_lag(self) -> None:
+        try:
+            async with self.engine.connect() as connection:
+                lag_seconds = await connection.scalar(REPLICA_LAG_QUERY)
+            self.lag_seconds = float(lag_seconds) if lag_seconds is not None else None
+        except Exception as e:
+            self.lag_seconds = None
+            _logger.error(f"Error checking read replica lag: {e}")
+
+    async def _check_lag_loop(self) -> None:
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(_config.db_replica_lag_check_interval)
+
+    async def start(self) -> None:
+        if not self.enabled or self._lag_task:
+            return
+        self._lag_task = asyncio.create_task(self._check_lag_loop())
+
+    async def stop(self) -> None:
+        if self._lag_task:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+        if self.engine:
+            await self.engine.dispose()
+
+    def get_metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "lag_seconds": self.lag_seconds,
+            "replica_usable": self.replica_usable,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
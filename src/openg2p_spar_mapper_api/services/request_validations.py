@@ -42,6 +42,14 @@ class RequestValidation(BaseService):
             )
         return None
 
+    def validate_txn_status_request_header(self, request) -> None:
+        if request.header.action != "txn-status":
+            raise RequestValidationException(
+                code=SyncResponseStatusReasonCodeEnum.rjct_action_not_supported,
+                message=SyncResponseStatusReasonCodeEnum.rjct_action_not_supported,
+            )
+        return None
+
     def validate_request(self, request) -> None:
         # TODO: Validate the request
         return None
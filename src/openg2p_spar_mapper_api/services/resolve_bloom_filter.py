@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Iterable, Optional
+
+from openg2p_fastapi_common.context import dbengine
+from openg2p_fastapi_common.service import BaseService
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..config import Settings
+from ..models import IdFaMapping
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter over strings, using double hashing of one blake2b digest.
+    """
+
+    def __init__(self, expected_items: int, false_positive_rate: float):
+        expected_items = max(expected_items, 1)
+        self.num_bits = max(
+            int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)),
+            8,
+        )
+        self.num_hashes = max(round(self.num_bits / expected_items * math.log(2)), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.num_items = 0
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.num_items += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        return (
+            1 - math.exp(-self.num_hashes * self.num_items / self.num_bits)
+        ) ** self.num_hashes
+
+
+class ResolveBloomFilter(BaseService):
+    """
+    Per-process Bloom filter over all linked id_values, used to answer resolves
+    for never-linked ids without a DB round trip.
+
+    The filter is built by a background task with a streaming scan, and rebuilt
+    periodically to drop unlinked ids. Ids linked by this process are added
+    directly, and ids linked by other processes arrive through the
+    ResolveCacheInvalidator. The filter is only trusted while that listener is
+    connected and after a full rebuild since it (re)connected, since a false
+    negative would wrongly report a linked id as not linked.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._filter: Optional[BloomFilter] = None
+        # Ids added while a rebuild is scanning, copied into the new filter
+        self._pending: Optional[set] = None
+        self._connected = False
+        # Bumped on every disconnect, a rebuild started before is not trusted
+        self._epoch = 0
+        self._ready = False
+        self._rebuild_requested = asyncio.Event()
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+        self.definite_misses = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self.last_rebuild_seconds: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return _config.resolve_bloom_filter_enabled
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self._ready and self._connected
+
+    def filter_misses(self, id_values: list[str]) -> list[str]:
+        """
+        Returns the ids that may be linked. The rest are definitely not linked.
+        """
+        if not self.ready:
+            return id_values
+        bloom_filter = self._filter
+        maybe_linked = [id_value for id_value in id_values if id_value in bloom_filter]
+        self.definite_misses += len(id_values) - len(maybe_linked)
+        return maybe_linked
+
+    def record_false_positives(self, count: int) -> None:
+        if self.ready:
+            self.false_positives += count
+
+    def add(self, id_values: Iterable[str]) -> None:
+        if not self.enabled:
+            return
+        id_values = list(id_values)
+        if self._pending is not None:
+            self._pending.update(id_values)
+        if self._filter:
+            for id_value in id_values:
+                self._filter.add(id_value)
+
+    def on_connect(self) -> None:
+        self._connected = True
+        # Links made while disconnected may have been missed
+        self.request_rebuild()
+
+    def on_disconnect(self) -> None:
+        self._connected = False
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Stops trusting the filter, and any rebuild already scanning, until a
+        rebuild started after this finishes. For when links may have been missed.
+        """
+        self._ready = False
+        self._epoch += 1
+
+    def request_rebuild(self) -> None:
+        self._rebuild_requested.set()
+
+    async def rebuild(self) -> None:
+        start_time = time.monotonic()
+        epoch = self._epoch
+        was_connected = self._connected
+        self._pending = set()
+        try:
+            session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+            async with session_maker() as session:
+                count = await session.scalar(
+                    select(func.count()).select_from(IdFaMapping)
+                )
+                # Leave room for links made until the next rebuild
+                bloom_filter = BloomFilter(
+                    max(
+                        count * _config.resolve_bloom_filter_growth_factor,
+                        _config.resolve_bloom_filter_min_items,
+                    ),
+                    _config.resolve_bloom_filter_false_positive_rate,
+                )
+                result = await session.stream_scalars(
+                    select(IdFaMapping.id_value).execution_options(
+                        yield_per=_config.db_query_chunk_size
+                    )
+                )
+                async for id_value in result:
+                    bloom_filter.add(id_value)
+            for id_value in self._pending:
+                bloom_filter.add(id_value)
+        finally:
+            self._pending = None
+        self._filter = bloom_filter
+        self._ready = was_connected and epoch == self._epoch
+        self.rebuilds += 1
+        self.last_rebuild_seconds = time.monotonic() - start_time
+
+    async def _rebuild_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._rebuild_requested.wait(),
+                    _config.resolve_bloom_filter_rebuild_interval,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._rebuild_requested.clear()
+            try:
+                await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.error(f"Error rebuilding resolve bloom filter: {e}")
+                await asyncio.sleep(_config.resolve_bloom_filter_retry_interval)
+                self.request_rebuild()
+
+    async def start(self) -> None:
+        # The first build is requested once the invalidation listener connects
+        if not self.enabled or self._rebuild_task:
+            return
+        self._rebuild_task = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self) -> None:
+        if not self._rebuild_task:
+            return
+        self._rebuild_task.cancel()
+        try:
+            await self._rebuild_task
+        except asyncio.CancelledError:
+            pass
+        self._rebuild_task = None
+
+    def get_metrics(self) -> dict:
+        bloom_filter = self._filter
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "items": bloom_filter.num_items if bloom_filter else 0,
+            "memory_bytes": len(bloom_filter.bits) if bloom_filter else 0,
+            "estimated_false_positive_rate": (
+                bloom_filter.estimated_false_positive_rate if bloom_filter else None
+            ),
+            "definite_misses": self.definite_misses,
+            "false_positives": self.false_positives,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_seconds": self.last_rebuild_seconds,
+        }
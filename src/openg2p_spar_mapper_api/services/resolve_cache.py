@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from openg2p_fastapi_common.service import BaseService
+
+from ..config import Settings
+
+_config = Settings.get_config()
+
+
+class ResolveCache(BaseService):
+    """
+    Bounded, per-process LRU cache of resolve lookup results by id_value, with a TTL.
+    Negative lookups are cached as None. Writers must call invalidate() for the ids
+    they change, so that a worker never serves its own stale writes.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = (
+            max_entries
+            if max_entries is not None
+            else _config.resolve_cache_max_entries
+        )
+        self.ttl = ttl if ttl is not None else _config.resolve_cache_ttl
+
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        # Bumped on every invalidation. Results fetched before an invalidation
+        # may already be stale, so put_many drops them.
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return _config.resolve_cache_enabled and self.max_entries > 0
+
+    def get_many(self, id_values: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Returns the cached {id_value: mapping or None} and the list of ids not in cache.
+        """
+        found = {}
+        missing = []
+        now = time.monotonic()
+        for id_value in id_values:
+            entry = self._entries.get(id_value)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(id_value)
+                found[id_value] = entry[1]
+                self.hits += 1
+            else:
+                if entry:
+                    del self._entries[id_value]
+                missing.append(id_value)
+                self.misses += 1
+        return found, missing
+
+    def put_many(
+        self,
+        id_values: Iterable[str],
+        id_fa_mappings: Dict[str, Any],
+        generation: int,
+    ) -> None:
+        """
+        Caches the lookup result of every id in id_values. Ids absent from
+        id_fa_mappings are cached as negative results. Skipped if anything was
+        invalidated since the given generation was read.
+        """
+        if generation != self.generation:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for id_value in id_values:
+            self._entries[id_value] = (expires_at, id_fa_mappings.get(id_value))
+            self._entries.move_to_end(id_value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, id_values: Iterable[str]) -> None:
+        self.generation += 1
+        for id_value in id_values:
+            self._entries.pop(id_value, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def get_metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
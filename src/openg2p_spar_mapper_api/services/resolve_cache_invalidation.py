@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Iterable, List, Optional
+
+from openg2p_fastapi_common.service import BaseService
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from ..config import Settings
+from .resolve_bloom_filter import ResolveBloomFilter
+from .resolve_cache import ResolveCache
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+CLEAR_ALL_PAYLOAD = "*"
+# Also means ids were linked, so resolve bloom filters must not be trusted until
+# rebuilt
+CLEAR_ALL_LINKED_PAYLOAD = "*linked"
+
+
+class PostgresInvalidationChannel:
+    """
+    Publishes with pg_notify in the writer's own transaction, so notifications are
+    only delivered once the change is committed. Listens on a dedicated asyncpg
+    connection, reconnecting whenever it is lost.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    async def publish(self, session, payloads: List[str]) -> None:
+        await session.execute(
+            text(
+                "SELECT pg_notify(:channel, payload) "
+                "FROM unnest(CAST(:payloads AS text[])) AS payload"
+            ),
+            {"channel": self.channel, "payloads": payloads},
+        )
+
+    async def listen(
+        self,
+        on_payload: Callable[[str], None],
+        on_connect: Callable[[], None],
+        on_disconnect: Callable[[], None],
+    ) -> None:
+        import asyncpg
+
+        dsn = (
+            make_url(_config.db_datasource)
+            .set(drivername="postgresql")
+            .render_as_string(hide_password=False)
+        )
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                terminated = asyncio.Event()
+                connection.add_termination_listener(
+                    lambda _, terminated=terminated: terminated.set()
+                )
+                await connection.add_listener(
+                    self.channel, lambda *args: on_payload(args[-1])
+                )
+                # Notifications may have been missed while disconnected
+                on_connect()
+                await terminated.wait()
+                _logger.warning("Resolve cache invalidation listener disconnected")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.error(f"Error in resolve cache invalidation listener: {e}")
+            finally:
+                on_disconnect()
+                if connection and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(_config.resolve_cache_invalidation_reconnect_interval)
+
+
+class InProcessInvalidationChannel:
+    """
+    Delivers published payloads straight to the listeners of this process.
+    Meant for tests and single-process deployments.
+    """
+
+    def __init__(self):
+        self.listeners: List[Callable[[str], None]] = []
+
+    async def publish(self, session, payloads: List[str]) -> None:
+        for on_payload in list(self.listeners):
+            for payload in payloads:
+                on_payload(payload)
+
+    async def listen(
+        self,
+        on_payload: Callable[[str], None],
+        on_connect: Callable[[], None],
+        on_disconnect: Callable[[], None],
+    ) -> None:
+        self.listeners.append(on_payload)
+        on_connect()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.listeners.remove(on_payload)
+            on_disconnect()
+
+
+class ResolveCacheInvalidator(BaseService):
+    """
+    Propagates resolve cache invalidations, and new ids for the resolve bloom
+    filter, to every worker process and pod.
+    Changed ids are packed into as few notifications as possible. Batches that
+    would need more than resolve_cache_invalidation_max_notifications are sent
+    as a single "clear all" notification instead. Only a clear all of linked ids
+    makes the bloom filters rebuild, since updated and unlinked ids cannot cause
+    false negatives.
+    """
+
+    def __init__(self, channel=None, **kwargs):
+        super().__init__(**kwargs)
+        self.channel = channel or PostgresInvalidationChannel(
+            _config.resolve_cache_invalidation_channel
+        )
+        self._listener_task: Optional[asyncio.Task] = None
+
+        self.published_notifications = 0
+        self.received_notifications = 0
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            ResolveCache.get_component().enabled
+            or ResolveBloomFilter.get_component().enabled
+        )
+
+    async def publish(
+        self, session, id_values: Iterable[str], linked: bool = False
+    ) -> None:
+        if not self.enabled:
+            return
+        payloads = self.construct_payloads(id_values, linked)
+        if payloads:
+            await self.channel.publish(session, payloads)
+            self.published_notifications += len(payloads)
+
+    def construct_payloads(
+        self, id_values: Iterable[str], linked: bool = False
+    ) -> List[str]:
+        payloads = []
+        batch = []
+        batch_size = 2
+        for id_value in id_values:
+            encoded = json.dumps(id_value)
+            if batch and batch_size + len(encoded) + 1 > MAX_PAYLOAD_BYTES:
+                payloads.append(f"[{','.join(batch)}]")
+                batch = []
+                batch_size = 2
+                if (
+                    len(payloads)
+                    >= _config.resolve_cache_invalidation_max_notifications
+                ):
+                    return [CLEAR_ALL_LINKED_PAYLOAD if linked else CLEAR_ALL_PAYLOAD]
+            batch.append(encoded)
+            batch_size += len(encoded) + 1
+        if batch:
+            payloads.append(f"[{','.join(batch)}]")
+        return payloads
+
+    def on_payload(self, payload: str) -> None:
+        self.received_notifications += 1
+        resolve_cache = ResolveCache.get_component()
+        resolve_bloom_filter = ResolveBloomFilter.get_component()
+        if payload == CLEAR_ALL_PAYLOAD:
+            resolve_cache.clear()
+        elif payload == CLEAR_ALL_LINKED_PAYLOAD:
+            resolve_cache.clear()
+            resolve_bloom_filter.invalidate()
+            resolve_bloom_filter.request_rebuild()
+        else:
+            id_values = json.loads(payload)
+            resolve_cache.invalidate(id_values)
+            resolve_bloom_filter.add(id_values)
+
+    def on_connect(self) -> None:
+        ResolveCache.get_component().clear()
+        ResolveBloomFilter.get_component().on_connect()
+
+    def on_disconnect(self) -> None:
+        ResolveBloomFilter.get_component().on_disconnect()
+
+    async def start(self) -> None:
+        if not self.enabled or self._listener_task:
+            return
+        self._listener_task = asyncio.create_task(
+            self.channel.listen(self.on_payload, self.on_connect, self.on_disconnect)
+        )
+
+    async def stop(self) -> None:
+        if not self._listener_task:
+            return
+        self._listener_task.cancel()
+        try:
+            await self._listener_task
+        except asyncio.CancelledError:
+            pass
+        self._listener_task = None
+
+    def get_metrics(self) -> dict:
+        return {
+            "listening": bool(self._listener_task and not self._listener_task.done()),
+            "published_notifications": self.published_notifications,
+            "received_notifications": self.received_notifications,
+        }
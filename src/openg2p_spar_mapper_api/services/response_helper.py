@@ -1,4 +1,6 @@
 from datetime import datetime
+from operator import attrgetter
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple, Type
 
 from openg2p_fastapi_common.service import BaseService
 from openg2p_g2pconnect_common_lib.schemas import (
@@ -13,185 +15,166 @@ from openg2p_g2pconnect_common_lib.schemas import (
     SyncResponseHeader,
 )
 from openg2p_g2pconnect_mapper_lib.schemas import (
-    LinkRequest,
-    LinkRequestMessage,
     LinkResponse,
     LinkResponseMessage,
-    ResolveRequest,
-    ResolveRequestMessage,
     ResolveResponse,
     ResolveResponseMessage,
-    SingleLinkResponse,
-    SingleResolveResponse,
-    SingleUnlinkResponse,
-    SingleUpdateResponse,
-    UnlinkRequest,
-    UnlinkRequestMessage,
+    SingleTxnStatusResponse,
+    TxnStatusResponse,
+    TxnStatusResponseMessage,
     UnlinkResponse,
     UnlinkResponseMessage,
-    UpdateRequest,
-    UpdateRequestMessage,
     UpdateResponse,
     UpdateResponseMessage,
 )
+from pydantic import BaseModel
 
 from .exceptions import (
     RequestValidationException,
 )
 
+_get_status = attrgetter("status")
+
+
+def _get_txn_status(single_response: SingleTxnStatusResponse) -> StatusEnum:
+    return StatusEnum(single_response.txn_status["status"])
+
+
+# By action: the sync response type, its message type, the message field holding
+# the single responses, and how to read a single response's status
+_SUCCESS_RESPONSE_TYPES: Dict[
+    str, Tuple[Type[BaseModel], Type[BaseModel], str, Callable[..., StatusEnum]]
+] = {
+    "link": (LinkResponse, LinkResponseMessage, "link_response", _get_status),
+    "update": (UpdateResponse, UpdateResponseMessage, "update_response", _get_status),
+    "resolve": (
+        ResolveResponse,
+        ResolveResponseMessage,
+        "resolve_response",
+        _get_status,
+    ),
+    "unlink": (UnlinkResponse, UnlinkResponseMessage, "unlink_response", _get_status),
+    "txn-status": (
+        TxnStatusResponse,
+        TxnStatusResponseMessage,
+        "txnstatus_response",
+        _get_txn_status,
+    ),
+}
+
+
+def _construct_success_header(
+    request: Request,
+    header_type: Type[BaseModel],
+    total_count: int,
+    completed_count: Optional[int],
+) -> BaseModel:
+    return header_type(
+        version="1.0.0",
+        message_id=request.header.message_id,
+        message_ts=datetime.now().isoformat(),
+        action=request.header.action,
+        status=StatusEnum.succ,
+        status_reason_code=None,
+        status_reason_message=None,
+        total_count=total_count,
+        completed_count=completed_count,
+        sender_id=request.header.sender_id,
+        receiver_id=request.header.receiver_id,
+        is_msg_encrypted=False,
+        meta={},
+    )
+
+
+def _construct_success_response(
+    action: str,
+    request: Request,
+    single_responses: list[BaseModel],
+    header_type: Type[BaseModel],
+) -> Tuple[Type[BaseModel], BaseModel, BaseModel]:
+    """
+    Builds the header and message of a success response. The statuses are read in
+    one pass and counted in C. The single responses were already built by
+    MapperService, so the message holding them is not validated again.
+    """
+    response_type, message_type, response_field, get_status = _SUCCESS_RESPONSE_TYPES[
+        action
+    ]
+    statuses = list(map(get_status, single_responses))
+    header = _construct_success_header(
+        request, header_type, len(statuses), statuses.count(StatusEnum.succ)
+    )
+    message = message_type.model_construct(
+        transaction_id=request.message.transaction_id,
+        correlation_id=None,
+        **{response_field: single_responses},
+    )
+    return response_type, header, message
+
 
 class SyncResponseHelper(BaseService):
-    def construct_success_sync_link_response(
-        self,
-        link_request: LinkRequest,
-        single_link_responses: list[SingleLinkResponse],
-    ) -> LinkResponse:
-        link_request_message: LinkRequestMessage = link_request.message
-        link_response_message: LinkResponseMessage = LinkResponseMessage(
-            transaction_id=link_request_message.transaction_id,
-            correlation_id=None,
-            link_response=single_link_responses,
-        )
-        total_count = len(link_response_message.link_response)
-        completed_count = len(
-            [
-                link
-                for link in link_response_message.link_response
-                if link.status == StatusEnum.succ
-            ]
-        )
-        return LinkResponse(
-            header=SyncResponseHeader(
-                version="1.0.0",
-                message_id=link_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=link_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=link_request.header.sender_id,
-                receiver_id=link_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
-            ),
-            message=link_response_message,
+    def construct_success_sync_response(
+        self, action: str, request: Request, single_responses: list[BaseModel]
+    ) -> BaseModel:
+        """
+        Returns the sync response of the action, e.g. a LinkResponse for link.
+        """
+        response_type, header, message = _construct_success_response(
+            action, request, single_responses, SyncResponseHeader
         )
+        return response_type(header=header, message=message)
 
-    def construct_success_sync_update_response(
+    async def stream_success_sync_response(
         self,
-        update_request: UpdateRequest,
-        single_update_responses: list[SingleUpdateResponse],
-    ) -> UpdateResponse:
-        update_request_message: UpdateRequestMessage = update_request.message
-        update_response_message: UpdateResponseMessage = UpdateResponseMessage(
-            transaction_id=update_request_message.transaction_id,
-            correlation_id=None,
-            update_response=single_update_responses,
-        )
-        total_count = len(update_response_message.update_response)
-        completed_count = len(
-            [
-                update
-                for update in update_response_message.update_response
-                if update.status == StatusEnum.succ
-            ]
-        )
-        return UpdateResponse(
-            header=SyncResponseHeader(
-                version="1.0.0",
-                message_id=update_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=update_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=update_request.header.sender_id,
-                receiver_id=update_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
+        action: str,
+        request: Request,
+        total_count: int,
+        single_response_chunks: AsyncIterator[list[BaseModel]],
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the sync response of the action as NDJSON, one chunk of single
+        responses at a time. The first line is the response without its single
+        responses, and with completed_count null. Then comes one line per single
+        response, and last {"header": ...} with the final counts. A stream without
+        that last line was cut short by an error.
+        """
+        (
+            response_type,
+            message_type,
+            response_field,
+            get_status,
+        ) = _SUCCESS_RESPONSE_TYPES[action]
+        response = response_type(
+            header=_construct_success_header(
+                request, SyncResponseHeader, total_count, None
             ),
-            message=update_response_message,
-        )
-
-    def construct_success_sync_resolve_response(
-        self,
-        resolve_request: ResolveRequest,
-        single_resolve_responses: list[SingleResolveResponse],
-    ) -> ResolveResponse:
-        resolve_request_message: ResolveRequestMessage = resolve_request.message
-        resolve_response_message: ResolveResponseMessage = ResolveResponseMessage(
-            transaction_id=resolve_request_message.transaction_id,
-            correlation_id=None,
-            resolve_response=single_resolve_responses,
-        )
-        total_count = len(resolve_response_message.resolve_response)
-        completed_count = len(
-            [
-                resolve
-                for resolve in resolve_response_message.resolve_response
-                if resolve.status == StatusEnum.succ
-            ]
-        )
-        return ResolveResponse(
-            header=SyncResponseHeader(
-                version="1.0.0",
-                message_id=resolve_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=resolve_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=resolve_request.header.sender_id,
-                receiver_id=resolve_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
+            message=message_type.model_construct(
+                transaction_id=request.message.transaction_id,
+                correlation_id=None,
+                **{response_field: []},
             ),
-            message=resolve_response_message,
-        )
-
-    def construct_success_sync_unlink_response(
-        self,
-        unlink_request: UnlinkRequest,
-        single_unlink_responses: list[SingleUnlinkResponse],
-    ) -> UnlinkResponse:
-        unlink_request_message: UnlinkRequestMessage = unlink_request.message
-        unlink_response_message: UnlinkResponseMessage = UnlinkResponseMessage(
-            transaction_id=unlink_request_message.transaction_id,
-            correlation_id=None,
-            unlink_response=single_unlink_responses,
-        )
-        total_count = len(unlink_response_message.unlink_response)
-        completed_count = len(
-            [
-                unlink
-                for unlink in unlink_response_message.unlink_response
-                if unlink.status == StatusEnum.succ
-            ]
         )
-        return UnlinkResponse(
-            header=SyncResponseHeader(
-                version="1.0.0",
-                message_id=unlink_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=unlink_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=unlink_request.header.sender_id,
-                receiver_id=unlink_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
-            ),
-            message=unlink_response_message,
+        yield response.__pydantic_serializer__.to_json(
+            response, by_alias=True, exclude={"message": {response_field}}
+        ) + b"\n"
+        completed_count = 0
+        async for single_responses in single_response_chunks:
+            completed_count += list(map(get_status, single_responses)).count(
+                StatusEnum.succ
+            )
+            yield b"".join(
+                single_response.__pydantic_serializer__.to_json(
+                    single_response, by_alias=True
+                )
+                + b"\n"
+                for single_response in single_responses
+            )
+        header = _construct_success_header(
+            request, SyncResponseHeader, total_count, completed_count
         )
+        yield b'{"header":' + header.__pydantic_serializer__.to_json(
+            header, by_alias=True
+        ) + b"}\n"
 
     def construct_error_sync_response(
         self, request: Request, exception: RequestValidationException
@@ -241,162 +224,17 @@ class AsyncResponseHelper(BaseService):
             )
         )
 
-    def construct_success_async_callback_link_request(
+    def construct_success_async_callback_request(
         self,
-        link_request: LinkRequest,
-        correlation_id: str,
-        single_link_responses: list[SingleLinkResponse],
-    ) -> AsyncCallbackRequest:
-        total_count = len(single_link_responses)
-        completed_count = len(
-            [link for link in single_link_responses if link.status == StatusEnum.succ]
-        )
-        link_request_message: LinkRequestMessage = link_request.message
-
-        link_response_message: LinkResponseMessage = LinkResponseMessage(
-            transaction_id=link_request_message.transaction_id,
-            correlation_id=None,
-            link_response=single_link_responses,
-        )
-        return AsyncCallbackRequest(
-            signature=None,
-            header=AsyncCallbackRequestHeader(
-                version="1.0.0",
-                message_id=link_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=link_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=link_request.header.sender_id,
-                receiver_id=link_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
-            ),
-            message=link_response_message,
-        )
-
-    def construct_success_async_callback_update_request(
-        self,
-        update_request: UpdateRequest,
-        correlation_id: str,
-        single_update_responses: list[SingleUpdateResponse],
-    ) -> AsyncCallbackRequest:
-        total_count = len(single_update_responses)
-        completed_count = len(
-            [
-                update
-                for update in single_update_responses
-                if update.status == StatusEnum.succ
-            ]
-        )
-        update_request_message: UpdateRequestMessage = update_request.message
-        update_response_message: UpdateResponseMessage = UpdateResponseMessage(
-            transaction_id=update_request_message.transaction_id,
-            correlation_id=None,
-            update_response=single_update_responses,
-        )
-        return AsyncCallbackRequest(
-            signature=None,
-            header=AsyncCallbackRequestHeader(
-                version="1.0.0",
-                message_id=update_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=update_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=update_request.header.sender_id,
-                receiver_id=update_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
-            ),
-            message=update_response_message,
-        )
-
-    def construct_success_async_callback_resolve_request(
-        self,
-        resolve_request: ResolveRequest,
-        correlation_id: str,
-        single_resolve_responses: list[SingleResolveResponse],
-    ) -> AsyncCallbackRequest:
-        total_count = len(single_resolve_responses)
-        completed_count = len(
-            [
-                resolve
-                for resolve in single_resolve_responses
-                if resolve.status == StatusEnum.succ
-            ]
-        )
-        resolve_request_message: ResolveRequestMessage = resolve_request.message
-        resolve_response_message: ResolveResponseMessage = ResolveResponseMessage(
-            transaction_id=resolve_request_message.transaction_id,
-            correlation_id=None,
-            resolve_response=single_resolve_responses,
-        )
-        return AsyncCallbackRequest(
-            signature=None,
-            header=AsyncCallbackRequestHeader(
-                version="1.0.0",
-                message_id=resolve_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=resolve_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=resolve_request.header.sender_id,
-                receiver_id=resolve_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
-            ),
-            message=resolve_response_message,
-        )
-
-    def construct_success_async_callback_unlink_request(
-        self,
-        unlink_request: UnlinkRequest,
+        action: str,
+        request: Request,
         correlation_id: str,
-        single_unlink_responses: list[SingleUnlinkResponse],
+        single_responses: list[BaseModel],
     ) -> AsyncCallbackRequest:
-        total_count = len(single_unlink_responses)
-        completed_count = len(
-            [
-                unlink
-                for unlink in single_unlink_responses
-                if unlink.status == StatusEnum.succ
-            ]
-        )
-        unlink_request_message: UnlinkRequestMessage = unlink_request.message
-        unlink_response_message: UnlinkResponseMessage = UnlinkResponseMessage(
-            transaction_id=unlink_request_message.transaction_id,
-            correlation_id=None,
-            unlink_response=single_unlink_responses,
-        )
-        return AsyncCallbackRequest(
-            signature=None,
-            header=AsyncCallbackRequestHeader(
-                version="1.0.0",
-                message_id=unlink_request.header.message_id,
-                message_ts=datetime.now().isoformat(),
-                action=unlink_request.header.action,
-                status=StatusEnum.succ,
-                status_reason_code=None,
-                status_reason_message=None,
-                total_count=total_count,
-                completed_count=completed_count,
-                sender_id=unlink_request.header.sender_id,
-                receiver_id=unlink_request.header.receiver_id,
-                is_msg_encrypted=False,
-                meta={},
-            ),
-            message=unlink_response_message,
+        _, header, message = _construct_success_response(
+            action, request, single_responses, AsyncCallbackRequestHeader
         )
+        return AsyncCallbackRequest(signature=None, header=header, message=message)
 
     def construct_error_async_callback_request(
         self,
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from openg2p_fastapi_common.context import dbengine
+from openg2p_fastapi_common.service import BaseService
+from openg2p_g2pconnect_common_lib.schemas import AsyncCallbackRequest, StatusEnum
+from openg2p_g2pconnect_mapper_lib.schemas import (
+    SingleTxnStatusRequest,
+    SingleTxnStatusResponse,
+    TxnAttributeType,
+    TxnStatusRequest,
+)
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..config import Settings
+from ..errors import TxnStatusReasonCodeEnum
+from ..models import TxnResult
+
+_config = Settings.get_config()
+_logger = logging.getLogger(_config.logging_default_logger_name)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
+
+class TxnResultStore(BaseService):
+    """
+    Keeps the callback of every /async request in the txn_results table for
+    txn_result_ttl, so senders can fetch it with txn/status by correlation_id or
+    transaction_id when the callback was lost or cannot be received.
+    Results are stored zlib compressed and expired rows are deleted by a
+    periodic sweep.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sweep_task: Optional[asyncio.Task] = None
+
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+        self.swept = 0
+
+    async def put(
+        self,
+        correlation_id: str,
+        transaction_id: Optional[str],
+        callback_request: AsyncCallbackRequest,
+        session: Optional[AsyncSession] = None,
+    ) -> None:
+        """
+        Stores the result of a request. When a session is given, it is only
+        stored if that session's transaction commits.
+        """
+        if not _config.txn_result_store_enabled:
+            return
+        now = _utcnow()
+        values = {
+            "correlation_id": correlation_id,
+            "transaction_id": transaction_id,
+            "sender_id": callback_request.header.sender_id,
+            "action": callback_request.header.action,
+            "result": zlib.compress(callback_request.model_dump_json().encode()),
+            "expires_at": now + timedelta(seconds=_config.txn_result_ttl),
+            "active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        stmt = insert(TxnResult).values(**values)
+        # A retried job replaces the result of its earlier attempt
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TxnResult.correlation_id],
+            set_={
+                key: stmt.excluded[key]
+                for key in ("result", "expires_at", "updated_at")
+            },
+        )
+        if session:
+            await session.execute(stmt)
+        else:
+            session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+            async with session_maker() as session:
+                await session.execute(stmt)
+                await session.commit()
+        self.stored += 1
+
+    async def get_results(
+        self,
+        sender_id: Optional[str],
+        attribute_type: TxnAttributeType,
+        attribute_values: Iterable[str],
+    ) -> Dict[str, dict]:
+        """
+        Returns the unexpired results of the sender, by correlation_id or
+        transaction_id. For a transaction_id used more than once, the latest wins.
+        """
+        column = (
+            TxnResult.correlation_id
+            if attribute_type == TxnAttributeType.correlation_id
+            else TxnResult.transaction_id
+        )
+        attribute_values = list(dict.fromkeys(attribute_values))
+        chunk_size = _config.db_query_chunk_size
+        response = {}
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        async with session_maker() as session:
+            for i in range(0, len(attribute_values), chunk_size):
+                result = await session.execute(
+                    select(column, TxnResult.result)
+                    .where(
+                        column.in_(attribute_values[i : i + chunk_size]),
+                        TxnResult.sender_id == sender_id,
+                        TxnResult.expires_at > _utcnow(),
+                    )
+                    .order_by(TxnResult.id)
+                )
+                for attribute_value, txn_result in result:
+                    response[attribute_value] = json.loads(zlib.decompress(txn_result))
+        return response
+
+    async def get_txn_status(
+        self, txn_status_request: TxnStatusRequest
+    ) -> List[SingleTxnStatusResponse]:
+        """
+        Answers every item of the request, fetching the results for all of them
+        with one query per attribute type.
+        """
+        sender_id = txn_status_request.header.sender_id
+        single_requests = txn_status_request.message.txnstatus_request
+        results = {}
+        for attribute_type in (
+            TxnAttributeType.correlation_id,
+            TxnAttributeType.transaction_id,
+        ):
+            attribute_values = [
+                single_request.attribute_value
+                for single_request in single_requests
+                if single_request.attribute_type == attribute_type
+            ]
+            if attribute_values:
+                results[attribute_type] = await self.get_results(
+                    sender_id, attribute_type, attribute_values
+                )
+        return [
+            self.construct_single_txn_status_response(
+                single_request,
+                results.get(single_request.attribute_type, {}).get(
+                    single_request.attribute_value
+                ),
+            )
+            for single_request in single_requests
+        ]
+
+    def construct_single_txn_status_response(
+        self, single_request: SingleTxnStatusRequest, result: Optional[dict]
+    ) -> SingleTxnStatusResponse:
+        txn_status = {
+            "reference_id": single_request.reference_id,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if single_request.attribute_type == TxnAttributeType.reference_id_list:
+            txn_status.update(
+                status=StatusEnum.rjct.value,
+                status_reason_code=(
+                    TxnStatusReasonCodeEnum.rjct_attribute_type_not_supported.value
+                ),
+                status_reason_message="Query by correlation_id or transaction_id",
+            )
+        elif (
+            result is None
+            or result["header"]["action"] != single_request.txn_type.value
+        ):
+            self.misses += 1
+            txn_status.update(
+                status=StatusEnum.rjct.value,
+                status_reason_code=TxnStatusReasonCodeEnum.rjct_txn_not_found.value,
+                status_reason_message="No result found. It may have expired.",
+            )
+        else:
+            self.hits += 1
+            txn_status.update(status=StatusEnum.succ.value, response=result)
+        return SingleTxnStatusResponse(
+            txn_type=single_request.txn_type, txn_status=txn_status
+        )
+
+    async def sweep(self) -> int:
+        """
+        Deletes expired results, txn_result_sweep_batch_size rows per statement.
+        Returns the number deleted.
+        """
+        swept = 0
+        session_maker = async_sessionmaker(dbengine.get(), expire_on_commit=False)
+        while True:
+            expired_ids = (
+                select(TxnResult.id)
+                .where(TxnResult.expires_at <= _utcnow())
+                .limit(_config.txn_result_sweep_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            async with session_maker() as session:
+                result = await session.execute(
+                    delete(TxnResult)
+                    .where(TxnResult.id.in_(expired_ids))
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+            swept += result.rowcount
+            if result.rowcount < _config.txn_result_sweep_batch_size:
+                break
+        self.swept += swept
+        return swept
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(_config.txn_result_sweep_interval)
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.error(f"Error sweeping expired txn results: {e}")
+
+    async def start(self) -> None:
+        if not _config.txn_result_store_enabled or self._sweep_task:
+            return
+        self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        if not self._sweep_task:
+            return
+        self._sweep_task.cancel()
+        try:
+            await self._sweep_task
+        except asyncio.CancelledError:
+            pass
+        self._sweep_task = None
+
+    def get_metrics(self) -> dict:
+        return {
+            "enabled": _config.txn_result_store_enabled,
+            "stored": self.stored,
+            "hits": self.hits,
+            "misses": self.misses,
+            "swept": self.swept,
+        }
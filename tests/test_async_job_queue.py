@@ -0,0 +1,311 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from openg2p_spar_mapper_api.services import (
+    AsyncJobLane,
+    AsyncJobQueue,
+    PostgresAsyncJobQueue,
+)
+from pydantic import BaseModel
+from sqlalchemy.dialects import postgresql
+
+_config_path = "openg2p_spar_mapper_api.services.async_job_queue._config"
+_postgres_config_path = (
+    "openg2p_spar_mapper_api.services.postgres_async_job_queue._config"
+)
+
+
+class JobRequest(BaseModel):
+    value: str
+
+
+@pytest.mark.asyncio
+async def test_async_job_queue_rejects_when_full():
+    with patch(f"{_config_path}.async_job_queue_max_size", 2):
+        async_job_queue = AsyncJobQueue()
+
+    results = []
+
+    async def handler(request, correlation_id, action):
+        results.append((request.value, correlation_id, action))
+
+    async_job_queue.register_handler("job", JobRequest, handler)
+
+    assert await async_job_queue.submit("job", JobRequest(value="a"), "1")
+    assert await async_job_queue.submit("job", JobRequest(value="b"), "2")
+    assert not await async_job_queue.submit("job", JobRequest(value="c"), "3")
+    assert async_job_queue.depth == 2
+
+    await async_job_queue.start()
+    await async_job_queue.stop()
+
+    assert results == [("a", "1", "job"), ("b", "2", "job")]
+    assert async_job_queue.get_metrics()["rejected"] == 1
+    assert async_job_queue.get_metrics()["completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_async_job_queue_drains_in_flight_jobs_on_stop():
+    async_job_queue = AsyncJobQueue()
+    finished = []
+
+    async def slow_handler(request, correlation_id, action, delay=0):
+        await asyncio.sleep(delay)
+        finished.append(True)
+
+    async def failing_handler(request, correlation_id, action):
+        raise ValueError("failed")
+
+    async_job_queue.register_handler("slow", JobRequest, slow_handler)
+    async_job_queue.register_handler("failing", JobRequest, failing_handler)
+    request = JobRequest(value="a")
+
+    await async_job_queue.start()
+    await async_job_queue.submit("failing", request, "0")
+    for i in range(5):
+        await async_job_queue.submit("slow", request, str(i), {"delay": 0.05})
+    await async_job_queue.stop()
+
+    assert finished == [True] * 5
+    assert not await async_job_queue.submit("slow", request, "6")
+    assert async_job_queue.get_metrics()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_postgres_async_job_queue_runs_stored_jobs():
+    async_job_queue = PostgresAsyncJobQueue()
+    handler = AsyncMock(side_effect=[None, ValueError("failed")])
+    async_job_queue.register_handler("job", JobRequest, handler)
+
+    jobs = [
+        MagicMock(
+            id=i,
+            correlation_id=str(i),
+            action="job",
+            payload=JobRequest(value=str(i)).model_dump_json(),
+            options={"force_primary": True},
+            attempts=attempts,
+        )
+        for i, attempts in ((1, 1), (2, 3))
+    ]
+    lane = async_job_queue.get_lane("job")
+    lane.record_start(0)
+    lane.record_start(0)
+    errors = [await async_job_queue.execute(job, lane) for job in jobs]
+
+    assert errors == [None, "failed"]
+    assert lane.in_flight == 0
+    handler.assert_any_await(JobRequest(value="1"), "1", "job", force_primary=True)
+
+    session = AsyncMock()
+    await async_job_queue.record_results(session, jobs, errors)
+
+    failed = session.execute.await_args_list[1].args[1]
+    assert [(row["job_id"], row["job_attempts"]) for row in failed] == [(2, 3)]
+    assert failed[0]["status"] == "dead"
+    assert async_job_queue.get_metrics()["completed"] == 1
+    assert async_job_queue.get_metrics()["dead"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_job_queue_lanes_by_weight_and_concurrency():
+    async_job_queue = AsyncJobQueue()
+    started = []
+    running = {"link": 0, "resolve": 0}
+    max_running = {"link": 0, "resolve": 0}
+
+    async def handler(request, correlation_id, action):
+        started.append(action)
+        running[action] += 1
+        max_running[action] = max(max_running[action], running[action])
+        await asyncio.sleep(0.01)
+        running[action] -= 1
+
+    async_job_queue.register_handler("link", JobRequest, handler)
+    async_job_queue.register_handler("resolve", JobRequest, handler)
+    request = JobRequest(value="a")
+
+    with patch(
+        f"{_config_path}.async_job_lane_weights", {"resolve": 3, "link": 1}
+    ), patch(
+        f"{_config_path}.async_job_lane_concurrency", {"resolve": 2, "link": 1}
+    ), patch(
+        f"{_config_path}.async_job_workers", 2
+    ):
+        # The link backlog is queued first
+        for i in range(8):
+            await async_job_queue.submit("link", request, f"l{i}")
+        for i in range(8):
+            await async_job_queue.submit("resolve", request, f"r{i}")
+        await async_job_queue.start()
+        await async_job_queue.stop()
+
+    assert started[:8].count("resolve") >= 5
+    assert max_running == {"link": 1, "resolve": 2}
+    metrics = async_job_queue.get_metrics()["lanes"]
+    assert metrics["link"]["completed"] == 8
+    assert metrics["resolve"]["completed"] == 8
+    assert metrics["link"]["wait_seconds_max"] > metrics["resolve"]["wait_seconds_max"]
+
+
+def test_sender_lanes():
+    async_job_queue = AsyncJobQueue()
+    request = MagicMock()
+    request.header.sender_id = "payments"
+
+    with patch(f"{_config_path}.async_job_sender_lanes", {"payments": "priority"}):
+        assert async_job_queue.get_lane_name("link", request) == "priority"
+        request.header.sender_id = "other"
+        assert async_job_queue.get_lane_name("link", request) == "link"
+
+
+def test_next_lane_is_smooth_weighted_round_robin():
+    lanes = [
+        AsyncJobLane("a", 5, 1),
+        AsyncJobLane("b", 1, 1),
+        AsyncJobLane("c", 1, 1),
+    ]
+    picks = "".join(AsyncJobQueue.next_lane(lanes).name for _ in range(7))
+    assert picks == "aabacaa"
+
+
+def _compile(stmt) -> tuple:
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+@pytest.mark.asyncio
+async def test_postgres_async_job_queue_claims_due_jobs_with_a_lease():
+    async_job_queue = PostgresAsyncJobQueue()
+    session = AsyncMock()
+
+    with patch(f"{_postgres_config_path}.async_job_lease", 60):
+        await async_job_queue.claim_due(session, "resolve", 5)
+
+    sql, params = _compile(session.execute.await_args.args[0])
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "async_jobs.next_attempt_at <= %(next_attempt_at_1)s" in sql
+    assert "attempts=(async_jobs.attempts + %(attempts_1)s" in sql
+    assert params["status_1"] == "pending"
+    assert params["lane_1"] == "resolve"
+    assert params["param_1"] == 5
+    # Claimed jobs are not due again until the lease expires
+    lease = params["next_attempt_at"] - params["next_attempt_at_1"]
+    assert lease == timedelta(seconds=60)
+
+
+@pytest.mark.asyncio
+async def test_postgres_async_job_queue_retries_within_the_claim():
+    async_job_queue = PostgresAsyncJobQueue()
+    jobs = [
+        MagicMock(id=1, correlation_id="1", action="job", attempts=1),
+        MagicMock(id=2, correlation_id="2", action="job", attempts=2),
+    ]
+    session = AsyncMock()
+
+    with patch(f"{_postgres_config_path}.async_job_retry_delay", 10):
+        await async_job_queue.record_results(session, jobs, [None, "failed"])
+
+    # Completed and failed jobs are only written while still claimed by this run
+    sql, params = _compile(session.execute.await_args_list[0].args[0])
+    assert sql.startswith("DELETE FROM async_jobs")
+    assert "(async_jobs.id, async_jobs.attempts) IN" in sql
+    assert list(params.values()) == [[(1, 1)]]
+    sql, _ = _compile(session.execute.await_args_list[1].args[0])
+    assert sql.endswith(
+        "WHERE async_jobs.id = %(job_id)s::INTEGER "
+        "AND async_jobs.attempts = %(job_attempts)s::INTEGER"
+    )
+    [failed] = session.execute.await_args_list[1].args[1]
+    assert failed["status"] == "pending"
+    # Doubled per attempt
+    assert failed["next_attempt_at"] - failed["updated_at"] == timedelta(seconds=20)
+
+
+@pytest.mark.asyncio
+async def test_postgres_async_job_queue_completes_jobs_in_the_handler_transaction():
+    async_job_queue = PostgresAsyncJobQueue()
+    lane = async_job_queue.get_lane("job")
+    session = AsyncMock()
+    session.execute.return_value.rowcount = 1
+
+    async def handler(request, correlation_id, action):
+        await async_job_queue.complete_job(session)
+        # Completed once
+        await async_job_queue.complete_job(session)
+
+    async_job_queue.register_handler("job", JobRequest, handler)
+    job = MagicMock(
+        id=1,
+        correlation_id="1",
+        action="job",
+        payload=JobRequest(value="1").model_dump_json(),
+        options=None,
+        attempts=2,
+    )
+    lane.record_start(0)
+
+    assert await async_job_queue.execute(job, lane) is None
+    sql, params = _compile(session.execute.await_args.args[0])
+    assert session.execute.await_count == 1
+    assert sql.startswith("DELETE FROM async_jobs")
+    assert list(params.values()) == [1, 2]
+    # Outside of a job, there is nothing to complete
+    await async_job_queue.complete_job(session)
+    assert session.execute.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_postgres_async_job_queue_discards_runs_that_lost_their_lease():
+    async_job_queue = PostgresAsyncJobQueue()
+    lane = async_job_queue.get_lane("job")
+    session = AsyncMock()
+    # Claimed again by another worker, after this run's lease expired
+    session.execute.return_value.rowcount = 0
+    committed = []
+
+    async def handler(request, correlation_id, action):
+        await async_job_queue.complete_job(session)
+        committed.append(correlation_id)
+
+    async_job_queue.register_handler("job", JobRequest, handler)
+    job = MagicMock(
+        id=1,
+        correlation_id="1",
+        action="job",
+        payload=JobRequest(value="1").model_dump_json(),
+        options=None,
+        attempts=1,
+    )
+    lane.record_start(0)
+
+    error = await async_job_queue.execute(job, lane)
+
+    assert "claimed again" in error
+    assert not committed
+    assert async_job_queue.get_metrics()["leases_lost"] == 1
+
+
+@pytest.mark.asyncio
+async def test_postgres_async_job_queue_renews_leases_of_running_jobs():
+    async_job_queue = PostgresAsyncJobQueue()
+    async_job_queue._running = {1: 2, 3: 1}
+    session = AsyncMock()
+
+    with patch(
+        "openg2p_spar_mapper_api.services.postgres_async_job_queue.dbengine"
+    ), patch(
+        "openg2p_spar_mapper_api.services.postgres_async_job_queue.async_sessionmaker"
+    ) as mock_session_maker, patch(
+        f"{_postgres_config_path}.async_job_lease", 60
+    ):
+        mock_session_maker.return_value.return_value.__aenter__.return_value = session
+        await async_job_queue.renew_leases()
+
+    sql, params = _compile(session.execute.await_args.args[0])
+    assert sql.startswith("UPDATE async_jobs SET next_attempt_at")
+    assert "(async_jobs.id, async_jobs.attempts) IN" in sql
+    assert params["next_attempt_at"] - params["updated_at"] == timedelta(seconds=60)
+    session.commit.assert_awaited_once()
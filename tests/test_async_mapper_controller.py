@@ -41,6 +41,27 @@ from openg2p_spar_mapper_api.controllers.async_mapper_controller import (
 )
 
 
+@pytest.fixture(autouse=True)
+def async_job_queue():
+    with patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller.AsyncJobQueue.get_component"
+    ) as mock_async_job_queue_get_component:
+        mock_async_job_queue_get_component.return_value.submit = AsyncMock(
+            return_value=True
+        )
+        mock_async_job_queue_get_component.return_value.complete_job = AsyncMock()
+        yield mock_async_job_queue_get_component.return_value
+
+
+@pytest.fixture(autouse=True)
+def txn_result_store():
+    with patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller.TxnResultStore.get_component"
+    ) as mock_txn_result_store_get_component:
+        mock_txn_result_store_get_component.return_value.put = AsyncMock()
+        yield mock_txn_result_store_get_component.return_value
+
+
 @pytest.mark.asyncio
 @patch(
     "openg2p_spar_mapper_api.controllers.async_mapper_controller.AsyncResponseHelper.get_component"
@@ -179,16 +200,16 @@ async def test_handle_service_and_link_callback(
         link_request, "correlation_id", "link"
     )
 
-    mock_async_response_helper_instance.construct_success_async_callback_link_request.assert_called_once_with(
-        link_request, "correlation_id", single_link_responses
+    mock_async_response_helper_instance.construct_success_async_callback_request.assert_called_once_with(
+        "link", link_request, "correlation_id", single_link_responses
     )
 
     callback_args = (
-        mock_async_response_helper_instance.construct_success_async_callback_link_request.call_args
+        mock_async_response_helper_instance.construct_success_async_callback_request.call_args
     )
-    assert callback_args[0][0] == link_request
-    assert callback_args[0][1] == "correlation_id"
-    assert callback_args[0][2] == single_link_responses
+    assert callback_args[0][1] == link_request
+    assert callback_args[0][2] == "correlation_id"
+    assert callback_args[0][3] == single_link_responses
 
 
 @pytest.mark.asyncio
@@ -322,16 +343,16 @@ async def test_handle_service_and_update_callback(
         update_request, "correlation_id", "update"
     )
 
-    mock_async_response_helper_instance.construct_success_async_callback_update_request.assert_called_once_with(
-        update_request, "correlation_id", single_update_responses
+    mock_async_response_helper_instance.construct_success_async_callback_request.assert_called_once_with(
+        "update", update_request, "correlation_id", single_update_responses
     )
 
     callback_args = (
-        mock_async_response_helper_instance.construct_success_async_callback_update_request.call_args
+        mock_async_response_helper_instance.construct_success_async_callback_request.call_args
     )
-    assert callback_args[0][0] == update_request
-    assert callback_args[0][1] == "correlation_id"
-    assert callback_args[0][2] == single_update_responses
+    assert callback_args[0][1] == update_request
+    assert callback_args[0][2] == "correlation_id"
+    assert callback_args[0][3] == single_update_responses
 
 
 @pytest.mark.asyncio
@@ -465,16 +486,16 @@ async def test_handle_service_and_resolve_callback(
         resolve_request, "correlation_id", "resolve"
     )
 
-    mock_async_response_helper_instance.construct_success_async_callback_resolve_request.assert_called_once_with(
-        resolve_request, "correlation_id", single_resolve_responses
+    mock_async_response_helper_instance.construct_success_async_callback_request.assert_called_once_with(
+        "resolve", resolve_request, "correlation_id", single_resolve_responses
     )
 
     callback_args = (
-        mock_async_response_helper_instance.construct_success_async_callback_resolve_request.call_args
+        mock_async_response_helper_instance.construct_success_async_callback_request.call_args
     )
-    assert callback_args[0][0] == resolve_request
-    assert callback_args[0][1] == "correlation_id"
-    assert callback_args[0][2] == single_resolve_responses
+    assert callback_args[0][1] == resolve_request
+    assert callback_args[0][2] == "correlation_id"
+    assert callback_args[0][3] == single_resolve_responses
 
 
 @pytest.mark.asyncio
@@ -609,16 +630,16 @@ async def test_handle_service_and_unlink_callback(
         unlink_request, "correlation_id", "unlink"
     )
 
-    mock_async_response_helper_instance.construct_success_async_callback_unlink_request.assert_called_once_with(
-        unlink_request, "correlation_id", single_unlink_responses
+    mock_async_response_helper_instance.construct_success_async_callback_request.assert_called_once_with(
+        "unlink", unlink_request, "correlation_id", single_unlink_responses
     )
 
     callback_args = (
-        mock_async_response_helper_instance.construct_success_async_callback_unlink_request.call_args
+        mock_async_response_helper_instance.construct_success_async_callback_request.call_args
     )
-    assert callback_args[0][0] == unlink_request
-    assert callback_args[0][1] == "correlation_id"
-    assert callback_args[0][2] == single_unlink_responses
+    assert callback_args[0][1] == unlink_request
+    assert callback_args[0][2] == "correlation_id"
+    assert callback_args[0][3] == single_unlink_responses
 
 
 @pytest.mark.asyncio
@@ -637,11 +658,21 @@ async def test_make_callback():
     url_suffix = "/suffix"
 
     with patch(
-        "openg2p_spar_mapper_api.controllers.async_mapper_controller.httpx.post"
-    ) as mock_post:
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller._config.callback_outbox_enabled",
+        False,
+    ), patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller.CallbackClient.get_component"
+    ) as mock_callback_client, patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller.dbengine"
+    ), patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller.async_sessionmaker"
+    ) as mock_session_maker:
+        session = mock_session_maker.return_value.return_value.__aenter__.return_value
+        session.commit = AsyncMock()
         mock_response = MagicMock()
         mock_response.raise_for_status.return_value = None
-        mock_post.return_value = mock_response
+        mock_post = AsyncMock(return_value=mock_response)
+        mock_callback_client.return_value.post = mock_post
 
         task = asyncio.ensure_future(
             AsyncMapperController.make_callback(
@@ -653,9 +684,72 @@ async def test_make_callback():
             *[t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
         )
 
-        mock_post.assert_called_once_with(
+        mock_post.assert_awaited_once_with(
             f"{url.rstrip('/')}{url_suffix}",
-            headers={"content-type": "application/json"},
             content=async_call_back_request.model_dump_json(),
-            timeout=10,
+            headers={"content-type": "application/json"},
         )
+        session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_make_callback_writes_to_outbox():
+    async_call_back_request = AsyncCallbackRequest(
+        header=AsyncCallbackRequestHeader(
+            message_id="123",
+            message_ts="2021-05-01T12:00:00Z",
+            action="test_action",
+            status=StatusEnum.succ,
+        ),
+        message={"key": "value"},
+    )
+    session = MagicMock()
+
+    with patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller.CallbackOutboxDispatcher.get_component"
+    ) as mock_dispatcher:
+        mock_dispatcher.return_value.enqueue = AsyncMock()
+
+        await AsyncMapperController.make_callback(
+            async_call_back_request,
+            "http://test.com/callback/",
+            "/on-link",
+            session=session,
+        )
+
+        mock_dispatcher.return_value.enqueue.assert_awaited_once_with(
+            "http://test.com/callback/on-link",
+            async_call_back_request.model_dump_json(),
+            session=session,
+        )
+
+
+@pytest.mark.asyncio
+async def test_make_callback_stores_txn_result(txn_result_store):
+    async_call_back_request = AsyncCallbackRequest(
+        header=AsyncCallbackRequestHeader(
+            message_id="123",
+            message_ts="2021-05-01T12:00:00Z",
+            action="link",
+            status=StatusEnum.succ,
+        ),
+        message={"key": "value"},
+    )
+    session = MagicMock()
+
+    with patch(
+        "openg2p_spar_mapper_api.controllers.async_mapper_controller._config.default_callback_url",
+        None,
+    ):
+        await AsyncMapperController.make_callback(
+            async_call_back_request,
+            None,
+            "/on-link",
+            correlation_id="correlation_id",
+            transaction_id="transaction_id",
+            session=session,
+        )
+
+    txn_result_store.put.assert_awaited_once_with(
+        "correlation_id", "transaction_id", async_call_back_request, session=session
+    )
@@ -0,0 +1,112 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+from openg2p_spar_mapper_api.services import (
+    CallbackClient,
+    CallbackRejectedException,
+)
+
+_config_path = "openg2p_spar_mapper_api.services.callback_client._config"
+
+
+def _callback_client(handler) -> CallbackClient:
+    callback_client = CallbackClient()
+    callback_client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return callback_client
+
+
+@pytest.mark.asyncio
+async def test_callback_client_limits_concurrency_per_destination():
+    running = {"a.test": 0, "b.test": 0}
+    max_running = {"a.test": 0, "b.test": 0}
+
+    async def handler(request):
+        host = request.url.host
+        running[host] += 1
+        max_running[host] = max(max_running[host], running[host])
+        await asyncio.sleep(0.01)
+        running[host] -= 1
+        return httpx.Response(200)
+
+    with patch(f"{_config_path}.callback_destination_max_concurrency", 2):
+        callback_client = _callback_client(handler)
+        await asyncio.gather(
+            *[
+                callback_client.post(f"http://{host}/on-link", "{}", {})
+                for host in ("a.test", "b.test")
+                for _ in range(5)
+            ]
+        )
+
+    assert max_running == {"a.test": 2, "b.test": 2}
+
+
+@pytest.mark.asyncio
+async def test_callback_client_circuit_breaker():
+    status_codes = [503, 503, 503, 200]
+
+    def handler(request):
+        return httpx.Response(status_codes.pop(0))
+
+    with patch(f"{_config_path}.callback_breaker_failure_threshold", 2), patch(
+        f"{_config_path}.callback_breaker_reset_timeout", 0.05
+    ):
+        callback_client = _callback_client(handler)
+        url = "http://partner.test/on-link"
+
+        for _ in range(2):
+            await callback_client.post(url, "{}", {})
+        metrics = callback_client.get_metrics()["destinations"]["http://partner.test"]
+        assert metrics["state"] == "open"
+
+        # Rejected without a request while open
+        with pytest.raises(CallbackRejectedException):
+            await callback_client.post(url, "{}", {})
+        assert len(status_codes) == 2
+
+        # A failed trial callback opens it again
+        await asyncio.sleep(0.05)
+        await callback_client.post(url, "{}", {})
+        with pytest.raises(CallbackRejectedException):
+            await callback_client.post(url, "{}", {})
+
+        # A successful one closes it
+        await asyncio.sleep(0.05)
+        res = await callback_client.post(url, "{}", {})
+
+    assert res.status_code == 200
+    metrics = callback_client.get_metrics()["destinations"]["http://partner.test"]
+    assert metrics["state"] == "closed"
+    assert metrics["rejected"] == 2
+    assert metrics["opened"] == 2
+
+
+@pytest.mark.asyncio
+async def test_callback_client_gives_trial_back_when_encoding_fails():
+    status_codes = [503, 200]
+
+    def handler(request):
+        return httpx.Response(status_codes.pop(0))
+
+    with patch(f"{_config_path}.callback_breaker_failure_threshold", 1), patch(
+        f"{_config_path}.callback_breaker_reset_timeout", 0.05
+    ):
+        callback_client = _callback_client(handler)
+        url = "http://partner.test/on-link"
+        await callback_client.post(url, "{}", {})
+
+        await asyncio.sleep(0.05)
+        with patch.object(
+            callback_client, "encode_content", side_effect=ValueError("encoding")
+        ), pytest.raises(ValueError):
+            await callback_client.post(url, "{}", {})
+
+        # The trial was not used up, the next callback is let through
+        res = await callback_client.post(url, "{}", {})
+
+    assert res.status_code == 200
+    metrics = callback_client.get_metrics()["destinations"]["http://partner.test"]
+    assert metrics["state"] == "closed"
+    assert metrics["pending"] == 0
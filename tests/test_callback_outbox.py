@@ -0,0 +1,162 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from openg2p_fastapi_common.context import dbengine
+from openg2p_spar_mapper_api.models import CallbackOutboxStatus
+from openg2p_spar_mapper_api.services import CallbackClient, CallbackOutboxDispatcher
+from sqlalchemy.dialects import postgresql
+
+_outbox_path = "openg2p_spar_mapper_api.services.callback_outbox"
+
+
+def _callback(id: int, url: str = "http://partner.test/on-link", attempts: int = 1):
+    return SimpleNamespace(id=id, url=url, payload="{}", attempts=attempts)
+
+
+def _status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://partner.test/on-link")
+    return httpx.HTTPStatusError(
+        "", request=request, response=httpx.Response(status_code, request=request)
+    )
+
+
+@pytest.fixture
+def session_maker():
+    dbengine.set(MagicMock())
+    session = AsyncMock()
+    with patch(f"{_outbox_path}.async_sessionmaker") as async_sessionmaker:
+        async_sessionmaker.return_value.return_value.__aenter__.return_value = session
+        yield session
+    dbengine.set(None)
+
+
+@pytest.mark.asyncio
+async def test_permanent_failures_are_dead_lettered_right_away():
+    dispatcher = CallbackOutboxDispatcher()
+    session = AsyncMock()
+    errors = [
+        _status_error(400),
+        _status_error(404),
+        _status_error(408),
+        _status_error(429),
+        _status_error(503),
+        httpx.ConnectError("refused"),
+    ]
+    callbacks = [_callback(i) for i in range(len(errors))]
+
+    await dispatcher.record_results(session, callbacks, errors)
+
+    (_, failed), _ = session.execute.call_args
+    assert [row["status"] for row in failed] == [
+        CallbackOutboxStatus.dead.value,
+        CallbackOutboxStatus.dead.value,
+        CallbackOutboxStatus.pending.value,
+        CallbackOutboxStatus.pending.value,
+        CallbackOutboxStatus.pending.value,
+        CallbackOutboxStatus.pending.value,
+    ]
+    assert dispatcher.dead_lettered == 2
+
+
+@pytest.mark.asyncio
+async def test_retryable_failures_are_dead_lettered_after_max_attempts():
+    dispatcher = CallbackOutboxDispatcher()
+    session = AsyncMock()
+
+    with patch(f"{_outbox_path}._config.callback_outbox_max_attempts", 3):
+        await dispatcher.record_results(
+            session,
+            [_callback(1, attempts=2), _callback(2, attempts=3)],
+            [_status_error(503), _status_error(503)],
+        )
+
+    (_, failed), _ = session.execute.call_args
+    assert [row["status"] for row in failed] == [
+        CallbackOutboxStatus.pending.value,
+        CallbackOutboxStatus.dead.value,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_results_are_only_written_while_still_claimed():
+    dispatcher = CallbackOutboxDispatcher()
+    session = AsyncMock()
+
+    await dispatcher.record_results(
+        session,
+        [_callback(1, attempts=1), _callback(2, attempts=2)],
+        [None, _status_error(503)],
+    )
+
+    # Not deleted or updated if claimed again by another worker since
+    compiled = (
+        session.execute.await_args_list[0].args[0].compile(dialect=postgresql.dialect())
+    )
+    assert "(callback_outbox.id, callback_outbox.attempts) IN" in str(compiled)
+    assert list(compiled.params.values()) == [[(1, 1)]]
+    update, [failed] = session.execute.await_args_list[1].args
+    assert str(update.compile(dialect=postgresql.dialect())).endswith(
+        "WHERE callback_outbox.id = %(callback_id)s::INTEGER "
+        "AND callback_outbox.attempts = %(callback_attempts)s::INTEGER"
+    )
+    assert (failed["callback_id"], failed["callback_attempts"]) == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_slow_destination_does_not_block_other_callbacks(session_maker):
+    slow_released = asyncio.Event()
+    delivered = []
+
+    async def handler(request):
+        if request.url.host == "slow.test":
+            await slow_released.wait()
+        delivered.append(request.url.host)
+        return httpx.Response(200)
+
+    callback_client = CallbackClient()
+    callback_client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    due = [_callback(1, "http://slow.test/on-link")] + [
+        _callback(i, "http://fast.test/on-link") for i in range(2, 7)
+    ]
+
+    async def claim_due(session, limit):
+        claimed = due[:limit]
+        del due[:limit]
+        return claimed
+
+    dispatcher = CallbackOutboxDispatcher()
+    dispatcher.claim_due = claim_due
+    dispatcher.record_results = AsyncMock()
+    with patch.object(
+        CallbackClient, "get_component", return_value=callback_client
+    ), patch(f"{_outbox_path}._config.callback_outbox_concurrency", 2), patch(
+        f"{_outbox_path}._config.callback_outbox_batch_size", 2
+    ), patch(
+        f"{_outbox_path}._config.callback_outbox_enabled", True
+    ), patch(
+        f"{_outbox_path}._config.callback_outbox_poll_interval", 10
+    ):
+        await dispatcher.start()
+        for _ in range(100):
+            if len(delivered) == 5:
+                break
+            await asyncio.sleep(0.01)
+
+        # Refilled the free slot while the slow callback was held up
+        assert delivered == ["fast.test"] * 5
+        assert dispatcher.in_flight == 1
+
+        slow_released.set()
+        await dispatcher.stop()
+
+    assert delivered[-1] == "slow.test"
+    assert dispatcher.in_flight == 0
+    recorded = [
+        callback.id
+        for (_, callbacks, _), _ in dispatcher.record_results.call_args_list
+        for callback in callbacks
+    ]
+    assert sorted(recorded) == list(range(1, 7))
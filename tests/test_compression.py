@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from openg2p_spar_mapper_api.services import CallbackClient
+from openg2p_spar_mapper_api.services.compression import (
+    CompressionMiddleware,
+    StreamDecompressor,
+    get_accepted_encoding,
+)
+from starlette.concurrency import run_in_threadpool
+
+_compression_path = "openg2p_spar_mapper_api.services.compression"
+_config_path = f"{_compression_path}._config"
+
+
+def _test_client() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.json()
+        return {"count": len(body["items"]), "items": body["items"]}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(3):
+                yield json.dumps({"i": i}).encode() + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+
+def _items_body(count: int) -> bytes:
+    return json.dumps({"items": [f"id{i}" for i in range(count)]}).encode()
+
+
+def test_gzip_request_and_response():
+    response = _test_client().post(
+        "/echo",
+        content=gzip.compress(_items_body(1000)),
+        headers={
+            "content-type": "application/json",
+            "content-encoding": "gzip",
+            "accept-encoding": "gzip",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json()["count"] == 1000
+
+
+def test_small_responses_are_not_compressed():
+    response = _test_client().post(
+        "/echo",
+        content=_items_body(2),
+        headers={"content-type": "application/json", "accept-encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.json()["count"] == 2
+
+
+def test_decompression_is_capped():
+    # 100 MB of zeros, ~100 KB compressed
+    body = gzip.compress(b"0" * 100 * 1024 * 1024)
+    assert len(body) < 1024 * 1024
+
+    with patch(f"{_config_path}.request_max_decompressed_size", 1024 * 1024):
+        response = _test_client().post(
+            "/echo",
+            content=body,
+            headers={"content-type": "application/json", "content-encoding": "gzip"},
+        )
+
+    assert response.status_code == 413
+
+
+def test_invalid_and_unsupported_request_encodings():
+    test_client = _test_client()
+    headers = {"content-type": "application/json"}
+
+    response = test_client.post(
+        "/echo",
+        content=b"not gzip",
+        headers={**headers, "content-encoding": "gzip"},
+    )
+    assert response.status_code == 400
+
+    response = test_client.post(
+        "/echo", content=b"{}", headers={**headers, "content-encoding": "br"}
+    )
+    assert response.status_code == 415
+
+
+def test_gzip_members_and_trailing_data():
+    test_client = _test_client()
+    headers = {"content-type": "application/json", "content-encoding": "gzip"}
+    body = _items_body(1000)
+
+    # Concatenated members decode to their concatenation, as with gunzip
+    response = test_client.post(
+        "/echo",
+        content=gzip.compress(body[:100]) + gzip.compress(body[100:]),
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 1000
+
+    response = test_client.post(
+        "/echo", content=gzip.compress(body) + b"trailing", headers=headers
+    )
+    assert response.status_code == 400
+
+    response = test_client.post(
+        "/echo", content=gzip.compress(body)[:-8], headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_zstd_frames_and_truncated_body():
+    zstandard = pytest.importorskip("zstandard")
+    test_client = _test_client()
+    headers = {"content-type": "application/json", "content-encoding": "zstd"}
+    body = _items_body(1000)
+    compressor = zstandard.ZstdCompressor()
+
+    response = test_client.post(
+        "/echo",
+        content=compressor.compress(body[:100]) + compressor.compress(body[100:]),
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 1000
+
+    response = test_client.post(
+        "/echo", content=compressor.compress(body)[:-8], headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_large_chunks_are_decompressed_in_a_thread():
+    data = os.urandom(2 * 1024 * 1024)
+    decompressor = StreamDecompressor("gzip", len(data))
+
+    with patch(
+        f"{_compression_path}.run_in_threadpool", wraps=run_in_threadpool
+    ) as threadpool:
+        assert await decompressor.decompress_async(gzip.compress(data)) == data
+        assert await decompressor.decompress_async(b"") == b""
+
+    assert threadpool.call_count == 1
+
+
+def test_streamed_response_is_compressed():
+    response = _test_client().get("/stream", headers={"accept-encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"i": 0},
+        {"i": 1},
+        {"i": 2},
+    ]
+
+
+def test_zstd_request_and_response():
+    zstandard = pytest.importorskip("zstandard")
+
+    response = _test_client().post(
+        "/echo",
+        content=zstandard.ZstdCompressor().compress(_items_body(1000)),
+        headers={
+            "content-type": "application/json",
+            "content-encoding": "zstd",
+            "accept-encoding": "gzip, zstd",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "zstd"
+    # Decoded by httpx
+    assert response.json()["count"] == 1000
+
+
+def test_get_accepted_encoding():
+    assert get_accepted_encoding("gzip, deflate") == "gzip"
+    assert get_accepted_encoding("gzip;q=0, deflate") is None
+    assert get_accepted_encoding("") is None
+
+
+@pytest.mark.asyncio
+async def test_callbacks_are_compressed_per_destination():
+    received = {}
+
+    def handler(request):
+        received[request.url.host] = request
+        return httpx.Response(200)
+
+    callback_client = CallbackClient()
+    callback_client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    content = _items_body(1000).decode()
+    with patch(
+        f"{_config_path}.callback_content_encodings",
+        {"http://gzip.test": "gzip"},
+    ):
+        for host in ("gzip.test", "plain.test"):
+            await callback_client.post(
+                f"http://{host}/on-link",
+                content,
+                {"content-type": "application/json"},
+            )
+
+    assert received["gzip.test"].headers["content-encoding"] == "gzip"
+    assert gzip.decompress(received["gzip.test"].content).decode() == content
+    assert "content-encoding" not in received["plain.test"].headers
+    assert received["plain.test"].content.decode() == content
@@ -0,0 +1,235 @@
+from collections import namedtuple
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from openg2p_g2pconnect_common_lib.schemas import StatusEnum
+from openg2p_g2pconnect_mapper_lib.schemas import (
+    LinkStatusReasonCode,
+    ResolveStatusReasonCode,
+    SingleLinkRequest,
+    SingleResolveRequest,
+    SingleUnlinkRequest,
+    SingleUpdateRequest,
+    UnlinkStatusReasonCode,
+    UpdateStatusReasonCode,
+)
+from openg2p_spar_mapper_api.services import IdFaMappingValidations
+
+
+# As returned by IdFaMapping.get_id_fa_values_by_id_values
+_IdFaRow = namedtuple("_IdFaRow", ["id_value", "fa_value"])
+
+
+@pytest.fixture
+def validations():
+    return IdFaMappingValidations()
+
+
+@pytest.fixture
+def id_fa_mappings():
+    return {
+        "linked_id": _IdFaRow("linked_id", "linked_fa"),
+    }
+
+
+def test_validate_link_requests(validations, id_fa_mappings):
+    single_link_requests = [
+        SingleLinkRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=id_value,
+            fa=fa_value,
+        )
+        for i, (id_value, fa_value) in enumerate(
+            [
+                ("new_id", "new_fa"),
+                ("linked_id", "linked_fa"),
+                ("new_id", "other_fa"),
+                ("other_id", ""),
+            ]
+        )
+    ]
+
+    errors = validations.validate_link_requests(single_link_requests, id_fa_mappings)
+
+    assert errors[0] is None
+    assert (
+        errors[1].validation_error_type
+        == LinkStatusReasonCode.rjct_reference_id_duplicate
+    )
+    assert (
+        errors[2].validation_error_type
+        == LinkStatusReasonCode.rjct_reference_id_duplicate
+    )
+    assert errors[3].validation_error_type == LinkStatusReasonCode.rjct_fa_invalid
+
+
+def test_validate_update_requests(validations, id_fa_mappings):
+    single_update_requests = [
+        SingleUpdateRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=id_value,
+            fa="new_fa",
+        )
+        for i, id_value in enumerate(["linked_id", "linked_id", "unknown_id"])
+    ]
+
+    errors = validations.validate_update_requests(
+        single_update_requests, id_fa_mappings
+    )
+
+    assert errors[0] is None
+    assert errors[1] is None
+    assert (
+        errors[2].validation_error_type
+        == UpdateStatusReasonCode.rjct_reference_id_duplicate
+    )
+
+
+def test_validate_resolve_requests(validations, id_fa_mappings):
+    single_resolve_requests = [
+        SingleResolveRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=id_value,
+        )
+        for i, id_value in enumerate(["linked_id", "unknown_id", ""])
+    ]
+
+    errors = validations.validate_resolve_requests(
+        single_resolve_requests, id_fa_mappings
+    )
+
+    assert errors[0] is None
+    assert errors[1].status == StatusEnum.succ
+    assert (
+        errors[1].validation_error_type
+        == ResolveStatusReasonCode.succ_fa_not_linked_to_id
+    )
+    assert errors[2].status == StatusEnum.rjct
+
+
+def test_validate_reverse_resolve_requests(validations, id_fa_mappings):
+    single_resolve_request = SingleResolveRequest(
+        reference_id="0",
+        timestamp=datetime.now().isoformat(),
+        fa="unknown_fa",
+    )
+
+    errors = validations.validate_resolve_requests(
+        [single_resolve_request], id_fa_mappings
+    )
+
+    assert errors == [None]
+
+
+def test_validate_unlink_requests(validations, id_fa_mappings):
+    single_unlink_requests = [
+        SingleUnlinkRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=id_value,
+            fa=fa_value,
+        )
+        for i, (id_value, fa_value) in enumerate(
+            [
+                ("linked_id", "wrong_fa"),
+                ("linked_id", "linked_fa"),
+                ("linked_id", None),
+            ]
+        )
+    ]
+
+    errors = validations.validate_unlink_requests(
+        single_unlink_requests, id_fa_mappings
+    )
+
+    assert errors[0].validation_error_type == UnlinkStatusReasonCode.rjct_id_invalid
+    assert errors[1] is None
+    assert errors[2].validation_error_type == UnlinkStatusReasonCode.rjct_id_invalid
+
+
+def test_validate_link_requests_structure(validations):
+    single_link_requests = [
+        SingleLinkRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=id_value,
+            fa="new_fa",
+        )
+        for i, id_value in enumerate(["new_id", "", "x" * 1000])
+    ]
+
+    errors = validations.validate_link_requests_structure(single_link_requests)
+
+    assert errors[0] is None
+    assert errors[1].message == "ID is null"
+    assert errors[2].message == "ID is too long"
+
+
+def test_validate_link_and_update_field_limits(validations):
+    fields = [
+        {},
+        {"name": "x" * 600},
+        {"phone_number": "1" * 40},
+        {"additional_info": [{"key": "x" * 2000}]},
+        {"name": "x" * 20, "phone_number": "1" * 20, "additional_info": [{}]},
+    ]
+    single_link_requests = [
+        SingleLinkRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=f"id{i}",
+            fa="fa",
+            **field,
+        )
+        for i, field in enumerate(fields)
+    ]
+    single_update_requests = [
+        SingleUpdateRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=f"id{i}",
+            fa="fa",
+            **field,
+        )
+        for i, field in enumerate(fields)
+    ]
+
+    with patch(
+        "openg2p_spar_mapper_api.services.id_fa_mapping_validations._config"
+        ".max_additional_info_size",
+        1024,
+    ):
+        link_errors = validations.validate_link_requests_structure(single_link_requests)
+        update_errors = validations.validate_update_requests_structure(
+            single_update_requests
+        )
+
+    assert [error and error.message for error in link_errors] == [
+        None,
+        "Name is too long",
+        "Phone number is too long",
+        "Additional info is too large",
+        None,
+    ]
+    assert [error and error.message for error in update_errors] == [
+        None,
+        "Name is too long",
+        "Phone number is too long",
+        "Additional info is too large",
+        None,
+    ]
+    assert (
+        link_errors[1].validation_error_type == LinkStatusReasonCode.rjct_name_invalid
+    )
+    assert (
+        link_errors[2].validation_error_type
+        == LinkStatusReasonCode.rjct_mobile_number_invalid
+    )
+    assert (
+        update_errors[1].validation_error_type
+        == UpdateStatusReasonCode.rjct_beneficiary_name_invalid
+    )
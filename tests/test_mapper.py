@@ -0,0 +1,448 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from openg2p_fastapi_common.context import dbengine
+from openg2p_g2pconnect_common_lib.schemas import RequestHeader, StatusEnum
+from openg2p_g2pconnect_mapper_lib.schemas import (
+    ResolveRequest,
+    ResolveRequestMessage,
+    ResolveScope,
+    ResolveStatusReasonCode,
+    SingleResolveRequest,
+    SingleUpdateRequest,
+    UpdateRequest,
+    UpdateRequestMessage,
+    UpdateStatusReasonCode,
+)
+from openg2p_spar_mapper_api.models import IdFaMapping
+from openg2p_spar_mapper_api.services import (
+    IdFaMappingValidations,
+    MapperService,
+    ReadReplica,
+    ResolveBloomFilter,
+    ResolveCache,
+    ResolveCacheInvalidator,
+)
+from sqlalchemy.dialects import postgresql
+
+_mapper_path = "openg2p_spar_mapper_api.services.mapper"
+
+
+def _session(*returned_ids) -> AsyncMock:
+    """
+    A session whose executes return the given ids, one list per statement.
+    """
+    session = AsyncMock()
+    results = []
+    for ids in returned_ids:
+        result = MagicMock()
+        result.scalars.return_value = ids
+        results.append(result)
+    session.execute.side_effect = results
+    return session
+
+
+def _compile(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+@pytest.fixture
+def read_replica():
+    primary_engine = MagicMock()
+    dbengine.set(primary_engine)
+    read_replica = ReadReplica()
+    with patch.object(ReadReplica, "get_component", return_value=read_replica):
+        yield read_replica
+    dbengine.set(None)
+
+
+@pytest.fixture
+def resolve_cache():
+    resolve_cache = ResolveCache(max_entries=10, ttl=60)
+    with patch.object(
+        ResolveCache, "get_component", return_value=resolve_cache
+    ), patch.object(
+        ResolveBloomFilter, "get_component", return_value=ResolveBloomFilter()
+    ), patch(
+        "openg2p_spar_mapper_api.services.resolve_cache._config.resolve_cache_enabled",
+        True,
+    ), patch(
+        f"{_mapper_path}.async_sessionmaker"
+    ):
+        yield resolve_cache
+
+
+@pytest.mark.asyncio
+async def test_resolve_does_not_cache_replica_reads(read_replica, resolve_cache):
+    read_replica.engine = MagicMock()
+    read_replica.lag_seconds = 0.5
+    mapper_service = MapperService()
+    # The replica has not replayed the link of "a" yet, the primary has
+    get_linked_id_values = AsyncMock(side_effect=[[], ["a"]])
+
+    with patch.object(
+        IdFaMapping, "get_linked_id_values", get_linked_id_values
+    ), patch.object(
+        IdFaMapping, "get_resolve_details_by_id_values", AsyncMock(return_value={})
+    ):
+        assert await mapper_service.get_id_fa_mappings_for_resolve(["a"]) == {}
+        # The stale negative result would outlive the link's invalidation
+        assert resolve_cache.get_many(["a"]) == ({}, ["a"])
+
+        with ReadReplica.force_primary():
+            assert await mapper_service.get_id_fa_mappings_for_resolve(["a"]) == {
+                "a": True
+            }
+        assert resolve_cache.get_many(["a"]) == ({"a": True}, [])
+
+
+@pytest.fixture
+def resolve_session(read_replica):
+    session = AsyncMock()
+    with patch(f"{_mapper_path}.async_sessionmaker") as async_sessionmaker, patch(
+        f"{_mapper_path}._config.db_query_chunk_size", 2
+    ), patch.object(
+        ResolveCache, "get_component", return_value=ResolveCache()
+    ), patch.object(
+        ResolveBloomFilter, "get_component", return_value=ResolveBloomFilter()
+    ):
+        async_sessionmaker.return_value.return_value.__aenter__.return_value = session
+        yield session
+
+
+@pytest.mark.asyncio
+async def test_get_id_fa_mappings_for_resolve_in_chunks(resolve_session):
+    resolve_session.execute.side_effect = _session(["a"], []).execute.side_effect
+
+    id_fa_mappings = await MapperService().get_id_fa_mappings_for_resolve(
+        ["a", "a", "", "c", "d"]
+    )
+
+    # Missing ids are absent, repeated and empty ids are looked up once or never
+    assert id_fa_mappings == {"a": True}
+    compiled = [
+        _compile(call.args[0]) for call in resolve_session.execute.call_args_list
+    ]
+    assert str(compiled[0]) == (
+        "SELECT id_fa_mappings.id_value \nFROM id_fa_mappings \n"
+        "WHERE id_fa_mappings.id_value IN (__[POSTCOMPILE_id_value_1])"
+    )
+    assert [list(c.params.values()) for c in compiled] == [[["a", "c"]], [["d"]]]
+
+
+@pytest.mark.asyncio
+async def test_insert_id_fa_mappings():
+    mapper_service = MapperService()
+    mappings = [
+        mapper_service.construct_id_fa_mapping(
+            SimpleNamespace(
+                id=id_value,
+                fa="fa",
+                name=None,
+                phone_number=None,
+                additional_info=None,
+            )
+        )
+        for id_value in ("new_id", "linked_id")
+    ]
+    # linked_id hit the unique index, so it is not returned
+    session = _session(["new_id"])
+
+    assert await mapper_service.insert_id_fa_mappings(session, mappings) == {"new_id"}
+
+    ((stmt, params),) = [call.args for call in session.execute.call_args_list]
+    assert str(_compile(stmt)).endswith(
+        "ON CONFLICT (id_value) DO NOTHING RETURNING id_fa_mappings.id_value"
+    )
+    # One executemany for the whole batch
+    assert params == mappings
+
+    assert await mapper_service.insert_id_fa_mappings(session, []) == set()
+    assert session.execute.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_update_id_fa_mappings_in_chunks():
+    mappings = [
+        {
+            "id_value": f"id{i}",
+            "fa_value": f"fa{i}",
+            "name": None,
+            "phone": None,
+            "additional_info": [{"key": i}],
+        }
+        for i in range(5)
+    ]
+    session = _session(["id0", "id1"], ["id3"], ["id4"])
+
+    # 5 columns per row, so 2 rows per statement
+    with patch(f"{_mapper_path}._config.db_query_chunk_size", 10):
+        updated_ids = await MapperService().update_id_fa_mappings(session, mappings)
+
+    # id2 was unlinked concurrently
+    assert updated_ids == {"id0", "id1", "id3", "id4"}
+    compiled = [_compile(call.args[0]) for call in session.execute.call_args_list]
+    assert [list(c.params.values())[::3] for c in compiled] == [
+        ["id0", "id1"],
+        ["id2", "id3"],
+        ["id4"],
+    ]
+    sql = str(compiled[0])
+    assert sql.startswith(
+        "UPDATE id_fa_mappings SET "
+        "fa_value=coalesce(CAST(update_values.fa_value AS VARCHAR), "
+        "id_fa_mappings.fa_value), "
+        "name=coalesce(CAST(update_values.name AS VARCHAR), id_fa_mappings.name)"
+    )
+    assert "additional_info=coalesce(CAST(update_values.additional_info AS JSON)" in (
+        sql
+    )
+    assert (
+        "FROM (VALUES (%(param_1)s::VARCHAR, %(param_2)s::VARCHAR, NULL, NULL, "
+        "%(param_3)s::JSON), " in sql
+    )
+    assert sql.endswith(
+        "WHERE id_fa_mappings.id_value = update_values.id_value "
+        "RETURNING id_fa_mappings.id_value"
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_merges_repeated_ids():
+    dbengine.set(MagicMock())
+    session = _session(["a"])
+    update_request = UpdateRequest(
+        header=RequestHeader(
+            message_id="message_id",
+            message_ts=datetime.now().isoformat(),
+            action="update",
+            sender_id="sender",
+            total_count=4,
+        ),
+        message=UpdateRequestMessage(
+            transaction_id="transaction_id",
+            update_request=[
+                SingleUpdateRequest(
+                    reference_id=str(i),
+                    timestamp=datetime.now().isoformat(),
+                    id=id_value,
+                    fa=fa_value,
+                    name=name,
+                )
+                for i, (id_value, fa_value, name) in enumerate(
+                    [
+                        ("a", "fa1", "name1"),
+                        ("a", "fa2", ""),
+                        ("b", "fb", None),
+                        ("missing", "fm", None),
+                    ]
+                )
+            ],
+        ),
+    )
+
+    with patch(
+        f"{_mapper_path}.async_sessionmaker"
+    ) as async_sessionmaker, patch.object(
+        IdFaMapping,
+        "get_id_fa_values_by_id_values",
+        AsyncMock(
+            return_value={
+                id_value: SimpleNamespace(id_value=id_value, fa_value="fa")
+                for id_value in ("a", "b")
+            }
+        ),
+    ), patch.object(
+        IdFaMappingValidations,
+        "get_component",
+        return_value=IdFaMappingValidations(),
+    ), patch.object(
+        ResolveCacheInvalidator, "get_component", return_value=AsyncMock()
+    ), patch.object(
+        ResolveCache, "get_component"
+    ):
+        async_sessionmaker.return_value.return_value.__aenter__.return_value = session
+        single_update_responses = await MapperService().update(update_request)
+    dbengine.set(None)
+
+    ((stmt,),) = [call.args for call in session.execute.call_args_list]
+    # One row per id, later non-empty fields win
+    assert list(_compile(stmt).params.values()) == ["a", "fa2", "name1", "b", "fb"]
+    assert [response.status for response in single_update_responses] == [
+        StatusEnum.succ,
+        StatusEnum.succ,
+        StatusEnum.rjct,
+        StatusEnum.rjct,
+    ]
+    # b was unlinked between the snapshot and the UPDATE
+    assert (
+        single_update_responses[2].status_reason_code
+        == UpdateStatusReasonCode.rjct_reference_id_duplicate
+    )
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_delete_id_fa_mappings_in_chunks():
+    mappings = [
+        {"id_value": "id0", "fa_value": "fa0"},
+        {"id_value": "id1", "fa_value": None},
+        {"id_value": "id2", "fa_value": "other_fa"},
+    ]
+    # id2 is linked to another fa, so it is not deleted
+    session = _session(["id0", "id1"], [])
+
+    # 2 columns per row, so 2 rows per statement
+    with patch(f"{_mapper_path}._config.db_query_chunk_size", 4):
+        unlinked_ids = await MapperService().delete_id_fa_mappings(session, mappings)
+
+    assert unlinked_ids == {"id0", "id1"}
+    compiled = [_compile(call.args[0]) for call in session.execute.call_args_list]
+    assert [list(c.params.values()) for c in compiled] == [
+        ["id0", "fa0", "id1"],
+        ["id2", "other_fa"],
+    ]
+    sql = str(compiled[0])
+    assert sql.startswith(
+        "DELETE FROM id_fa_mappings USING (VALUES "
+        "(%(param_1)s::VARCHAR, %(param_2)s::VARCHAR), (%(param_3)s::VARCHAR, NULL)) "
+        "AS delete_values (id_value, fa_value) "
+    )
+    assert sql.endswith(
+        "WHERE id_fa_mappings.id_value = delete_values.id_value AND "
+        "(CAST(delete_values.fa_value AS VARCHAR) IS NULL OR "
+        "id_fa_mappings.fa_value = CAST(delete_values.fa_value AS VARCHAR)) "
+        "RETURNING id_fa_mappings.id_value"
+    )
+
+
+@pytest.mark.asyncio
+async def test_resolve_selects_details_only_for_details_scope(resolve_session):
+    details = SimpleNamespace(
+        id_value="a", fa_value="fa", additional_info=[{"key": "value"}]
+    )
+    details_result = MagicMock()
+    details_result.__iter__.return_value = iter([details])
+    linked_result = MagicMock()
+    linked_result.scalars.return_value = ["b"]
+    resolve_session.execute.side_effect = [details_result, linked_result]
+    single_resolve_requests = [
+        SingleResolveRequest(
+            reference_id=str(i),
+            timestamp=datetime.now().isoformat(),
+            id=id_value,
+            scope=scope,
+        )
+        for i, (id_value, scope) in enumerate(
+            [
+                ("a", ResolveScope.details),
+                ("b", ResolveScope.yes_no),
+                ("missing", ResolveScope.details),
+            ]
+        )
+    ]
+
+    with patch.object(
+        IdFaMappingValidations,
+        "get_component",
+        return_value=IdFaMappingValidations(),
+    ):
+        single_resolve_responses = await MapperService().resolve_single_requests(
+            single_resolve_requests
+        )
+
+    compiled = [
+        _compile(call.args[0]) for call in resolve_session.execute.call_args_list
+    ]
+    assert "id_fa_mappings.additional_info" in str(compiled[0])
+    assert "id_fa_mappings.additional_info" not in str(compiled[1])
+    assert [list(c.params.values()) for c in compiled] == [[["a", "missing"]], [["b"]]]
+    assert [response.status_reason_code for response in single_resolve_responses] == [
+        ResolveStatusReasonCode.succ_id_active,
+        ResolveStatusReasonCode.succ_id_active,
+        ResolveStatusReasonCode.succ_fa_not_linked_to_id,
+    ]
+    assert single_resolve_responses[0].fa == "fa"
+    assert single_resolve_responses[0].additional_info == [{"key": "value"}]
+
+
+@pytest.mark.asyncio
+async def test_resolve_does_not_validate_the_parsed_request_again(resolve_session):
+    resolve_session.execute.side_effect = _session(["a"]).execute.side_effect
+    resolve_request = ResolveRequest(
+        header=RequestHeader(
+            message_id="message_id",
+            message_ts=datetime.now().isoformat(),
+            action="resolve",
+            sender_id="sender",
+            total_count=2,
+        ),
+        message=ResolveRequestMessage(
+            transaction_id="transaction_id",
+            resolve_request=[
+                SingleResolveRequest(
+                    reference_id=str(i),
+                    timestamp=datetime.now().isoformat(),
+                    id=id_value,
+                )
+                for i, id_value in enumerate(["a", "b"])
+            ],
+        ),
+    )
+
+    with patch.object(
+        IdFaMappingValidations,
+        "get_component",
+        return_value=IdFaMappingValidations(),
+    ), patch.object(ResolveRequest, "model_validate") as validate_request, patch.object(
+        ResolveRequestMessage, "model_validate"
+    ) as validate_message, patch.object(
+        SingleResolveRequest, "model_validate"
+    ) as validate_single_request:
+        single_resolve_responses = await MapperService().resolve(resolve_request)
+
+    # The body was validated once, when it was parsed
+    validate_request.assert_not_called()
+    validate_message.assert_not_called()
+    validate_single_request.assert_not_called()
+    assert [response.reference_id for response in single_resolve_responses] == [
+        "0",
+        "1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reverse_resolve_lists_at_most_resolve_reverse_max_ids(resolve_session):
+    result = MagicMock()
+    result.__iter__.return_value = iter([("fa", "id0"), ("fa", "id1"), ("fa", "id2")])
+    resolve_session.execute.side_effect = [result]
+    mapper_service = MapperService()
+
+    with patch(f"{_mapper_path}._config.resolve_reverse_max_ids", 2):
+        linked_id_values = await mapper_service.get_id_values_for_reverse_resolve(
+            ["fa"]
+        )
+        single_resolve_response = mapper_service.construct_single_reverse_resolve(
+            SingleResolveRequest(
+                reference_id="0",
+                timestamp=datetime.now().isoformat(),
+                fa="fa",
+                scope=ResolveScope.details,
+            ),
+            linked_id_values["fa"],
+        )
+
+    ((stmt,),) = [call.args for call in resolve_session.execute.call_args_list]
+    compiled = _compile(stmt)
+    assert (
+        "row_number() OVER (PARTITION BY id_fa_mappings.fa_value "
+        "ORDER BY id_fa_mappings.id_value) AS rank" in str(compiled)
+    )
+    # One more than listed, to tell when the list is cut short
+    assert list(compiled.params.values()) == [["fa"], 3]
+    assert single_resolve_response.additional_info == [{"id": "id0"}, {"id": "id1"}]
+    assert single_resolve_response.status_reason_message == (
+        "FA is linked to more than 2 IDs. Only the first 2 are listed."
+    )
@@ -0,0 +1,28 @@
+from unittest.mock import MagicMock
+
+from openg2p_fastapi_common.context import dbengine
+from openg2p_spar_mapper_api.services import ReadReplica
+
+
+def test_reads_use_replica_only_while_lag_is_acceptable():
+    primary_engine = MagicMock()
+    dbengine.set(primary_engine)
+    read_replica = ReadReplica()
+
+    assert read_replica.get_read_engine() is primary_engine
+
+    read_replica.engine = MagicMock()
+    assert read_replica.get_read_engine() is primary_engine
+
+    read_replica.lag_seconds = 0.5
+    assert read_replica.get_read_engine() is read_replica.engine
+
+    with ReadReplica.force_primary():
+        assert read_replica.get_read_engine() is primary_engine
+
+    read_replica.lag_seconds = 3600.0
+    assert read_replica.get_read_engine() is primary_engine
+
+    assert read_replica.get_metrics()["replica_reads"] == 1
+    assert read_replica.get_metrics()["primary_reads"] == 4
+    dbengine.set(None)
@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+from openg2p_spar_mapper_api.services import BloomFilter, ResolveBloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(expected_items=1000, false_positive_rate=0.01)
+    id_values = [f"linked_{i}" for i in range(1000)]
+    for id_value in id_values:
+        bloom_filter.add(id_value)
+
+    false_positives = sum(f"unknown_{i}" in bloom_filter for i in range(10000))
+
+    assert all(id_value in bloom_filter for id_value in id_values)
+    assert false_positives < 300
+    assert 0.005 < bloom_filter.estimated_false_positive_rate < 0.02
+
+
+def test_resolve_bloom_filter_is_bypassed_until_ready():
+    resolve_bloom_filter = ResolveBloomFilter()
+
+    with patch(
+        "openg2p_spar_mapper_api.services.resolve_bloom_filter._config.resolve_bloom_filter_enabled",
+        True,
+    ):
+        assert resolve_bloom_filter.filter_misses(["a", "b"]) == ["a", "b"]
+
+        resolve_bloom_filter._filter = BloomFilter(100, 0.01)
+        resolve_bloom_filter._ready = True
+        resolve_bloom_filter.on_connect()
+        resolve_bloom_filter.add(["a"])
+        assert resolve_bloom_filter.filter_misses(["a", "b"]) == ["a"]
+
+        resolve_bloom_filter.on_disconnect()
+        assert resolve_bloom_filter.filter_misses(["a", "b"]) == ["a", "b"]
+
+    assert resolve_bloom_filter.get_metrics()["definite_misses"] == 1
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from openg2p_spar_mapper_api.models import IdFaMapping
+from openg2p_spar_mapper_api.services import ResolveCache
+
+
+def test_resolve_cache_positive_and_negative_entries():
+    cache = ResolveCache(max_entries=10, ttl=60)
+    id_fa_mapping = IdFaMapping(id_value="linked_id", fa_value="linked_fa")
+
+    cache.put_many(
+        ["linked_id", "unknown_id"], {"linked_id": id_fa_mapping}, cache.generation
+    )
+    found, missing = cache.get_many(["linked_id", "unknown_id", "other_id"])
+
+    assert found == {"linked_id": id_fa_mapping, "unknown_id": None}
+    assert missing == ["other_id"]
+    assert cache.get_metrics()["hits"] == 2
+    assert cache.get_metrics()["misses"] == 1
+
+
+def test_resolve_cache_evicts_least_recently_used():
+    cache = ResolveCache(max_entries=2, ttl=60)
+
+    cache.put_many(["a", "b"], {}, cache.generation)
+    cache.get_many(["a"])
+    cache.put_many(["c"], {}, cache.generation)
+    found, missing = cache.get_many(["a", "b", "c"])
+
+    assert set(found) == {"a", "c"}
+    assert missing == ["b"]
+    assert cache.get_metrics()["evictions"] == 1
+
+
+def test_resolve_cache_expires_entries():
+    cache = ResolveCache(max_entries=10, ttl=60)
+
+    with patch("time.monotonic", return_value=1000.0):
+        cache.put_many(["a"], {}, cache.generation)
+    with patch("time.monotonic", return_value=1061.0):
+        found, missing = cache.get_many(["a"])
+
+    assert found == {}
+    assert missing == ["a"]
+
+
+def test_resolve_cache_invalidate_drops_stale_puts():
+    cache = ResolveCache(max_entries=10, ttl=60)
+
+    cache.put_many(["a"], {}, cache.generation)
+    generation = cache.generation
+    cache.invalidate(["a"])
+    cache.put_many(["a"], {}, generation)
+    found, missing = cache.get_many(["a"])
+
+    assert found == {}
+    assert missing == ["a"]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from openg2p_fastapi_common.context import dbengine
+from openg2p_spar_mapper_api.models import IdFaMapping
+from openg2p_spar_mapper_api.services import (
+    BloomFilter,
+    InProcessInvalidationChannel,
+    MapperService,
+    ReadReplica,
+    ResolveBloomFilter,
+    ResolveCache,
+    ResolveCacheInvalidator,
+)
+from openg2p_spar_mapper_api.services.resolve_cache_invalidation import (
+    CLEAR_ALL_LINKED_PAYLOAD,
+    CLEAR_ALL_PAYLOAD,
+    MAX_PAYLOAD_BYTES,
+)
+
+
+def test_construct_payloads_packs_ids_under_size_limit():
+    invalidator = ResolveCacheInvalidator(channel=InProcessInvalidationChannel())
+    id_values = [f"id_{i:08d}" for i in range(2000)]
+
+    payloads = invalidator.construct_payloads(id_values)
+
+    assert 1 < len(payloads) < 10
+    assert all(len(payload.encode()) < MAX_PAYLOAD_BYTES for payload in payloads)
+    assert [i for payload in payloads for i in json.loads(payload)] == id_values
+
+
+def test_construct_payloads_falls_back_to_clear_all():
+    invalidator = ResolveCacheInvalidator(channel=InProcessInvalidationChannel())
+
+    id_values = [f"id_{i:08d}" for i in range(100000)]
+
+    assert invalidator.construct_payloads(id_values) == [CLEAR_ALL_PAYLOAD]
+    assert invalidator.construct_payloads(id_values, linked=True) == [
+        CLEAR_ALL_LINKED_PAYLOAD
+    ]
+
+
+@pytest.mark.asyncio
+async def test_published_ids_are_invalidated_in_listening_caches():
+    cache = ResolveCache(max_entries=10, ttl=60)
+    invalidator = ResolveCacheInvalidator(channel=InProcessInvalidationChannel())
+
+    with patch.object(ResolveCache, "get_component", return_value=cache), patch.object(
+        ResolveBloomFilter, "get_component", return_value=ResolveBloomFilter()
+    ), patch(
+        "openg2p_spar_mapper_api.services.resolve_cache._config.resolve_cache_enabled",
+        True,
+    ):
+        await invalidator.start()
+        await asyncio.sleep(0)
+        cache.put_many(["a", "b"], {}, cache.generation)
+        await invalidator.publish(None, ["a"])
+        found, missing = cache.get_many(["a", "b"])
+        await invalidator.stop()
+
+    assert set(found) == {"b"}
+    assert missing == ["a"]
+    assert invalidator.get_metrics()["received_notifications"] == 1
+
+
+@pytest.mark.asyncio
+async def test_clear_all_of_links_bypasses_bloom_filter_until_rebuilt():
+    dbengine.set(MagicMock())
+    cache = ResolveCache(max_entries=10, ttl=60)
+    resolve_bloom_filter = ResolveBloomFilter()
+    invalidator = ResolveCacheInvalidator(channel=InProcessInvalidationChannel())
+    # Linked by another worker, in a batch too large to send the ids
+    linked_elsewhere = [f"id_{i:08d}" for i in range(100000)]
+
+    with patch.object(ResolveCache, "get_component", return_value=cache), patch.object(
+        ResolveBloomFilter, "get_component", return_value=resolve_bloom_filter
+    ), patch.object(ReadReplica, "get_component", return_value=ReadReplica()), patch(
+        "openg2p_spar_mapper_api.services.resolve_bloom_filter._config"
+        ".resolve_bloom_filter_enabled",
+        True,
+    ), patch(
+        "openg2p_spar_mapper_api.services.mapper.async_sessionmaker"
+    ), patch.object(
+        IdFaMapping, "get_linked_id_values", AsyncMock(return_value={"id_00000007"})
+    ), patch.object(
+        IdFaMapping, "get_resolve_details_by_id_values", AsyncMock(return_value={})
+    ):
+        await invalidator.start()
+        await asyncio.sleep(0)
+        resolve_bloom_filter._filter = BloomFilter(100, 0.01)
+        resolve_bloom_filter._ready = True
+        resolve_bloom_filter._rebuild_requested.clear()
+
+        # Updates and unlinks cannot cause false negatives
+        await invalidator.publish(None, linked_elsewhere)
+        assert resolve_bloom_filter.ready
+        assert not resolve_bloom_filter._rebuild_requested.is_set()
+
+        await invalidator.publish(None, linked_elsewhere, linked=True)
+        assert not resolve_bloom_filter.ready
+        assert resolve_bloom_filter._rebuild_requested.is_set()
+        id_fa_mappings = await MapperService().get_id_fa_mappings_for_resolve(
+            ["id_00000007"]
+        )
+        await invalidator.stop()
+    dbengine.set(None)
+
+    assert id_fa_mappings == {"id_00000007": True}
@@ -0,0 +1,134 @@
+import json
+from datetime import datetime
+
+import pytest
+from openg2p_g2pconnect_common_lib.schemas import (
+    AsyncCallbackRequestHeader,
+    RequestHeader,
+    StatusEnum,
+)
+from openg2p_g2pconnect_mapper_lib.schemas import (
+    LinkRequest,
+    LinkRequestMessage,
+    LinkResponse,
+    SingleLinkResponse,
+    SingleTxnStatusResponse,
+    TxnStatusResponse,
+)
+from openg2p_spar_mapper_api.services import AsyncResponseHelper, SyncResponseHelper
+
+
+def _link_request() -> LinkRequest:
+    return LinkRequest(
+        header=RequestHeader(
+            message_id="message_id",
+            message_ts=datetime.now().isoformat(),
+            action="link",
+            sender_id="sender",
+            receiver_id="receiver",
+            total_count=3,
+        ),
+        message=LinkRequestMessage(transaction_id="transaction_id", link_request=[]),
+    )
+
+
+def _single_link_responses(*statuses):
+    return [
+        SingleLinkResponse(
+            reference_id=f"ref{i}", timestamp=datetime.now(), status=status
+        )
+        for i, status in enumerate(statuses)
+    ]
+
+
+def test_construct_success_sync_response():
+    single_link_responses = _single_link_responses(
+        StatusEnum.succ, StatusEnum.rjct, StatusEnum.succ
+    )
+
+    response = SyncResponseHelper().construct_success_sync_response(
+        "link", _link_request(), single_link_responses
+    )
+
+    assert isinstance(response, LinkResponse)
+    assert response.header.message_id == "message_id"
+    assert response.header.action == "link"
+    assert response.header.status == StatusEnum.succ
+    assert response.header.total_count == 3
+    assert response.header.completed_count == 2
+    assert response.header.sender_id == "sender"
+    assert response.header.receiver_id == "receiver"
+    assert response.message.transaction_id == "transaction_id"
+    assert response.message.link_response == single_link_responses
+    # Serializes like a validated response
+    assert LinkResponse.model_validate_json(response.model_dump_json()) == response
+
+
+def test_construct_success_async_callback_request():
+    single_link_responses = _single_link_responses(StatusEnum.rjct, StatusEnum.succ)
+
+    callback_request = AsyncResponseHelper().construct_success_async_callback_request(
+        "link", _link_request(), "correlation_id", single_link_responses
+    )
+
+    assert isinstance(callback_request.header, AsyncCallbackRequestHeader)
+    assert callback_request.header.total_count == 2
+    assert callback_request.header.completed_count == 1
+    assert callback_request.message.link_response == single_link_responses
+    assert (
+        callback_request.model_dump(mode="json")["message"]["link_response"][1][
+            "status"
+        ]
+        == StatusEnum.succ.value
+    )
+
+
+def test_construct_success_sync_txn_status_response():
+    single_txn_status_responses = [
+        SingleTxnStatusResponse(txn_type="link", txn_status={"status": status})
+        for status in ("succ", "rjct", "succ")
+    ]
+
+    response = SyncResponseHelper().construct_success_sync_response(
+        "txn-status", _link_request(), single_txn_status_responses
+    )
+
+    assert isinstance(response, TxnStatusResponse)
+    assert response.header.total_count == 3
+    assert response.header.completed_count == 2
+    assert response.message.txnstatus_response == single_txn_status_responses
+
+
+@pytest.mark.asyncio
+async def test_stream_success_sync_response():
+    single_link_responses = _single_link_responses(
+        StatusEnum.succ, StatusEnum.rjct, StatusEnum.succ
+    )
+
+    async def single_response_chunks():
+        yield single_link_responses[:2]
+        yield single_link_responses[2:]
+
+    lines = b"".join(
+        [
+            chunk
+            async for chunk in SyncResponseHelper().stream_success_sync_response(
+                "link", _link_request(), 3, single_response_chunks()
+            )
+        ]
+    ).splitlines()
+
+    assert len(lines) == 5
+    first = json.loads(lines[0])
+    assert first["message"] == {
+        "transaction_id": "transaction_id",
+        "correlation_id": None,
+    }
+    assert first["header"]["total_count"] == 3
+    assert first["header"]["completed_count"] is None
+    assert [
+        SingleLinkResponse.model_validate_json(line) for line in lines[1:4]
+    ] == single_link_responses
+    last = json.loads(lines[4])
+    assert last["header"]["total_count"] == 3
+    assert last["header"]["completed_count"] == 2
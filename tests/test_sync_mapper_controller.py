@@ -1,7 +1,10 @@
+import inspect
+import json
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from fastapi.encoders import jsonable_encoder
 from openg2p_g2pconnect_common_lib.schemas import (
     RequestHeader,
     StatusEnum,
@@ -42,6 +45,7 @@ from openg2p_g2pconnect_mapper_lib.schemas.update import (
 )
 from openg2p_spar_mapper_api.controllers.sync_mapper_controller import (
     SyncMapperController,
+    _json_response,
 )
 from openg2p_spar_mapper_api.services import (
     RequestValidation,
@@ -84,7 +88,7 @@ def setup_link_controller():
     )
     response_helper_link_mock = MagicMock()
 
-    response_helper_link_mock.construct_success_sync_link_response.return_value = (
+    response_helper_link_mock.construct_success_sync_response.return_value = (
         mock_link_response
     )
 
@@ -175,7 +179,7 @@ def setup_update_controller():
 
     response_helper_update_mock = MagicMock()
 
-    response_helper_update_mock.construct_success_sync_update_response.return_value = (
+    response_helper_update_mock.construct_success_sync_response.return_value = (
         mock_update_response
     )
 
@@ -267,7 +271,7 @@ def setup_resolve_controller():
 
     response_helper_resolve_mock = MagicMock()
 
-    response_helper_resolve_mock.construct_success_sync_resolve_response.return_value = (
+    response_helper_resolve_mock.construct_success_sync_response.return_value = (
         mock_resolve_response
     )
 
@@ -366,7 +370,7 @@ def setup_unlink_controller():
 
     response_helper_unlink_mock = MagicMock()
 
-    response_helper_unlink_mock.construct_success_sync_unlink_response.return_value = (
+    response_helper_unlink_mock.construct_success_sync_response.return_value = (
         mock_unlink_response
     )
 
@@ -545,3 +549,27 @@ async def test_unlink_sync_validation_error(setup_unlink_controller):
         assert response.header.status == StatusEnum.rjct
         assert validation_error.message in response.header.status_reason_message
         controller.mapper_service.unlink.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_json_response_serializes_model_directly():
+    response_model = LinkResponse(
+        header=SyncResponseHeader(
+            message_id="message_id",
+            message_ts=datetime.now().isoformat(),
+            action="link",
+            status=StatusEnum.succ,
+        ),
+        message=LinkResponseMessage(transaction_id="trans_id", link_response=[]),
+    )
+
+    async def endpoint(link_request: LinkRequest):
+        return response_model
+
+    wrapped_endpoint = _json_response(endpoint)
+    response = await wrapped_endpoint(MagicMock())
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == jsonable_encoder(response_model)
+    # FastAPI reads the request body type from the wrapped signature
+    assert inspect.signature(wrapped_endpoint) == inspect.signature(endpoint)
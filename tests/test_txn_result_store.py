@@ -0,0 +1,78 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from openg2p_g2pconnect_common_lib.schemas import RequestHeader
+from openg2p_g2pconnect_mapper_lib.schemas import (
+    SingleTxnStatusRequest,
+    TxnStatusRequest,
+    TxnStatusRequestMessage,
+)
+from openg2p_spar_mapper_api.services import TxnResultStore
+
+
+def _txn_status_request(*items) -> TxnStatusRequest:
+    return TxnStatusRequest(
+        header=RequestHeader(
+            message_id="message_id",
+            message_ts=datetime.now().isoformat(),
+            action="txn-status",
+            sender_id="sender",
+            total_count=len(items),
+        ),
+        message=TxnStatusRequestMessage(
+            transaction_id="transaction_id",
+            txnstatus_request=[
+                SingleTxnStatusRequest(
+                    reference_id=f"ref{i}",
+                    timestamp=datetime.now().isoformat(),
+                    txn_type=txn_type,
+                    attribute_type=attribute_type,
+                    attribute_value=attribute_value,
+                )
+                for i, (txn_type, attribute_type, attribute_value) in enumerate(items)
+            ],
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_txn_status():
+    txn_result_store = TxnResultStore()
+    link_result = {"header": {"action": "link"}, "message": {"link_response": []}}
+
+    async def get_results(sender_id, attribute_type, attribute_values):
+        assert sender_id == "sender"
+        results = {"c1": link_result, "t1": link_result}
+        return {value: results[value] for value in attribute_values if value in results}
+
+    with patch.object(
+        txn_result_store, "get_results", AsyncMock(side_effect=get_results)
+    ) as mock_get_results:
+        responses = await txn_result_store.get_txn_status(
+            _txn_status_request(
+                ("link", "correlation_id", "c1"),
+                ("link", "correlation_id", "c2"),
+                ("link", "transaction_id", "t1"),
+                ("resolve", "transaction_id", "t1"),
+                ("link", "reference_id_list", "ref"),
+            )
+        )
+
+    # One lookup per attribute type, however many items
+    assert mock_get_results.await_count == 2
+    assert [response.txn_status["status"] for response in responses] == [
+        "succ",
+        "rjct",
+        "succ",
+        "rjct",
+        "rjct",
+    ]
+    assert responses[0].txn_status["response"] == link_result
+    assert responses[1].txn_status["status_reason_code"] == "rjct.txn.not_found"
+    assert responses[3].txn_status["status_reason_code"] == "rjct.txn.not_found"
+    assert (
+        responses[4].txn_status["status_reason_code"]
+        == "rjct.attribute_type.not_supported"
+    )
+    assert txn_result_store.get_metrics()["hits"] == 2